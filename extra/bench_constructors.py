@@ -0,0 +1,69 @@
+"""This script compares the compiled data class constructors in codeforces_api
+with the plain dict.get loop they replaced, on a contest.standings payload.
+
+Record a payload with
+    curl 'https://codeforces.com/api/contest.standings?contestId=1900' > standings.json
+and run from the repository root with
+    python -m extra.bench_constructors standings.json
+Without a file a synthetic payload of 30000 rows is used.
+"""
+
+import json
+import random
+import sys
+import timeit
+
+from tle.util import codeforces_common  # Imported first to avoid a circular import.
+from tle.util import codeforces_api as cf
+
+ROWS = 30000
+PROBLEMS = 8
+REPEAT = 5
+
+
+def make_from_dict_loop(namedtuple_cls, dict_):
+    field_vals = [dict_.get(field) for field in namedtuple_cls._fields]
+    return namedtuple_cls._make(field_vals)
+
+
+def make_ranklist_row_loop(row_dict):
+    members = [make_from_dict_loop(cf.Member, member) for member in row_dict['party']['members']]
+    party = make_from_dict_loop(cf.Party, {**row_dict['party'], 'members': members})
+    problem_results = [make_from_dict_loop(cf.ProblemResult, problem_result)
+                       for problem_result in row_dict['problemResults']]
+    return make_from_dict_loop(cf.RanklistRow, {**row_dict, 'party': party,
+                                                'problemResults': problem_results})
+
+
+def synthetic_rows():
+    rows = []
+    for rank in range(1, ROWS + 1):
+        party = {'contestId': 1900, 'members': [{'handle': f'user{rank}'}],
+                 'participantType': 'CONTESTANT', 'ghost': False, 'room': rank // 50,
+                 'startTimeSeconds': 1700000000}
+        results = [{'points': random.choice((0.0, 500.0)), 'penalty': 0,
+                    'rejectedAttemptCount': random.randrange(3), 'type': 'FINAL',
+                    'bestSubmissionTimeSeconds': random.randrange(7200)}
+                   for _ in range(PROBLEMS)]
+        rows.append({'party': party, 'rank': rank, 'points': 1000.0, 'penalty': 0,
+                     'successfulHackCount': 0, 'unsuccessfulHackCount': 0,
+                     'problemResults': results})
+    return rows
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as f:
+            rows = json.load(f)['result']['rows']
+    else:
+        rows = synthetic_rows()
+    assert [make_ranklist_row_loop(row) for row in rows] == [cf._make_ranklist_row(row) for row in rows]
+
+    for name, make in (('dict.get loop', make_ranklist_row_loop),
+                       ('compiled', cf._make_ranklist_row)):
+        best = min(timeit.repeat(lambda: [make(row) for row in rows], number=1, repeat=REPEAT))
+        print(f'{name:>15}: {best * 1000:8.1f} ms for {len(rows)} rows')
+
+
+if __name__ == '__main__':
+    main()
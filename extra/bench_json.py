@@ -0,0 +1,93 @@
+"""This script compares the JSON backends of tle.util.json_backend on API
+payloads, decoding inline on the event loop and offloaded to a worker thread.
+For each it reports the decode latency and the longest time the event loop
+was stalled, as seen by a coroutine ticking every millisecond.
+
+None of the decoders release the GIL, so offloading does not shorten the
+stall. Bodies too large to decode in one go are read incrementally with
+tle.util.json_stream instead.
+
+Run from the repository root with
+    python -m extra.bench_json fixtures/problemset.problems.json ...
+where the files are response bodies recorded with extra/cf_api_server.py.
+Without files synthetic payloads from the stand-in server are used.
+"""
+
+import asyncio
+import json
+import sys
+import time
+
+from tle.util import json_backend
+from extra.cf_api_server import SyntheticData
+
+REPEAT = 5
+TICK = 0.001
+
+
+def synthetic_payloads():
+    data = SyntheticData()
+    payloads = {}
+    for method, params in (('problemset.problems', {}),
+                           ('contest.standings', {'contestId': '1'}),
+                           ('user.ratedList', {})):
+        body = {'status': 'OK', 'result': data.result(method, params)}
+        payloads[method] = json.dumps(body).encode()
+    return payloads
+
+
+async def measure(decode, raw):
+    """Returns the decode latency and the longest event loop stall, in seconds."""
+    max_stall = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal max_stall
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(TICK)
+            now = time.perf_counter()
+            max_stall = max(max_stall, now - last - TICK)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await decode(raw)
+    latency = time.perf_counter() - start
+    done = True
+    await task
+    return latency, max_stall
+
+
+async def main():
+    if len(sys.argv) > 1:
+        payloads = {}
+        for path in sys.argv[1:]:
+            with open(path, 'rb') as f:
+                payloads[path] = f.read()
+    else:
+        payloads = synthetic_payloads()
+
+    for name, raw in payloads.items():
+        print(f'{name}: {len(raw) / 2**20:.1f} MB')
+        for backend in json_backend.available_backends():
+            loads = json_backend.get_loads(backend)
+            assert loads(raw) == json.loads(raw)
+
+            async def inline(raw):
+                return loads(raw)
+
+            async def offloaded(raw):
+                return await asyncio.to_thread(loads, raw)
+
+            for mode, decode in (('inline', inline), ('thread', offloaded)):
+                results = [await measure(decode, raw) for _ in range(REPEAT)]
+                latency = min(latency for latency, _ in results)
+                stall = min(stall for _, stall in results)
+                print(f'  {backend:>8} {mode:>6}: {latency * 1000:8.1f} ms decode, '
+                      f'{stall * 1000:8.1f} ms longest loop stall')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,332 @@
+"""A local stand-in for the Codeforces API, for load testing and benchmarks
+without touching codeforces.com.
+
+Every endpoint used by tle.util.codeforces_api is served, from a recorded
+fixture if one exists and from deterministic synthetic data otherwise. The
+load profile adds latency, random errors and "Call limit exceeded" replies.
+
+Serve with
+    python -m extra.cf_api_server serve --port 8080 --fixtures fixtures \
+        --latency 0.2 --jitter 0.1 --error-rate 0.01 --max-rps 5
+and start the bot with CF_API_BASE_URL=http://127.0.0.1:8080/api/
+
+Record a fixture from the real API with
+    python -m extra.cf_api_server record --fixtures fixtures \
+        contest.standings contestId=1900
+
+A fixture is the raw response body, stored as <method>.json or, for a
+specific query, as <method>@<param>=<value>&....json with the params sorted.
+The query specific fixture is preferred. Benchmarks can run the server
+in-process with `StandInServer` and read its call counts from /stats.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import time
+import urllib.parse
+import urllib.request
+
+from aiohttp import web
+
+REAL_API_BASE_URL = 'https://codeforces.com/api/'
+
+METHODS = ('contest.list', 'contest.standings', 'contest.ratingChanges', 'problemset.problems',
+           'user.info', 'user.rating', 'user.status', 'user.ratedList')
+
+START_TIME = 1600000000
+PROBLEM_INDICES = 'ABCDEFGH'
+TAGS = ('implementation', 'math', 'greedy', 'dp', 'graphs', 'strings', 'data structures')
+VERDICTS = ('OK', 'WRONG_ANSWER', 'TIME_LIMIT_EXCEEDED', 'RUNTIME_ERROR')
+
+
+class LoadProfile:
+    """How the stand-in misbehaves. Rates are probabilities per request."""
+    def __init__(self, latency=0, jitter=0, error_rate=0, call_limit_rate=0, max_rps=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.call_limit_rate = call_limit_rate
+        self.max_rps = max_rps
+
+
+def fixture_name(method, params):
+    if not params:
+        return f'{method}.json'
+    return f'{method}@{urllib.parse.urlencode(sorted(params.items()))}.json'
+
+
+# Synthetic data. Everything is derived from the request params, so that the same query always
+# gets the same reply.
+
+def _contest(contest_id):
+    return {'id': contest_id, 'name': f'Codeforces Round #{contest_id}', 'type': 'CF',
+            'phase': 'FINISHED', 'frozen': False, 'durationSeconds': 7200,
+            'startTimeSeconds': START_TIME + contest_id * 86400}
+
+
+def _problem(contest_id, index):
+    rng = random.Random(f'{contest_id}{index}')
+    return {'contestId': contest_id, 'index': index, 'name': f'Problem {contest_id}{index}',
+            'type': 'PROGRAMMING', 'points': 500.0 * (PROBLEM_INDICES.index(index) + 1),
+            'rating': 800 + 100 * rng.randrange(28), 'tags': rng.sample(TAGS, 2)}
+
+
+def _party(contest_id, handle):
+    return {'contestId': contest_id, 'members': [{'handle': handle}],
+            'participantType': 'CONTESTANT', 'ghost': False, 'room': 1,
+            'startTimeSeconds': _contest(contest_id)['startTimeSeconds']}
+
+
+def _user(handle):
+    rng = random.Random(handle)
+    rating = rng.randrange(800, 3500)
+    return {'handle': handle, 'rating': rating, 'maxRating': rating + rng.randrange(200),
+            'contribution': 0, 'friendOfCount': rng.randrange(100),
+            'lastOnlineTimeSeconds': START_TIME, 'registrationTimeSeconds': START_TIME,
+            'titlePhoto': 'https://userpic.codeforces.org/no-title.jpg'}
+
+
+def _rating_change(contest_id, handle, rank, old_rating):
+    return {'contestId': contest_id, 'contestName': _contest(contest_id)['name'],
+            'handle': handle, 'rank': rank,
+            'ratingUpdateTimeSeconds': _contest(contest_id)['startTimeSeconds'] + 9000,
+            'oldRating': old_rating, 'newRating': old_rating + 50 - rank % 100}
+
+
+def _handles(contest_id, rows):
+    return [f'user{contest_id}_{rank}' for rank in range(1, rows + 1)]
+
+
+class SyntheticData:
+    def __init__(self, contests=2000, rows=30000, problems=8000, users=50000, submissions=1000):
+        self.contests = contests
+        self.rows = rows
+        self.problems = problems
+        self.users = users
+        self.submissions = submissions
+
+    def contest_list(self, params):
+        return [_contest(contest_id) for contest_id in range(self.contests, 0, -1)]
+
+    def contest_standings(self, params):
+        contest_id = int(params['contestId'])
+        handles = _handles(contest_id, self.rows)
+        if 'handles' in params:
+            wanted = set(params['handles'].split(';'))
+            handles = [handle for handle in handles if handle in wanted]
+        start = int(params.get('from', 1)) - 1
+        count = int(params['count']) if 'count' in params else len(handles)
+        rows = []
+        for handle in handles[start:start + count]:
+            rank = int(handle.rsplit('_', 1)[1])
+            rng = random.Random(handle)
+            results = [{'points': rng.choice((0.0, 500.0)), 'penalty': 0,
+                        'rejectedAttemptCount': rng.randrange(3), 'type': 'FINAL',
+                        'bestSubmissionTimeSeconds': rng.randrange(7200)}
+                       for _ in PROBLEM_INDICES]
+            rows.append({'party': _party(contest_id, handle), 'rank': rank,
+                         'points': float(self.rows - rank), 'penalty': 0,
+                         'successfulHackCount': 0, 'unsuccessfulHackCount': 0,
+                         'problemResults': results})
+        return {'contest': _contest(contest_id),
+                'problems': [_problem(contest_id, index) for index in PROBLEM_INDICES],
+                'rows': rows}
+
+    def contest_ratingChanges(self, params):
+        contest_id = int(params['contestId'])
+        return [_rating_change(contest_id, handle, rank, _user(handle)['rating'])
+                for rank, handle in enumerate(_handles(contest_id, self.rows), 1)]
+
+    def problemset_problems(self, params):
+        problems = [_problem(self.contests - i // len(PROBLEM_INDICES),
+                             PROBLEM_INDICES[i % len(PROBLEM_INDICES)])
+                    for i in range(self.problems)]
+        stats = [{'contestId': problem['contestId'], 'index': problem['index'],
+                  'solvedCount': random.Random(problem['name']).randrange(10000)}
+                 for problem in problems]
+        return {'problems': problems, 'problemStatistics': stats}
+
+    def user_info(self, params):
+        return [_user(handle) for handle in params['handles'].split(';')]
+
+    def user_rating(self, params):
+        handle = params['handle']
+        rng = random.Random(handle)
+        changes = []
+        rating = 1500
+        for contest_id in sorted(rng.sample(range(1, self.contests + 1), 20)):
+            changes.append(_rating_change(contest_id, handle, rng.randrange(1, self.rows), rating))
+            rating = changes[-1]['newRating']
+        return changes
+
+    def user_status(self, params):
+        handle = params['handle']
+        rng = random.Random(handle)
+        submissions = []
+        for sub_id in range(self.submissions, 0, -1):
+            contest_id = rng.randrange(1, self.contests + 1)
+            problem = _problem(contest_id, rng.choice(PROBLEM_INDICES))
+            submissions.append({
+                'id': sub_id, 'contestId': contest_id,
+                'creationTimeSeconds': START_TIME + sub_id * 600, 'relativeTimeSeconds': 2147483647,
+                'problem': problem, 'author': {**_party(contest_id, handle),
+                                               'participantType': 'PRACTICE'},
+                'programmingLanguage': 'GNU C++17', 'verdict': rng.choice(VERDICTS),
+                'testset': 'TESTS', 'passedTestCount': 10, 'timeConsumedMillis': 15,
+                'memoryConsumedBytes': 0})
+        start = int(params.get('from', 1)) - 1
+        count = int(params['count']) if 'count' in params else len(submissions)
+        return submissions[start:start + count]
+
+    def user_ratedList(self, params):
+        return [_user(f'rated{i}') for i in range(self.users)]
+
+    def result(self, method, params):
+        return getattr(self, method.replace('.', '_'))(params)
+
+
+class StandInServer:
+    """Async context manager running the stand-in on localhost, for use from benchmarks."""
+    def __init__(self, *, port=0, fixtures=None, profile=None, data=None):
+        self.port = port
+        self.fixtures = fixtures
+        self.profile = profile or LoadProfile()
+        self.data = data or SyntheticData()
+        self.calls = collections.Counter()
+        self.recent = collections.deque()
+        self.runner = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.port}/api/'
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_route('*', '/api/{method}', self.handle)
+        app.router.add_get('/stats', self.handle_stats)
+        return app
+
+    async def __aenter__(self):
+        self.runner = web.AppRunner(self.make_app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.runner.cleanup()
+
+    def _over_rate_limit(self):
+        if self.profile.max_rps is None:
+            return False
+        now = time.monotonic()
+        while self.recent and self.recent[0] <= now - 1:
+            self.recent.popleft()
+        self.recent.append(now)
+        return len(self.recent) > self.profile.max_rps
+
+    def _load_fixture(self, method, params):
+        if self.fixtures is None:
+            return None
+        for name in (fixture_name(method, params), fixture_name(method, {})):
+            path = os.path.join(self.fixtures, name)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    return f.read()
+        return None
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        params = dict(request.query)
+        params.update(await request.post())
+        self.calls[method] += 1
+
+        profile = self.profile
+        delay = profile.latency + random.uniform(-profile.jitter, profile.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self._over_rate_limit() or random.random() < profile.call_limit_rate:
+            self.calls['call_limit_exceeded'] += 1
+            return web.json_response({'status': 'FAILED', 'comment': 'Call limit exceeded'},
+                                     status=503)
+        if random.random() < profile.error_rate:
+            self.calls['errors'] += 1
+            # Codeforces serves an HTML page when it is down.
+            return web.Response(text='<html>Codeforces is temporarily unavailable</html>',
+                                status=502, content_type='text/html')
+        if method not in METHODS:
+            return web.json_response({'status': 'FAILED', 'comment': 'method: Unknown method'},
+                                     status=400)
+
+        body = self._load_fixture(method, params)
+        if body is None:
+            result = self.data.result(method, params)
+            body = json.dumps({'status': 'OK', 'result': result}).encode()
+        return web.Response(body=body, content_type='application/json')
+
+    async def handle_stats(self, request):
+        return web.json_response(dict(self.calls))
+
+
+def record(fixtures, method, params):
+    url = REAL_API_BASE_URL + method + '?' + urllib.parse.urlencode(params)
+    with urllib.request.urlopen(url) as f:
+        body = f.read()
+    os.makedirs(fixtures, exist_ok=True)
+    path = os.path.join(fixtures, fixture_name(method, params))
+    with open(path, 'wb') as f:
+        f.write(body)
+    print(f'Saved {len(body)} bytes to {path}')
+
+
+async def serve(args):
+    profile = LoadProfile(args.latency, args.jitter, args.error_rate, args.call_limit_rate,
+                          args.max_rps)
+    data = SyntheticData(args.contests, args.rows, args.problems, args.users, args.submissions)
+    async with StandInServer(port=args.port, fixtures=args.fixtures, profile=profile,
+                             data=data) as server:
+        print(f'Serving the Codeforces API stand-in at {server.base_url}')
+        await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve')
+    serve_parser.add_argument('--port', type=int, default=8080)
+    serve_parser.add_argument('--fixtures')
+    serve_parser.add_argument('--latency', type=float, default=0, help='seconds')
+    serve_parser.add_argument('--jitter', type=float, default=0, help='seconds')
+    serve_parser.add_argument('--error-rate', type=float, default=0)
+    serve_parser.add_argument('--call-limit-rate', type=float, default=0)
+    serve_parser.add_argument('--max-rps', type=int,
+                              help='requests per second above which call limit replies are sent')
+    serve_parser.add_argument('--contests', type=int, default=2000)
+    serve_parser.add_argument('--rows', type=int, default=30000, help='standings rows per contest')
+    serve_parser.add_argument('--problems', type=int, default=8000)
+    serve_parser.add_argument('--users', type=int, default=50000, help='size of user.ratedList')
+    serve_parser.add_argument('--submissions', type=int, default=1000, help='per user')
+
+    record_parser = subparsers.add_parser('record')
+    record_parser.add_argument('--fixtures', required=True)
+    record_parser.add_argument('method', choices=METHODS)
+    record_parser.add_argument('params', nargs='*', help='key=value')
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        try:
+            asyncio.run(serve(args))
+        except KeyboardInterrupt:
+            pass
+    else:
+        record(args.fixtures, args.method, dict(param.split('=', 1) for param in args.params))
+
+
+if __name__ == '__main__':
+    main()
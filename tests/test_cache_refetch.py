@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from tle.util import codeforces_common  # Imported before cache_system2, which needs it loaded.
+from tle.util import codeforces_api as cf
+from tle.util import cache_system2
+from tle.util.db import CacheDbConn
+
+
+def _contest(contest_id):
+    return cf.Contest(contest_id, f'Round {contest_id}', 1000 * contest_id, 7200, 'CF',
+                      'FINISHED', None)
+
+
+def _problem(contest_id):
+    return cf.Problem(contest_id, None, 'A', f'Problem {contest_id}', 'PROGRAMMING', None, 800, [])
+
+
+def _rating_change(contest_id, handle):
+    return cf.RatingChange(contest_id, f'Round {contest_id}', handle, 1, 1000 * contest_id,
+                           1500, 1600)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = cache_system2.CacheSystem(CacheDbConn(':memory:'))
+    contests = [_contest(contest_id) for contest_id in (1, 2, 3)]
+    cache.contest_cache.contest_by_id = {contest.id: contest for contest in contests}
+    cache.contest_cache.contests_by_phase['FINISHED'] = contests
+    cache.conn.cache_problemset([_problem(contest.id) for contest in contests])
+    cache.conn.save_rating_changes([_rating_change(1, 'Foo')])
+    return cache
+
+
+def test_update_for_all_keeps_problems_if_codeforces_goes_down(monkeypatch, cache):
+    async def standings(*, contest_id, **kwargs):
+        if contest_id == 1:
+            return _contest(1), [_problem(1)], []
+        raise cf.CodeforcesUnavailableError()
+
+    monkeypatch.setattr(cf.contest, 'standings', standings)
+    with pytest.raises(cf.CodeforcesUnavailableError):
+        asyncio.run(cache.problemset_cache.update_for_all())
+    for contest_id in (1, 2, 3):
+        assert cache.conn.fetch_problemset(contest_id) == [_problem(contest_id)]
+
+
+def test_update_for_all_keeps_problems_of_failed_contests(monkeypatch, cache):
+    async def standings(*, contest_id, **kwargs):
+        if contest_id == 2:
+            raise cf.TrueApiError('Internal error')
+        return _contest(contest_id), [_problem(contest_id)], []
+
+    monkeypatch.setattr(cf.contest, 'standings', standings)
+    with pytest.raises(cache_system2.ProblemsetFetchIncomplete) as ex:
+        asyncio.run(cache.problemset_cache.update_for_all())
+    assert ex.value.contest_ids == [2]
+    for contest_id in (1, 2, 3):
+        assert cache.conn.fetch_problemset(contest_id) == [_problem(contest_id)]
+
+
+def test_fetch_contest_keeps_rating_changes_if_codeforces_goes_down(monkeypatch, cache):
+    async def rating_changes(*, contest_id):
+        raise cf.CodeforcesUnavailableError()
+
+    monkeypatch.setattr(cf.contest, 'ratingChanges', rating_changes)
+    with pytest.raises(cf.CodeforcesUnavailableError):
+        asyncio.run(cache.rating_changes_cache.fetch_contest(1))
+    assert cache.conn.has_rating_changes_saved(1)
+    assert len(cache.conn.get_rating_changes_for_contest(1)) == 1
@@ -0,0 +1,91 @@
+import asyncio
+
+from tle.util import codeforces_common  # Imported before codeforces_api, which needs it loaded.
+from tle.util import codeforces_api as cf
+
+
+def _recording_query():
+    """Returns a query wrapped in cf_singleflight, and the priorities its requests were made
+    with."""
+    priorities = []
+
+    async def query(path, data=None):
+        priorities.append(cf._request_priority.get())
+        await asyncio.sleep(0.01)
+        return object()
+
+    return cf.cf_singleflight(query), priorities
+
+
+def test_singleflight_shares_requests_of_same_priority():
+    query, priorities = _recording_query()
+
+    async def main():
+        with cf.request_priority(cf.Priority.BULK):
+            return await asyncio.gather(query('user.info', {'handles': 'a'}),
+                                        query('user.info', {'handles': 'a'}))
+
+    first, second = asyncio.run(main())
+    assert first is second
+    assert priorities == [cf.Priority.BULK]
+
+
+def test_singleflight_interactive_does_not_join_background_request():
+    query, priorities = _recording_query()
+
+    async def bulk():
+        with cf.request_priority(cf.Priority.BULK):
+            return await query('user.info', {'handles': 'a'})
+
+    async def main():
+        bulk_task = asyncio.create_task(bulk())
+        await asyncio.sleep(0)
+        interactive = await asyncio.gather(query('user.info', {'handles': 'a'}),
+                                           query('user.info', {'handles': 'a'}))
+        return await bulk_task, interactive
+
+    bulk_result, (first, second) = asyncio.run(main())
+    assert first is second and first is not bulk_result
+    assert priorities == [cf.Priority.BULK, cf.Priority.INTERACTIVE]
+
+
+def test_singleflight_background_joins_interactive_request():
+    query, priorities = _recording_query()
+
+    async def bulk():
+        with cf.request_priority(cf.Priority.BULK):
+            return await query('user.info', {'handles': 'a'})
+
+    async def main():
+        interactive_task = asyncio.create_task(query('user.info', {'handles': 'a'}))
+        await asyncio.sleep(0)
+        return await asyncio.gather(interactive_task, bulk())
+
+    interactive_result, bulk_result = asyncio.run(main())
+    assert interactive_result is bulk_result
+    assert priorities == [cf.Priority.INTERACTIVE]
+
+
+def test_fetch_existing_users_requeries_only_chunks_with_missing_handles(monkeypatch):
+    # Long handles, so that they are split into several chunks.
+    handles = [f'{i:04}' + 'x' * 1000 for i in range(200)]
+    missing = {handles[150], handles[190]}
+    chunk_count = len(list(cf.user_info_chunkify(handles)))
+    assert chunk_count > 2
+    queries = []
+
+    async def info(*, handles):
+        queries.append(list(handles))
+        for handle in handles:
+            if handle in missing:
+                raise cf.HandleNotFoundError(
+                    f'handles: User with handle {handle} not found', handle)
+        return [cf.User(handle, *[None] * 12) for handle in handles]
+
+    monkeypatch.setattr(cf.user, 'info', info)
+    found = []
+    users = asyncio.run(cf._fetch_existing_users(handles, on_missing=found.append))
+    assert sorted(found) == sorted(missing)
+    assert list(users) == [handle for handle in handles if handle not in missing]
+    assert all(user.handle == handle for handle, user in users.items())
+    assert len(queries) == chunk_count + len(missing)
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from tle.util import codeforces_common as cf_common
+from tle.util import codeforces_api as cf
+from tle.util import cache_system2
+from tle.util.db import CacheDbConn
+
+
+def _submission(contest_id, verdict='OK'):
+    problem = cf.Problem(contest_id, None, 'A', 'Problem', 'PROGRAMMING', None, 800, [])
+    party = cf.Party(contest_id, [cf.Member('Foo')], 'PRACTICE', None, None, False, None, None)
+    return cf.Submission(1, contest_id, problem, party, 'C++', verdict, 1000, 0)
+
+
+def test_get_visited_contests_waits_for_problemset_cache(monkeypatch):
+    cache = cache_system2.CacheSystem(CacheDbConn(':memory:'))
+    monkeypatch.setattr(cf_common, 'cache2', cache)
+    contest = cf.Contest(5, 'Round 5', 1000, 7200, 'CF', 'FINISHED', None)
+    cache.contest_cache.contest_by_id = {5: contest}
+
+    async def get_submissions(handle):
+        return [_submission(5)]
+
+    monkeypatch.setattr(cache.submission_store, 'get_submissions', get_submissions)
+
+    async def main():
+        task = asyncio.create_task(cf_common.get_visited_contests(['Foo']))
+        await asyncio.sleep(0.01)
+        # The problemset cache has not started, so nothing can be known about the contests yet.
+        assert not task.done()
+        cache.problemset_cache.problem_to_contests[('Problem', 1000)] = [5, 6]
+        cache.ready_by_cache['problemset_cache'].set()
+        return await task
+
+    assert asyncio.run(main()) == {5, 6}
+
+
+def test_get_visited_contests_fails_if_problemset_cache_unavailable(monkeypatch):
+    cache = cache_system2.CacheSystem(CacheDbConn(':memory:'))
+    monkeypatch.setattr(cf_common, 'cache2', cache)
+
+    async def get_submissions(handle):
+        return []
+
+    monkeypatch.setattr(cache.submission_store, 'get_submissions', get_submissions)
+    cache.startup_exception_by_cache['problemset_cache'] = Exception()
+    cache.ready_by_cache['problemset_cache'].set()
+
+    async def main():
+        return await cf_common.get_visited_contests(['Foo'])
+
+    with pytest.raises(cache_system2.CacheUnavailable) as ex:
+        asyncio.run(main())
+    assert ex.value.name == 'problemset_cache'
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from tle.util import codeforces_common  # Imported before cache_system2, which needs it loaded.
+from tle.util import codeforces_api as cf
+from tle.util import cache_system2
+from tle.util.db import CacheDbConn
+
+_CONTEST = cf.Contest(5, 'Round 5', 1000, 7200, 'CF', 'FINISHED', None)
+_EXISTING = ('Alice', 'Bob', 'Carol')
+
+
+def _row(rank, handle):
+    party = cf.Party(5, [cf.Member(handle)], 'CONTESTANT', None, None, False, 1, 1000)
+    return cf.RanklistRow(party, rank, 100.0, 0, [])
+
+
+class _FakeStandings:
+    """contest.standings that fails the whole query on unknown handles, like the API does."""
+    def __init__(self, partial_fails=False):
+        self.partial_fails = partial_fails
+        self.calls = []
+
+    async def __call__(self, *, contest_id, handles=None, show_unofficial=None,
+                       participant_types=None):
+        self.calls.append(list(handles) if handles is not None else None)
+        if handles is None:
+            return _CONTEST, [], [_row(rank, handle) for rank, handle in enumerate(_EXISTING, 1)]
+        if self.partial_fails:
+            raise cf.TrueApiError('Internal error')
+        for handle in handles:
+            if handle not in _EXISTING:
+                raise cf.HandleNotFoundError(
+                    f'handles: User with handle {handle} not found', handle)
+        return _CONTEST, [], [_row(_EXISTING.index(handle) + 1, handle) for handle in handles]
+
+
+@pytest.fixture
+def ranklist_cache(monkeypatch):
+    cache = cache_system2.CacheSystem(CacheDbConn(':memory:')).ranklist_cache
+
+    async def get_rating_snapshot(contest_id, fetch_changes):
+        return cache_system2.RatingSnapshot(is_rated=False, delta_by_handle=None,
+                                            official_rank_by_handle=None, predicted=False,
+                                            fetch_time=0)
+
+    monkeypatch.setattr(cache, '_get_rating_snapshot', get_rating_snapshot)
+    return cache
+
+
+def _ranklist_handles(ranklist):
+    return [row.party.members[0].handle for row in ranklist.standings]
+
+
+def test_partial_ranklist_drops_missing_handle(monkeypatch, ranklist_cache):
+    standings = _FakeStandings()
+    monkeypatch.setattr(cf.contest, 'standings', standings)
+    ranklist = asyncio.run(ranklist_cache.generate_partial_ranklist(
+        5, ['Carol', 'Renamed', 'Alice'], fetch_changes=True))
+    assert _ranklist_handles(ranklist) == ['Alice', 'Carol']
+    assert standings.calls == [['Carol', 'Renamed', 'Alice'], ['Carol', 'Alice']]
+
+
+def test_partial_ranklist_falls_back_to_full_standings(monkeypatch, ranklist_cache):
+    standings = _FakeStandings(partial_fails=True)
+    monkeypatch.setattr(cf.contest, 'standings', standings)
+    ranklist = asyncio.run(ranklist_cache.generate_partial_ranklist(
+        5, ['Bob'], fetch_changes=True))
+    assert _ranklist_handles(ranklist) == list(_EXISTING)
+    assert standings.calls == [['Bob'], None]
+
+
+def test_partial_ranklist_of_only_missing_handles(monkeypatch, ranklist_cache):
+    standings = _FakeStandings()
+    monkeypatch.setattr(cf.contest, 'standings', standings)
+    ranklist = asyncio.run(ranklist_cache.generate_partial_ranklist(
+        5, ['Renamed'], fetch_changes=True))
+    assert _ranklist_handles(ranklist) == list(_EXISTING)
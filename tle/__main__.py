@@ -14,6 +14,8 @@ from matplotlib import pyplot as plt
 
 from tle import constants
 from tle.util import codeforces_common as cf_common
+from tle.util import api_telemetry
+from tle.util import http_client
 from tle.util import discord_common, font_downloader
 
 
@@ -75,6 +77,23 @@ async def main():
     # Restrict bot usage to inside guild channels only.
     bot.add_check(no_dm_check)
 
+    # Attribute the CF API usage of each command to it.
+    @bot.before_invoke
+    async def before_command(ctx):
+        api_telemetry.set_request_source(ctx.command.qualified_name)
+        cf_common.track_stale_data()
+
+    # Warn when a command answered from cached data because Codeforces was unreachable.
+    @bot.after_invoke
+    async def after_command(ctx):
+        as_of = cf_common.get_stale_data_time()
+        if as_of is None:
+            return
+        msg = 'Codeforces is unreachable, some of the data shown may be out of date'
+        if as_of:
+            msg += f' (stale as of <t:{int(as_of)}:R>)'
+        await ctx.send(embed=discord_common.embed_alert(msg))
+
     # cf_common.initialize needs to run first, so it must be set as the bot's
     # on_ready event handler rather than an on_ready listener.
     @discord_common.on_ready_event_once(bot)
@@ -83,7 +102,11 @@ async def main():
         asyncio.create_task(discord_common.presence(bot))
 
     bot.add_listener(discord_common.bot_error_handler, name='on_command_error')
-    await bot.start(token)
+    try:
+        await bot.start(token)
+    finally:
+        await bot.close()
+        await http_client.close()
 
 
 if __name__ == '__main__':
@@ -5,6 +5,7 @@ import traceback
 from discord.ext import commands
 
 from tle import constants
+from tle.util import codeforces_api as cf
 from tle.util import codeforces_common as cf_common
 
 
@@ -50,18 +51,26 @@ class CacheControl(commands.Cog):
     async def ratingchanges(self, ctx, contest_id='missing'):
         """Defaults to 'missing'. Mode 'all' clears existing cached changes.
         Mode 'contest_id' clears existing changes with the given contest id.
+        An interrupted 'all' or 'missing' run is resumed with 'missing'.
         """
         if contest_id not in ('all', 'missing'):
             try:
                 contest_id = int(contest_id)
             except ValueError:
                 return
-        if contest_id == 'all':
-            await ctx.send('This will take a while')
-            count = await cf_common.cache2.rating_changes_cache.fetch_all_contests()
-        elif contest_id == 'missing':
-            await ctx.send('This may take a while')
-            count = await cf_common.cache2.rating_changes_cache.fetch_missing_contests()
+        if contest_id in ('all', 'missing'):
+            message = await ctx.send('This will take a while' if contest_id == 'all'
+                                     else 'This may take a while')
+
+            async def progress(done, total, changes):
+                await message.edit(content=f'Fetched rating changes for {done}/{total} contests, '
+                                           f'{changes} changes saved')
+
+            cache = cf_common.cache2.rating_changes_cache
+            if contest_id == 'all':
+                count = await cache.fetch_all_contests(progress)
+            else:
+                count = await cache.fetch_missing_contests(progress)
         else:
             count = await cf_common.cache2.rating_changes_cache.fetch_contest(contest_id)
         await ctx.send(f'Done, fetched {count} changes and recached handle ratings')
@@ -84,6 +93,24 @@ class CacheControl(commands.Cog):
             count = await cf_common.cache2.problemset_cache.update_for_contest(contest_id)
         await ctx.send(f'Done, fetched {count} problems')
 
+    @cache.command(usage='[handle]')
+    @commands.has_role(constants.TLE_ADMIN)
+    async def submissions(self, ctx, handle=None):
+        """Clears stored submissions of the given handle, or of all handles if none is given, so
+        that they are fetched again with any rejudged verdicts.
+        """
+        count = cf_common.cache2.submission_store.clear(handle)
+        await ctx.send(f'Done, cleared {count} submissions')
+
+    @cache.command(usage='[endpoint]')
+    @commands.has_role(constants.TLE_ADMIN)
+    async def responses(self, ctx, endpoint=None):
+        """Purges cached CF API responses of the given endpoint, e.g. contest.standings, or of
+        all endpoints if none is given.
+        """
+        count = cf.purge_response_cache(endpoint)
+        await ctx.send(f'Done, purged {count} responses')
+
 
 async def setup(bot):
     await bot.add_cog(CacheControl(bot))
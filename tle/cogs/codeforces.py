@@ -1,5 +1,4 @@
 import datetime
-import random
 from typing import List
 import math
 import time
@@ -16,7 +15,9 @@ from tle.util import codeforces_common as cf_common
 from tle.util import discord_common
 from tle.util.db.user_db_conn import Gitgud
 from tle.util import paginator
+from tle.util import problem_picker
 from tle.util import cache_system2
+from tle.util.submission_table import SubmissionTable
 
 
 _GITGUD_NO_SKIP_TIME = 2 * 60 * 60
@@ -115,10 +116,9 @@ class Codeforces(commands.Cog):
         rating = min(3000, rating)
         resp = await cf.user.rating(handle=handle)
         contests = {change.contestId for change in resp}
-        submissions = await cf.user.status(handle=handle)
+        submissions = await cf_common.cache2.submission_store.get_submissions(handle)
         solved = {sub.problem.name for sub in submissions if sub.verdict == 'OK'}
-        problems = [prob for prob in cf_common.cache2.problem_cache.problems
-                    if prob.name not in solved and prob.contestId in contests]
+        problems = cf_common.cache2.problem_cache.query(contest_ids=contests, exclude_names=solved)
 
         if not problems:
             raise CodeforcesCogError('Problems not found within the search parameters')
@@ -165,24 +165,14 @@ class Codeforces(commands.Cog):
                 else:
                     erating = srating
 
-        submissions = await cf.user.status(handle=handle)
-        solved = {sub.problem.name for sub in submissions if sub.verdict == 'OK'}
-
-        problems = [prob for prob in cf_common.cache2.problem_cache.problems
-                    if prob.rating >= srating and prob.rating <= erating and prob.name not in solved
-                    and not cf_common.is_contest_writer(prob.contestId, handle)
-                    and prob.matches_all_tags(tags)
-                    and not prob.matches_any_tag(bantags)]
-
-        if not problems:
+        picker = cf_common.cache2.problem_picker
+        candidates = await picker.get_candidates((handle,), done=problem_picker.ACCEPTED,
+                                                 rlo=srating, rhi=erating, tags=tags, bantags=bantags,
+                                                 exclude_writers=(handle,))
+        problem = picker.pick(candidates, weight=3)
+        if problem is None:
             raise CodeforcesCogError('Problems not found within the search parameters')
 
-        problems.sort(key=lambda problem: cf_common.cache2.contest_cache.get_contest(
-            problem.contestId).startTimeSeconds)
-
-        choice = max([random.randrange(len(problems)) for _ in range(3)])
-        problem = problems[choice]
-
         title = f'{problem.index}. {problem.name}'
         desc = cf_common.cache2.contest_cache.get_contest(problem.contestId).name
         embed = discord.Embed(title=title, url=problem.url, description=desc)
@@ -204,9 +194,8 @@ class Codeforces(commands.Cog):
         args = filt.parse(args)
         handles = args or ('!' + str(ctx.author),)
         handles = await cf_common.resolve_handles(ctx, self.converter, handles)
-        submissions = [await cf.user.status(handle=handle) for handle in handles]
-        submissions = [sub for subs in submissions for sub in subs]
-        submissions = filt.filter_subs(submissions)
+        submissions = await cf.fan_out(cf_common.cache2.submission_store.get_submissions, handles)
+        submissions = list(filt.filter_subs(SubmissionTable.concat(submissions)))
 
         if not submissions:
             raise CodeforcesCogError('Submissions not found within the search parameters')
@@ -256,37 +245,19 @@ class Codeforces(commands.Cog):
 
         handles = handles or ('!' + str(ctx.author),)
         handles = await cf_common.resolve_handles(ctx, self.converter, handles)
-        resp = [await cf.user.status(handle=handle) for handle in handles]
-        submissions = [sub for user in resp for sub in user]
-        solved = {sub.problem.name for sub in submissions}
         info = await cf.user.info(handles=handles)
         rating = int(round(sum(user.effective_rating for user in info) / len(handles), -2))
         rating += delta
         rating = max(800, rating)
         rating = min(3500, rating)
-        problems = [prob for prob in cf_common.cache2.problem_cache.problems
-                    if abs(prob.rating - rating) <= 300 and prob.name not in solved
-                    and not any(cf_common.is_contest_writer(prob.contestId, handle) for handle in handles)
-                    and not cf_common.is_nonstandard_problem(prob)
-                    and prob.matches_all_tags(tags)
-                    and not prob.matches_any_tag(bantags)]
-
-        if len(problems) < 4:
+        picker = cf_common.cache2.problem_picker
+        candidates = await picker.get_candidates(handles, rlo=rating - 300, rhi=rating + 300, tags=tags,
+                                                 bantags=bantags, exclude_writers=handles, standard_only=True)
+        problems = picker.pick_distinct(candidates, 4, weight=2)
+        if problems is None:
             raise CodeforcesCogError('Problems not found within the search parameters')
 
-        problems.sort(key=lambda problem: cf_common.cache2.contest_cache.get_contest(
-            problem.contestId).startTimeSeconds)
-
-        choices = []
-        for i in range(4):
-            k = max(random.randrange(len(problems) - i) for _ in range(2))
-            for c in choices:
-                if k >= c:
-                    k += 1
-            choices.append(k)
-            choices.sort()
-
-        problems = sorted([problems[k] for k in choices], key=lambda problem: problem.rating)
+        problems.sort(key=lambda problem: problem.rating)
         msg = '\n'.join(f'{"ABCD"[i]}: [{p.name}]({p.url}) [{p.rating}]' for i, p in enumerate(problems))
         str_handles = '`, `'.join(handles)
         embed = discord_common.cf_color_embed(description=msg)
@@ -318,8 +289,6 @@ class Codeforces(commands.Cog):
         rating = round(user.effective_rating, -2)
         rating = max(1100, rating)
         rating = min(3000, rating)
-        submissions = await cf.user.status(handle=handle)
-        solved = {sub.problem.name for sub in submissions}
         noguds = cf_common.user_db.get_noguds(ctx.message.author.id)
         delta = 0
         tags = cf_common.parse_tags(args, prefix='+')
@@ -339,29 +308,17 @@ class Codeforces(commands.Cog):
 
         await self._validate_gitgud_status(ctx, delta)
         
-        problems = [prob for prob in cf_common.cache2.problem_cache.problems
-                    if (prob.rating == rating + delta 
-                    and prob.name not in solved 
-                    and prob.name not in noguds)
-                    and prob.matches_all_tags(tags)
-                    and not prob.matches_any_tag(bantags)]
-                        
-
-        def check(problem):
-            return (not cf_common.is_nonstandard_problem(problem) and
-                    not cf_common.is_contest_writer(problem.contestId, handle))
-
-        problems = list(filter(check, problems))
-        if not problems:
+        picker = cf_common.cache2.problem_picker
+        candidates = await picker.get_candidates((handle,), rlo=rating + delta, rhi=rating + delta, tags=tags,
+                                                 bantags=bantags, exclude_names=noguds,
+                                                 exclude_writers=(handle,), standard_only=True)
+        problem = picker.pick(candidates, weight=5)
+        if problem is None:
             raise CodeforcesCogError('No problem to assign')
 
-        problems.sort(key=lambda problem: cf_common.cache2.contest_cache.get_contest(
-            problem.contestId).startTimeSeconds)
-
-        choice = max(random.randrange(len(problems)) for _ in range(5))
         if tags or bantags:
             delta = delta - 200
-        await self._gitgud(ctx, handle, problems[choice], delta)
+        await self._gitgud(ctx, handle, problem, delta)
 
     @commands.command(brief='Print user gitgud history')
     async def gitlog(self, ctx, member: discord.Member = None):
@@ -437,7 +394,7 @@ class Codeforces(commands.Cog):
         if not active:
             raise CodeforcesCogError(f'You do not have an active challenge')
 
-        submissions = await cf.user.status(handle=handle)
+        submissions = await cf_common.cache2.submission_store.get_submissions(handle)
         solved = {sub.problem.name for sub in submissions if sub.verdict == 'OK'}
 
         challenge_id, issue_time, name, contestId, index, delta = active
@@ -537,6 +494,7 @@ class Codeforces(commands.Cog):
         paginator.paginate(self.bot, ctx.channel, pages, wait_time=5 * 60, set_pagenum_footers=True)
 
     @commands.command(brief="Display unsolved rounds closest to completion", usage='[keywords]')
+    @cf_common.caches_ready('problemset_cache')
     async def fullsolve(self, ctx, *args: str):
         """Displays a list of contests, sorted by number of unsolved problems.
         Contest names matching any of the provided tags will be considered. e.g ;fullsolve +edu"""
@@ -549,7 +507,7 @@ class Codeforces(commands.Cog):
 
         # subs_by_contest_id contains contest_id mapped to [list of problem.name]
         subs_by_contest_id = defaultdict(set)
-        for sub in await cf.user.status(handle=handle):
+        for sub in await cf_common.cache2.submission_store.get_submissions(handle):
             if sub.verdict == 'OK':
                 try:
                     contest = cf_common.cache2.contest_cache.get_contest(sub.problem.contestId)
@@ -124,8 +124,7 @@ class Contests(commands.Cog):
         self._update_task.start()
         self._watch_rated_vcs_task.start()
 
-    @tasks.task_spec(name='ContestCogUpdate',
-                     waiter=tasks.Waiter.for_event(events.ContestListRefresh))
+    @tasks.task_spec(name='ContestCogUpdate')
     async def _update_task(self, _):
         contest_cache = cf_common.cache2.contest_cache
         self.future_contests = contest_cache.get_contests_in_phase('BEFORE')
@@ -141,12 +140,23 @@ class Contests(commands.Cog):
         self.finished_contests = self.finished_contests[:_FINISHED_CONTESTS_LIMIT]
 
         self.logger.info(f'Refreshed cache')
-        self.start_time_map.clear()
+        start_time_map = defaultdict(list)
         for contest in self.future_contests:
             if not cf_common.is_nonstandard_contest(contest):
                 # Exclude non-standard contests from reminders.
-                self.start_time_map[contest.startTimeSeconds].append(contest)
-        self._reschedule_all_tasks()
+                start_time_map[contest.startTimeSeconds].append(contest)
+        # Reminders only need to be rescheduled if upcoming contests were added, removed or moved.
+        if start_time_map != self.start_time_map:
+            self.start_time_map = start_time_map
+            self._reschedule_all_tasks()
+
+    @_update_task.waiter(run_first=True)
+    async def _update_task_waiter(self):
+        cache2 = cf_common.cache2
+        if self.future_contests is None and cache2 is not None and cache2.contest_cache.contests:
+            # The contests were loaded before this task started, so there is nothing to wait for.
+            return
+        await cf_common.event_sys.wait_for(events.ContestsChanged)
 
     def _reschedule_all_tasks(self):
         for guild in self.bot.guilds:
@@ -483,8 +493,9 @@ class Contests(commands.Cog):
         except cache_system2.RanklistNotMonitored:
             if contest.phase == 'BEFORE':
                 raise ContestCogError(f'Contest `{contest.id} | {contest.name}` has not started')
-            ranklist = await cf_common.cache2.ranklist_cache.generate_ranklist(contest.id, fetch_changes=True,
-                                                                               show_unofficial=not show_official)
+            # Only the rows of the handles shown are fetched.
+            ranklist = await cf_common.cache2.ranklist_cache.generate_partial_ranklist(
+                contest.id, handles, fetch_changes=True, show_unofficial=not show_official)
 
         await wait_msg.delete()
         await ctx.channel.send(embed=self._make_contest_embed_for_ranklist(ranklist))
@@ -626,12 +637,12 @@ class Contests(commands.Cog):
         ranklist = await cf_common.cache2.ranklist_cache.generate_vc_ranklist(vc.contest_id, handle_to_member_id)
 
         async def has_running_subs(handle):
-            return [sub for sub in await cf.user.status(handle=handle)
+            return [sub for sub in await cf_common.cache2.submission_store.get_submissions(handle)
                     if sub.verdict == 'TESTING' and
                        sub.problem.contestId == vc.contest_id and
                        sub.relativeTimeSeconds <= vc.finish_time - vc.start_time]
 
-        running_subs_flag = any([await has_running_subs(handle) for handle in handles])
+        running_subs_flag = any(await cf.fan_out(has_running_subs, handles))
         if running_subs_flag:
             msg = 'Some submissions are still being judged'
             await channel.send(embed=discord_common.embed_alert(msg), delete_after=_WATCHING_RATED_VC_WAIT_TIME)
@@ -661,8 +672,9 @@ class Contests(commands.Cog):
         ongoing_rated_vcs = cf_common.user_db.get_ongoing_rated_vc_ids()
         if ongoing_rated_vcs is None:
             return
-        for rated_vc_id in ongoing_rated_vcs:
-            await self._watch_rated_vc(rated_vc_id)
+        with cf.request_priority(cf.Priority.MONITOR):
+            for rated_vc_id in ongoing_rated_vcs:
+                await self._watch_rated_vc(rated_vc_id)
 
     @commands.command(brief='Unregister this user from an ongoing ratedvc', usage='@user')
     @commands.has_any_role(constants.TLE_ADMIN, constants.TLE_MODERATOR)
@@ -1,4 +1,3 @@
-import random
 import datetime
 import discord
 import asyncio
@@ -14,6 +13,7 @@ from tle.util.db.user_db_conn import Duel, DuelType, Winner
 from tle.util import codeforces_api as cf
 from tle.util import codeforces_common as cf_common
 from tle.util import paginator
+from tle.util import problem_picker
 from tle.util import discord_common
 from tle.util import table
 from tle.util import graph_common as gc
@@ -125,8 +125,9 @@ class Dueling(commands.Cog):
     
     async def _check_ongoing_duels(self):
         try:
-            for guild in self.bot.guilds:
-                await self._check_ongoing_duels_for_guild(guild)    
+            with cf.request_priority(cf.Priority.MONITOR):
+                for guild in self.bot.guilds:
+                    await self._check_ongoing_duels_for_guild(guild)
         except Exception as exception:
             # we need to handle exceptions on our own -> put them into server log for now (TODO: logging channel would be better)
             msg = 'Ignoring exception in command {}:'.format("_check_round_complete")
@@ -221,7 +222,8 @@ class Dueling(commands.Cog):
         userids = [challenger_id, challengee_id]
         handles = [cf_common.user_db.get_handle(
             userid, ctx.guild.id) for userid in userids]
-        submissions = [await cf.user.status(handle=handle) for handle in handles]
+        picker = cf_common.cache2.problem_picker
+        done_bits = await picker.get_done_bits(handles, problem_picker.ATTEMPTED)
 
         if not cf_common.user_db.is_duelist(challenger_id, ctx.guild.id):
             cf_common.user_db.register_duelist(challenger_id, ctx.guild.id)
@@ -252,34 +254,24 @@ class Dueling(commands.Cog):
         else:
             dtype = DuelType.UNOFFICIAL if unofficial else DuelType.OFFICIAL
         
-        solved = {
-            sub.problem.name for subs in submissions for sub in subs if sub.verdict != 'COMPILATION_ERROR'}
         seen = {name for userid in userids for name,
                 in cf_common.user_db.get_duel_problem_names(userid, ctx.guild.id)} # maybe guild id is not needed here
 
-        def get_problems(rating):
-            return [prob for prob in cf_common.cache2.problem_cache.problems
-                    if prob.rating == rating and prob.name not in solved and prob.name not in seen
-                    and not any(cf_common.is_contest_writer(prob.contestId, handle) for handle in handles)
-                    and not cf_common.is_nonstandard_problem(prob)
-                    and prob.matches_all_tags(tags)
-                    and not prob.matches_any_tag(bantags)]
+        def get_candidates(rating):
+            return cf_common.cache2.problem_cache.query_bits(rlo=rating, rhi=rating, tags=tags, bantags=bantags,
+                                                             exclude_names=seen, exclude_writers=handles,
+                                                             standard_only=True) & ~done_bits
 
-        for problems in map(get_problems, range(rating, 400, -100)):
-            if problems:
+        for candidates in map(get_candidates, range(rating, 400, -100)):
+            if candidates:
                 break
 
         rstr = f'{rating} rated ' if rating else ''
-        if not problems:
+        problem = picker.pick(candidates, weight=5)
+        if problem is None:
             raise DuelCogError(
                 f'No unsolved {rstr}problems left for {ctx.author.mention} vs {opponent.mention}.')
 
-        problems.sort(key=lambda problem: cf_common.cache2.contest_cache.get_contest(
-            problem.contestId).startTimeSeconds)
-
-        choice = max(random.randrange(len(problems)) for _ in range(5))
-        problem = problems[choice]
-
         issue_time = datetime.datetime.now().timestamp()
         duelid = cf_common.user_db.create_duel(
             challenger_id, challengee_id, issue_time, problem, dtype, ctx.guild.id)
@@ -375,7 +367,7 @@ class Dueling(commands.Cog):
         await ctx.send(f'Starting duel: {challenger.mention} vs {ctx.author.mention}', embed=embed)
     
     async def _get_solve_time(self, handle, contest_id, index):
-        subs = [sub for sub in await cf.user.status(handle=handle)
+        subs = [sub for sub in await cf_common.cache2.submission_store.get_submissions(handle)
                 if (sub.verdict == 'OK' or sub.verdict == 'TESTING')
                 and sub.problem.contestId == contest_id
                 and sub.problem.index == index]
@@ -471,8 +463,8 @@ class Dueling(commands.Cog):
             return
 
         # get problem including rating
-        problem = [prob for prob in cf_common.cache2.problem_cache.problems
-                   if prob.name == problem_name]
+        problem = cf_common.cache2.problem_cache.problem_by_name.get(problem_name)
+        problem = [problem] if problem else []
 
         adjusted = False
         coeff = 1.0
@@ -78,10 +78,12 @@ def _plot_rating_by_contest(resp, mark='o'):
 
 
 def _classify_submissions(submissions):
-    solved_by_type = {sub_type: [] for sub_type in cf.Party.PARTICIPANT_TYPES}
-    for submission in submissions:
-        solved_by_type[submission.author.participantType].append(submission)
-    return solved_by_type
+    positions_by_type = {sub_type: [] for sub_type in cf.Party.PARTICIPANT_TYPES}
+    party_pool = submissions.party_pool
+    for i, party_code in enumerate(submissions.party_codes):
+        positions_by_type[party_pool[party_code].participantType].append(i)
+    return {sub_type: submissions.take(positions)
+            for sub_type, positions in positions_by_type.items()}
 
 
 def _plot_scatter(regular, practice, virtual, point_size):
@@ -240,7 +242,7 @@ class Graphs(commands.Cog):
         args = filt.parse(args)
         handles = args or ('!' + str(ctx.author),)
         handles = await cf_common.resolve_handles(ctx, self.converter, handles)
-        resp = [await cf.user.rating(handle=handle) for handle in handles]
+        resp = await cf.fan_out(lambda handle: cf.user.rating(handle=handle), handles)
         resp = [filt.filter_rating_changes(rating_changes) for rating_changes in resp]
 
         if not any(resp):
@@ -301,7 +303,7 @@ class Graphs(commands.Cog):
         args = filt.parse(args)
         handles = args or ('!' + str(ctx.author),)
         handles = await cf_common.resolve_handles(ctx, self.converter, handles)
-        resp = [await cf.user.rating(handle=handle) for handle in handles]
+        resp = await cf.fan_out(lambda handle: cf.user.rating(handle=handle), handles)
         # extract last rating before corrections
         current_ratings = [rating_changes[-1].newRating if rating_changes else 'Unrated' for rating_changes in resp]
         resp = cf.user.correct_rating_changes(resp=resp)
@@ -375,7 +377,7 @@ class Graphs(commands.Cog):
         contest_ids = [change.contestId for change in ratingchanges]
         
         subs_by_contest_id = {contest_id: [] for contest_id in contest_ids}
-        for sub in await cf.user.status(handle=handle):
+        for sub in await cf_common.cache2.submission_store.get_submissions(handle):
             if sub.contestId in subs_by_contest_id:
                 subs_by_contest_id[sub.contestId].append(sub)
 
@@ -404,7 +406,7 @@ class Graphs(commands.Cog):
         args = filt.parse(args)
         handles = args or ('!' + str(ctx.author),)
         handles = await cf_common.resolve_handles(ctx, self.converter, handles)
-        resp = [await cf.user.status(handle=handle) for handle in handles]
+        resp = await cf.fan_out(cf_common.cache2.submission_store.get_submissions, handles)
         all_solved_subs = [filt.filter_subs(submissions) for submissions in resp]
 
         if not any(all_solved_subs):
@@ -416,7 +418,7 @@ class Graphs(commands.Cog):
         if len(handles) == 1:
             # Display solved problem separately by type for a single user.
             handle, solved_by_type = handles[0], _classify_submissions(all_solved_subs[0])
-            all_ratings = [[sub.problem.rating for sub in solved_by_type[sub_type]]
+            all_ratings = [[problem.rating for problem in solved_by_type[sub_type].problems()]
                            for sub_type in filt.types]
 
             nice_names = nice_sub_type(filt.types)
@@ -431,7 +433,7 @@ class Graphs(commands.Cog):
                        loc='upper right')
 
         else:
-            all_ratings = [[sub.problem.rating for sub in solved_subs]
+            all_ratings = [[problem.rating for problem in solved_subs.problems()]
                            for solved_subs in all_solved_subs]
             labels = [gc.StrWrap(f'{handle}: {len(ratings)}')
                       for handle, ratings in zip(handles, all_ratings)]
@@ -467,7 +469,7 @@ class Graphs(commands.Cog):
 
         handles = handles or ['!' + str(ctx.author)]
         handles = await cf_common.resolve_handles(ctx, self.converter, handles)
-        resp = [await cf.user.status(handle=handle) for handle in handles]
+        resp = await cf.fan_out(cf_common.cache2.submission_store.get_submissions, handles)
         all_solved_subs = [filt.filter_subs(submissions) for submissions in resp]
 
         if not any(all_solved_subs):
@@ -478,7 +480,7 @@ class Graphs(commands.Cog):
         plt.ylabel('Number solved')
         if len(handles) == 1:
             handle, solved_by_type = handles[0], _classify_submissions(all_solved_subs[0])
-            all_times = [[dt.datetime.fromtimestamp(sub.creationTimeSeconds) for sub in solved_by_type[sub_type]]
+            all_times = [list(map(dt.datetime.fromtimestamp, solved_by_type[sub_type].creation_times))
                          for sub_type in filt.types]
 
             nice_names = nice_sub_type(filt.types)
@@ -497,7 +499,7 @@ class Graphs(commands.Cog):
             total = sum(map(len, all_times))
             plt.legend(title=f'{handle}: {total}', title_fontsize=plt.rcParams['legend.fontsize'])
         else:
-            all_times = [[dt.datetime.fromtimestamp(sub.creationTimeSeconds) for sub in solved_subs]
+            all_times = [list(map(dt.datetime.fromtimestamp, solved_subs.creation_times))
                          for solved_subs in all_solved_subs]
 
             # NOTE: matplotlib ignores labels that begin with _
@@ -537,7 +539,7 @@ class Graphs(commands.Cog):
         args = filt.parse(args)
         handles = args or ('!' + str(ctx.author),)
         handles = await cf_common.resolve_handles(ctx, self.converter, handles)
-        resp = [await cf.user.status(handle=handle) for handle in handles]
+        resp = await cf.fan_out(cf_common.cache2.submission_store.get_submissions, handles)
         all_solved_subs = [filt.filter_subs(submissions) for submissions in resp]
 
         if not any(all_solved_subs):
@@ -547,7 +549,7 @@ class Graphs(commands.Cog):
         plt.xlabel('Time')
         plt.ylabel('Cumulative solve count')
 
-        all_times = [[dt.datetime.fromtimestamp(sub.creationTimeSeconds) for sub in solved_subs]
+        all_times = [list(map(dt.datetime.fromtimestamp, solved_subs.creation_times))
                      for solved_subs in all_solved_subs]
         for times in all_times:
             cumulative_solve_count = list(range(1, len(times)+1)) + [len(times)]
@@ -593,11 +595,11 @@ class Graphs(commands.Cog):
         handle, = await cf_common.resolve_handles(ctx, self.converter, (handle,))
         rating_resp = [await cf.user.rating(handle=handle)]
         rating_resp = [filt.filter_rating_changes(rating_changes) for rating_changes in rating_resp]
-        submissions = filt.filter_subs(await cf.user.status(handle=handle))
+        submissions = filt.filter_subs(await cf_common.cache2.submission_store.get_submissions(handle))
 
         def extract_time_and_rating(submissions):
-            return [(dt.datetime.fromtimestamp(sub.creationTimeSeconds), sub.problem.rating)
-                    for sub in submissions]
+            return [(dt.datetime.fromtimestamp(time), problem.rating)
+                    for time, problem in zip(submissions.creation_times, submissions.problems())]
 
         if not any(submissions):
             raise GraphCogError(f'No submissions for user `{handle}`')
@@ -707,6 +709,7 @@ class Graphs(commands.Cog):
                                 title='Rating distribution of server members')
 
     @plot.command(brief='Show Codeforces rating distribution', usage='[normal/log] [active/all] [contest_cutoff=5]')
+    @cf_common.caches_ready('rating_changes_cache')
     async def cfdistrib(self, ctx, mode: str = 'log', activity = 'active', contest_cutoff: int = 5):
         """Plots rating distribution of either active or all users on Codeforces, in either normal or log scale.
         Default mode is log, default activity is active (competed in last 90 days)
@@ -729,6 +732,7 @@ class Graphs(commands.Cog):
                                 title=title)
 
     @plot.command(brief='Show percentile distribution on codeforces', usage='[+zoom] [+nomarker] [handles...] [+exact]')
+    @cf_common.caches_ready('rating_changes_cache')
     async def centile(self, ctx, *args: str):
         """Show percentile distribution of codeforces and mark given handles in the plot. If +zoom and handles are given, it zooms to the neighborhood of the handles."""
         (zoom, nomarker, exact), args = cf_common.filter_flags(args, ['+zoom', '+nomarker', '+exact'])
@@ -1052,7 +1056,7 @@ class Graphs(commands.Cog):
 
         handles = handles or ['!' + str(ctx.author)]
         handles = await cf_common.resolve_handles(ctx, self.converter, handles)
-        resp = [await cf.user.status(handle=handle) for handle in handles]
+        resp = await cf.fan_out(cf_common.cache2.submission_store.get_submissions, handles)
         all_solved_subs = [filt.filter_subs(submissions) for submissions in resp]
 
         plt.clf()
@@ -1065,12 +1069,16 @@ class Graphs(commands.Cog):
             scatter_points = []  # only matters if +scatter
 
             solved_by_contest = collections.defaultdict(lambda: [])
-            for submission in submissions:
+            for contest_id, relative_time, problem in zip(submissions.column('contest_ids'),
+                                                          submissions.column('relative_times'),
+                                                          submissions.problems()):
+                if relative_time is None or problem.rating is None:
+                    continue
                 # [solve_time, problem rating, problem index] for each solved problem
-                solved_by_contest[submission.contestId].append([
-                    submission.relativeTimeSeconds,
-                    submission.problem.rating,
-                    submission.problem.index
+                solved_by_contest[contest_id].append([
+                    relative_time,
+                    problem.rating,
+                    problem.index
                 ])
 
             time_by_rating = collections.defaultdict(lambda: [])
@@ -3,6 +3,7 @@ import asyncio
 import contextlib
 import logging
 import math
+import time
 import html
 import cairo
 import gi
@@ -39,6 +40,7 @@ _PRETTY_HANDLES_PER_PAGE = 10
 _TOP_DELTAS_COUNT = 10
 _MAX_RATING_CHANGES_PER_EMBED = 15
 _UPDATE_HANDLE_STATUS_INTERVAL = 6 * 60 * 60  # 6 hours
+_UNMAGIC_PROGRESS_INTERVAL = 10  # seconds
 
 _DIVISION_RATING_LOW  = (2100, 1600, -1000)
 _DIVISION_RATING_HIGH = (9999, 2099,  1599)
@@ -402,8 +404,7 @@ class Handles(commands.Cog):
         users = await cf.user.info(handles=[handle])
         invoker = str(ctx.author)
         handle = users[0].handle
-        problems = [prob for prob in cf_common.cache2.problem_cache.problems
-                    if prob.rating <= 1200]
+        problems = cf_common.cache2.problem_cache.query(rhi=1200)
         problem = random.choice(problems)
         await ctx.send(f'`{invoker}`, submit a compile error to <{problem.url}> within 60 seconds')
         await asyncio.sleep(60)
@@ -479,26 +480,57 @@ class Handles(commands.Cog):
             member = ctx.guild.get_member(user_id)
             handles.append(handle)
             rev_lookup[handle] = member
-        await self._unmagic_handles(ctx, handles, rev_lookup)
-
-    async def _unmagic_handles(self, ctx, handles, rev_lookup):
-        handle_cf_user_mapping = await cf.resolve_redirects(handles)
-        mapping = {(rev_lookup[handle], handle): cf_user
-                   for handle, cf_user in handle_cf_user_mapping.items()}
-        summary_embed = await self._fix_and_report(ctx, mapping)
-        await ctx.send(embed=summary_embed)
-
-    async def _fix_and_report(self, ctx, redirections):
-        fixed = []
-        failed = []
-        for (member, handle), cf_user in redirections.items():
-            if not cf_user:
+        await self._unmagic_handles(ctx, handles, rev_lookup, resume=True)
+
+    async def _unmagic_handles(self, ctx, handles, rev_lookup, *, resume=False):
+        """Fixes each handle as soon as its redirect is resolved. With `resume`, the handles
+        checked so far are saved, and a run interrupted by a crash or restart continues from
+        where it stopped instead of starting over.
+        """
+        progress = cf_common.user_db.get_unmagic_progress(ctx.guild.id) if resume else {}
+        fixed = [(handle, new_handle) for handle, new_handle in progress.items()
+                 if new_handle is not None and new_handle != handle]
+        failed = [handle for handle, new_handle in progress.items() if new_handle is None]
+        checked = set(progress) | set(progress.values())
+        handles = [handle for handle in handles if handle not in checked]
+
+        status_msg = None
+        if resume:
+            status_msg = await ctx.send(embed=discord_common.embed_neutral(
+                f'Checking {len(handles)} handles' + (' (resumed)' if progress else '')))
+        last_report = time.monotonic()
+
+        done = 0
+        async for handle, cf_user in cf.iter_redirects(handles):
+            done += 1
+            new_handle = cf_user.handle if cf_user else None
+            if cf_user is None:
                 failed.append(handle)
-            else:
-                await self._set(ctx, member, cf_user)
-                fixed.append((handle, cf_user.handle))
+            elif cf_user.handle != handle:
+                try:
+                    await self._set(ctx, rev_lookup[handle], cf_user)
+                    fixed.append((handle, cf_user.handle))
+                except HandleCogError as e:
+                    self.logger.warning(f'Could not fix handle {handle}: {e}')
+                    failed.append(handle)
+                    new_handle = None
+            if resume:
+                cf_common.user_db.save_unmagic_progress(ctx.guild.id, handle, new_handle)
+            now = time.monotonic()
+            if status_msg and now - last_report >= _UNMAGIC_PROGRESS_INTERVAL:
+                last_report = now
+                await status_msg.edit(embed=discord_common.embed_neutral(
+                    f'Checked {done}/{len(handles)} handles, '
+                    f'{len(fixed)} fixed, {len(failed)} failed so far'))
+
+        if resume:
+            cf_common.user_db.clear_unmagic_progress(ctx.guild.id)
+            await status_msg.edit(embed=discord_common.embed_neutral(
+                f'Checked {done}/{len(handles)} handles'))
+        await ctx.send(embed=self._unmagic_summary(fixed, failed))
 
-        # Return summary embed
+    @staticmethod
+    def _unmagic_summary(fixed, failed):
         lines = []
         if not fixed and not failed:
             return discord_common.embed_success('No handles updated')
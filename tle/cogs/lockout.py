@@ -1,5 +1,4 @@
 
-import random
 import discord
 import asyncio
 import time
@@ -17,6 +16,7 @@ from tle.util import codeforces_api as cf
 from tle.util import discord_common
 from tle.util import elo
 from tle.util import paginator
+from tle.util import problem_picker
 
 logger = logging.getLogger(__name__)
 
@@ -67,8 +67,9 @@ class Round(commands.Cog):
         asyncio.create_task(self._check_ongoing_rounds())
 
     async def _check_ongoing_rounds(self):
-        for guild in self.bot.guilds:
-            await self._check_ongoing_rounds_for_guild(guild)    
+        with cf.request_priority(cf.Priority.MONITOR):
+            for guild in self.bot.guilds:
+                await self._check_ongoing_rounds_for_guild(guild)
         await asyncio.sleep(AUTO_UPDATE_TIME)
         asyncio.create_task(self._check_ongoing_rounds()) 
 
@@ -194,7 +195,8 @@ class Round(commands.Cog):
 
         problemEntries = round_info.problems.split()
         def get_problem(problemContestId, problemIndex):
-            return [prob for prob in cf_common.cache2.problem_cache.problems if prob.contest_identifier == f'{problemContestId}{problemIndex}' ]
+            problem = cf_common.cache2.problem_cache.problem_by_contest_index.get((int(problemContestId), problemIndex))
+            return [problem] if problem else []
 
         problems = [get_problem(prob.split('/')[0], prob.split('/')[1]) if prob != '0' else None for prob in problemEntries]
 
@@ -257,21 +259,13 @@ class Round(commands.Cog):
         embed.add_field(name='Channel', value=channel.mention)
         await ctx.send(embed=embed)
 
-    async def _pick_problem(self, handles, solved, rating, selected):
-        def get_problems(rating):
-            return [prob for prob in cf_common.cache2.problem_cache.problems
-                    if prob.rating == rating and prob.name not in solved
-                    and not any(cf_common.is_contest_writer(prob.contestId, handle) for handle in handles)
-                    and not cf_common.is_nonstandard_problem(prob)
-                    and prob not in selected]
-
-        problems = get_problems(rating)
-        problems.sort(key=lambda problem: cf_common.cache2.contest_cache.get_contest(problem.contestId).startTimeSeconds)
-
-        if not problems:
+    async def _pick_problem(self, handles, done_bits, rating, selected):
+        candidates = cf_common.cache2.problem_cache.query_bits(rlo=rating, rhi=rating,
+                                                               exclude_names=[prob.name for prob in selected],
+                                                               exclude_writers=handles, standard_only=True)
+        problem = cf_common.cache2.problem_picker.pick(candidates & ~done_bits, weight=5)
+        if problem is None:
             raise RoundCogError(f'Not enough unsolved problems of rating {rating} available.')
-        choice = max(random.randrange(len(problems)) for _ in range(5)) 
-        problem = problems[choice]            
         return problem
 
 
@@ -308,11 +302,10 @@ class Round(commands.Cog):
         repeat = await self._get_time_response(self.bot, ctx, f"{ctx.author.mention} do you want a new problem to appear when someone solves a problem (type 1 for yes and 0 for no)", 30, ctx.author, [0, 1])
 
         # pick problems
-        submissions = [await cf.user.status(handle=handle) for handle in handles]        
-        solved = {sub.problem.name for subs in submissions for sub in subs if sub.verdict != 'COMPILATION_ERROR'} 
+        done_bits = await cf_common.cache2.problem_picker.get_done_bits(handles, problem_picker.ATTEMPTED)
         selected = []
         for rating in ratings:
-            problem = await self._pick_problem(handles, solved, rating, selected)
+            problem = await self._pick_problem(handles, done_bits, rating, selected)
             selected.append(problem)
 
         await ctx.send(embed=discord.Embed(description="Starting the round...", color=discord.Color.green()))
@@ -407,7 +400,8 @@ class Round(commands.Cog):
         judging, over, updated = False, False, False
 
         updates = []
-        recent_subs = [await cf.user.status(handle=handle, count=RECENT_SUBS_LIMIT) for handle in handles]
+        recent_subs = await cf.fan_out(
+            lambda handle: cf.user.status(handle=handle, count=RECENT_SUBS_LIMIT), handles)
         for i in range(len(problems)):
             # Problem was solved before and no replacement -> skip
             if problems[i] == '0':
@@ -437,9 +431,8 @@ class Round(commands.Cog):
             # Get new problem if repeat is set to 1
             if len(solved) > 0 and round_info.repeat == 1:
                 try: 
-                    submissions = [await cf.user.status(handle=handle) for handle in handles]        
-                    solved = {sub.problem.name for subs in submissions for sub in subs if sub.verdict != 'COMPILATION_ERROR'} 
-                    problem = await self._pick_problem(handles, solved, rating[i], [])
+                    done_bits = await cf_common.cache2.problem_picker.get_done_bits(handles, problem_picker.ATTEMPTED)
+                    problem = await self._pick_problem(handles, done_bits, rating[i], [])
                     problems[i] = f'{problem.contestId}/{problem.index}'
                 except RoundCogError:
                     problems[i] = '0'
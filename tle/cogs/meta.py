@@ -1,12 +1,18 @@
+import io
+import json
 import os
 import subprocess
 import sys
 import time
 import textwrap
+from collections import defaultdict, Counter
 
+import discord
 from discord.ext import commands
 
 from tle import constants
+from tle.util import api_telemetry
+from tle.util import codeforces_api as cf
 from tle.util.codeforces_common import pretty_time_format
 
 RESTART = 42
@@ -98,6 +104,61 @@ class Meta(commands.Cog):
                 for guild in self.bot.guilds]
         await ctx.send('```' + '\n'.join(msg) + '```')
 
+    @meta.command(brief='Print CF API request queue stats')
+    @commands.has_role(constants.TLE_ADMIN)
+    async def apiqueue(self, ctx):
+        """Replies with the number of queued CF API requests and their wait times per
+        priority."""
+        msg = [f'{priority:<12} queued: {stats["queued"]:<4} granted: {stats["granted"]:<7} '
+               f'avg wait: {stats["avg_wait"]:.2f}s recent: {stats["recent_avg_wait"]:.2f}s '
+               f'max: {stats["max_wait"]:.2f}s'
+               for priority, stats in cf.scheduler.get_stats().items()]
+        breaker = cf.breaker
+        if breaker.is_open:
+            msg.append(f'Circuit breaker {breaker.state} since '
+                       f'{pretty_time_format(time.time() - breaker.opened_at)} ago, '
+                       f'{breaker.failures} consecutive failures')
+        await ctx.send('```' + '\n'.join(msg) + '```')
+
+    @meta.command(brief='Print CF API usage stats', usage='[minutes]')
+    @commands.has_role(constants.TLE_ADMIN)
+    async def apistats(self, ctx, minutes: int = 60):
+        """Replies with the CF API requests made in the last `minutes` minutes per endpoint:
+        count, failures, latency, time spent waiting for the rate limiter, size and decode
+        time, followed by the commands and tasks which made the most requests."""
+        records = api_telemetry.telemetry.get_recent(minutes * 60)
+        if not records:
+            await ctx.send(f'No CF API requests in the last {minutes} minutes')
+            return
+        records_by_path = defaultdict(list)
+        for record in records:
+            records_by_path[record.path].append(record)
+
+        msg = [f'{"endpoint":<22}{"reqs":>6}{"fail":>6}{"avg":>8}{"p95":>8}{"wait":>9}'
+               f'{"MB":>8}{"decode":>8}']
+        for path, path_records in sorted(records_by_path.items()):
+            latencies = sorted(record.latency for record in path_records)
+            failed = sum(record.outcome != 'ok' for record in path_records)
+            msg.append(f'{path:<22}{len(path_records):>6}{failed:>6}'
+                       f'{sum(latencies) / len(latencies):>7.2f}s'
+                       f'{latencies[int(0.95 * (len(latencies) - 1))]:>7.2f}s'
+                       f'{sum(record.wait for record in path_records):>8.1f}s'
+                       f'{sum(record.bytes for record in path_records) / 2**20:>8.2f}'
+                       f'{sum(record.decode_time for record in path_records):>7.2f}s')
+        msg.append('')
+        msg.append('Top sources by requests')
+        sources = Counter(record.source for record in records)
+        msg += [f'{source:<40}{count:>6}' for source, count in sources.most_common(8)]
+        await ctx.send('```' + '\n'.join(msg) + '```')
+
+    @meta.command(brief='Dump CF API usage stats as JSON')
+    @commands.has_role(constants.TLE_ADMIN)
+    async def apidump(self, ctx):
+        """Replies with a JSON file of the per endpoint CF API counters since startup, including
+        latency histograms and usage by source, and the recent requests."""
+        dump = json.dumps(api_telemetry.telemetry.dump(), indent=1).encode()
+        await ctx.send(file=discord.File(io.BytesIO(dump), filename='cf_api_stats.json'))
+
 
 async def setup(bot):
     await bot.add_cog(Meta(bot))
@@ -1,4 +1,3 @@
-import random
 from enum import IntEnum
 import discord
 from discord.ext import commands
@@ -360,28 +359,19 @@ class Training(commands.Cog):
             raise TrainingCogError(
                 'You do not have an active training. You can start one with ;training start')
 
-    async def _pickTrainingProblem(self, handle, rating, submissions, user_id):
-        solved = {sub.problem.name for sub in submissions}
+    async def _pickTrainingProblem(self, handle, rating, user_id):
         skips = cf_common.user_db.get_training_skips(user_id)
-        problems = [prob for prob in cf_common.cache2.problem_cache.problems
-                    if (prob.rating == rating and
-                        prob.name not in solved and
-                        prob.name not in skips)]
-
-        def check(problem):
-            return (not cf_common.is_nonstandard_problem(problem) and
-                    not cf_common.is_contest_writer(problem.contestId, handle))
-
-        problems = list(filter(check, problems))
+        picker = cf_common.cache2.problem_picker
+        candidates = await picker.get_candidates((handle,), rlo=rating, rhi=rating,
+                                                 exclude_names=skips,
+                                                 exclude_writers=(handle,),
+                                                 standard_only=True)
+        problem = picker.pick(candidates, weight=5)
         # TODO: What happens to DB if this one triggers?
-        if not problems:
+        if problem is None:
             raise TrainingCogError(
                 'No problem to assign. Start of training failed.')
-        problems.sort(key=lambda problem: cf_common.cache2.contest_cache.get_contest(
-            problem.contestId).startTimeSeconds)
-
-        choice = max(random.randrange(len(problems)) for _ in range(5))
-        return problems[choice]
+        return problem
 
     async def _checkIfSolved(self, ctx, active, handle, submissions):
         _, _, name, contest_id, index, _, _, _, _, _ = active
@@ -553,8 +543,6 @@ class Training(commands.Cog):
 
         # get cf handle
         handle, = await cf_common.resolve_handles(ctx, self.converter, ('!' + str(ctx.author),))
-        # get user submissions
-        submissions = await cf.user.status(handle=handle)
 
         rating, mode = self._extractArgs(args)
 
@@ -565,7 +553,7 @@ class Training(commands.Cog):
         self._validateTrainingStatus(ctx, rating, active)
 
         # Picking a new problem with a certain rating
-        problem = await self._pickTrainingProblem(handle, rating, submissions, ctx.author.id)
+        problem = await self._pickTrainingProblem(handle, rating, ctx.author.id)
 
         # assign new problem
         await self._startTrainingAndAssignProblem(ctx, handle, problem, gamestate)
@@ -582,7 +570,7 @@ class Training(commands.Cog):
         # get cf handle
         handle, = await cf_common.resolve_handles(ctx, self.converter, ('!' + str(ctx.author),))
         # get user submissions
-        submissions = await cf.user.status(handle=handle)
+        submissions = await cf_common.cache2.submission_store.get_submissions(handle)
 
         # check game running
         active = await self._getActiveTraining(ctx.author.id)
@@ -598,7 +586,7 @@ class Training(commands.Cog):
         success, newRating = gamestate.doSolved(rating, duration)
 
         # Picking a new problem with a certain rating
-        problem = await self._pickTrainingProblem(handle, newRating, submissions, ctx.author.id)
+        problem = await self._pickTrainingProblem(handle, newRating, ctx.author.id)
 
         # Complete old problem
         await self._completeCurrentTrainingProblem(ctx, active, handle, finish_time, duration, gamestate, success)
@@ -620,9 +608,6 @@ class Training(commands.Cog):
 
         # get cf handle
         handle, = await cf_common.resolve_handles(ctx, self.converter, ('!' + str(ctx.author),))
-        # get user submissions
-        submissions = await cf.user.status(handle=handle)
-
         # check game running
         active = await self._getActiveTraining(ctx.author.id)
         self._checkTrainingActive(ctx, active)
@@ -635,7 +620,7 @@ class Training(commands.Cog):
         success, newRating = gamestate.doSkip(rating, duration)
 
         # Picking a new problem with a certain rating
-        problem = await self._pickTrainingProblem(handle, newRating, submissions, ctx.author.id)
+        problem = await self._pickTrainingProblem(handle, newRating, ctx.author.id)
 
         # Complete old problem
         await self._completeCurrentTrainingProblem(ctx, active, handle, finish_time, duration, gamestate, success)
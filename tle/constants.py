@@ -10,6 +10,8 @@ TEMP_DIR = os.path.join(DATA_DIR, 'temp')
 
 USER_DB_FILE_PATH = os.path.join(DB_DIR, 'user.db')
 CACHE_DB_FILE_PATH = os.path.join(DB_DIR, 'cache.db')
+CACHE_SNAPSHOT_FILE_PATH = os.path.join(DB_DIR, 'cache.snapshot')
+CF_RESPONSE_CACHE_DB_FILE_PATH = os.path.join(DB_DIR, 'cf_response_cache.db')
 
 FONTS_DIR = os.path.join(ASSETS_DIR, 'fonts')
 
@@ -25,3 +27,16 @@ ALL_DIRS = (attrib_value for attrib_name, attrib_value in list(globals().items()
 
 TLE_ADMIN = os.environ.get('TLE_ADMIN', 'Admin')
 TLE_MODERATOR = os.environ.get('TLE_MODERATOR', 'Moderator')
+
+# Size limit of the on-disk CF API response cache, 0 disables it.
+CF_RESPONSE_CACHE_MAX_MB = int(os.environ.get('CF_RESPONSE_CACHE_MAX_MB', 0))
+
+# Base URL of the CF API, can point at a local stand-in such as extra/cf_api_server.py.
+CF_API_BASE_URL = os.environ.get('CF_API_BASE_URL', 'https://codeforces.com/api/')
+
+# Connection pool of the shared HTTP session, see tle/util/http_client.py.
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 30))
+HTTP_POOL_SIZE_PER_HOST = int(os.environ.get('HTTP_POOL_SIZE_PER_HOST', 10))
+# Seconds for which idle connections are kept alive and DNS lookups are cached.
+HTTP_KEEPALIVE_TIMEOUT = float(os.environ.get('HTTP_KEEPALIVE_TIMEOUT', 30))
+HTTP_DNS_CACHE_TTL = int(os.environ.get('HTTP_DNS_CACHE_TTL', 300))
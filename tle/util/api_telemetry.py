@@ -0,0 +1,162 @@
+import bisect
+import contextlib
+import contextvars
+import time
+from collections import namedtuple, deque, defaultdict, Counter
+
+# Upper bounds in seconds of the request latency histogram buckets, the last bucket is unbounded.
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_request_source = contextvars.ContextVar('request_source', default='other')
+_current_request = contextvars.ContextVar('current_request', default=None)
+
+
+def set_request_source(source):
+    """Attributes the API usage of the current task to `source`, such as a command name."""
+    _request_source.set(source)
+
+
+@contextlib.contextmanager
+def request_source(source):
+    """Context manager under which API usage is attributed to `source`."""
+    token = _request_source.set(source)
+    try:
+        yield
+    finally:
+        _request_source.reset(token)
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+
+    def to_dict(self):
+        labels = [f'<={bound}' for bound in self.bounds] + [f'>{self.bounds[-1]}']
+        return dict(zip(labels, self.counts))
+
+
+class EndpointStats:
+    """Totals for one endpoint since startup."""
+    def __init__(self):
+        self.calls = 0
+        self.shared_calls = 0
+        self.cache_hits = 0
+        self.requests = 0
+        self.retries = 0
+        self.failures = Counter()
+        self.bytes = 0
+        self.decode_time = 0.0
+        self.wait_time = 0.0
+        self.total_latency = 0.0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.calls_by_source = Counter()
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'shared_calls': self.shared_calls,
+            'cache_hits': self.cache_hits,
+            'requests': self.requests,
+            'retries': self.retries,
+            'failures': dict(self.failures),
+            'bytes': self.bytes,
+            'decode_time': self.decode_time,
+            'wait_time': self.wait_time,
+            'total_latency': self.total_latency,
+            'latency_histogram': self.latency.to_dict(),
+            'calls_by_source': dict(self.calls_by_source),
+        }
+
+
+# One HTTP request to the API. outcome is 'ok' or the name of the error class.
+RequestRecord = namedtuple('RequestRecord',
+                           'time path source outcome wait latency bytes decode_time')
+
+
+class RequestMetrics:
+    """Measurements of the request in progress, filled in by the code making it."""
+    def __init__(self):
+        self.bytes = 0
+        self.decode_time = 0.0
+
+
+class ApiTelemetry:
+    """Per endpoint counters of API usage. Totals are kept since startup, and the most recent
+    requests are kept individually in a ring buffer for windowed summaries.
+    """
+    _RECENT_REQUESTS = 10000
+
+    def __init__(self):
+        self.started = time.time()
+        self.stats_by_path = defaultdict(EndpointStats)
+        self.recent = deque(maxlen=self._RECENT_REQUESTS)
+
+    def record_call(self, path, *, shared):
+        """Records a query, `shared` if it was answered by another identical query."""
+        stats = self.stats_by_path[path]
+        stats.calls += 1
+        stats.shared_calls += shared
+        stats.calls_by_source[_request_source.get()] += 1
+
+    def record_cache_hit(self, path):
+        self.stats_by_path[path].cache_hits += 1
+
+    def record_retry(self, path):
+        self.stats_by_path[path].retries += 1
+
+    @contextlib.contextmanager
+    def track_request(self, path, wait):
+        """Context manager around one HTTP request, which waited `wait` seconds for the rate
+        limiter. The code making the request reports bytes and decode time to the
+        `RequestMetrics` returned by `current_request`."""
+        metrics = RequestMetrics()
+        token = _current_request.set(metrics)
+        start = time.monotonic()
+        outcome = 'ok'
+        try:
+            yield metrics
+        except Exception as e:
+            outcome = e.__class__.__name__
+            raise
+        finally:
+            _current_request.reset(token)
+            latency = time.monotonic() - start
+            stats = self.stats_by_path[path]
+            stats.requests += 1
+            if outcome != 'ok':
+                stats.failures[outcome] += 1
+            stats.bytes += metrics.bytes
+            stats.decode_time += metrics.decode_time
+            stats.wait_time += wait
+            stats.total_latency += latency
+            stats.latency.add(latency)
+            self.recent.append(RequestRecord(time.time(), path, _request_source.get(), outcome,
+                                             wait, latency, metrics.bytes, metrics.decode_time))
+
+    @staticmethod
+    def current_request():
+        """Returns the `RequestMetrics` of the request being made, or a throwaway one outside of
+        `track_request`."""
+        return _current_request.get() or RequestMetrics()
+
+    def get_recent(self, window):
+        """Returns the requests made in the last `window` seconds."""
+        since = time.time() - window
+        return [record for record in self.recent if record.time >= since]
+
+    def dump(self):
+        """Returns everything as a JSON serializable dict."""
+        return {
+            'started': self.started,
+            'now': time.time(),
+            'latency_buckets': LATENCY_BUCKETS,
+            'endpoints': {path: stats.to_dict() for path, stats in self.stats_by_path.items()},
+            'recent_requests': [record._asdict() for record in self.recent],
+        }
+
+
+telemetry = ApiTelemetry()
@@ -0,0 +1,47 @@
+"""Sets of small non-negative ints kept as the bits of a Python int, so that union, intersection
+and difference of large sets are single int operations."""
+
+_POPCOUNT = bytes(bin(byte).count('1') for byte in range(256))
+
+
+def from_ids(ids):
+    """Returns the bitset with the given bit positions set."""
+    buf = bytearray()
+    for i in ids:
+        byte = i >> 3
+        if byte >= len(buf):
+            buf.extend(bytes(byte + 1 - len(buf)))
+        buf[byte] |= 1 << (i & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def _to_bytes(bits):
+    return bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+
+def to_ids(bits):
+    """Returns the positions of the set bits, in increasing order."""
+    ids = []
+    for byte_index, byte in enumerate(_to_bytes(bits)):
+        base = byte_index << 3
+        while byte:
+            low = byte & -byte
+            ids.append(base + low.bit_length() - 1)
+            byte ^= low
+    return ids
+
+
+def count(bits):
+    return bin(bits).count('1')
+
+
+def select(bits, rank):
+    """Returns the position of the set bit with `rank` set bits below it."""
+    for byte_index, byte in enumerate(_to_bytes(bits)):
+        byte_count = _POPCOUNT[byte]
+        if rank < byte_count:
+            for _ in range(rank):
+                byte &= byte - 1
+            return (byte_index << 3) + (byte & -byte).bit_length() - 1
+        rank -= byte_count
+    raise IndexError('bitset rank out of range')
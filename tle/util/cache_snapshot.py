@@ -0,0 +1,87 @@
+"""Binary snapshots of the in-memory state of the cache system, so that it can be restored at
+startup without scanning and decoding the large tables of the cache database.
+
+A snapshot file is a header followed by a pickled payload. The header has a magic string, the
+format version and a BLAKE2b digest of the payload. The payload maps section names to pairs of the
+table versions of the cache database the section was built from and the separately pickled state
+of the section. Sections are only unpickled and restored if their table versions still match the
+database, everything else is loaded from the database as usual.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import struct
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b'TLECACHE'
+# Increment whenever the state of any section changes in a way that older snapshots do not fit.
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('<8sI32s')
+
+
+def _digest(payload):
+    return hashlib.blake2b(payload, digest_size=32).digest()
+
+
+def encode(sections):
+    """Returns the snapshot of `sections`, a dict from section name to a pair of table versions
+    and state."""
+    payload = pickle.dumps({name: (table_versions, pickle.dumps(state, protocol=5))
+                            for name, (table_versions, state) in sections.items()}, protocol=5)
+    return _HEADER.pack(_MAGIC, FORMAT_VERSION, _digest(payload)) + payload
+
+
+def decode(data):
+    """Returns the sections of a snapshot made by `encode`, or None if it is not a valid snapshot of
+    the current format version. The states of the sections are left pickled, to be unpickled with
+    `load_state` only if they are used."""
+    if len(data) < _HEADER.size:
+        logger.info('Cache snapshot is truncated')
+        return None
+    magic, version, digest = _HEADER.unpack_from(data)
+    if magic != _MAGIC:
+        logger.warning('Cache snapshot has no valid header')
+        return None
+    if version != FORMAT_VERSION:
+        logger.info(f'Cache snapshot has format version {version}, expected {FORMAT_VERSION}')
+        return None
+    payload = memoryview(data)[_HEADER.size:]
+    if _digest(payload) != digest:
+        logger.warning('Cache snapshot checksum mismatch')
+        return None
+    return pickle.loads(payload)
+
+
+def load_state(data):
+    """Returns the unpickled state of a section, or None if it cannot be unpickled."""
+    try:
+        return pickle.loads(data)
+    except Exception:
+        logger.warning('Cache snapshot section could not be loaded', exc_info=True)
+        return None
+
+
+def read(path):
+    """Returns the sections of the snapshot at `path`, or None if it is missing or invalid."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        logger.info(f'No cache snapshot at {path}')
+        return None
+    try:
+        return decode(data)
+    except Exception:
+        logger.warning(f'Cache snapshot at {path} could not be loaded', exc_info=True)
+        return None
+
+
+def write(path, data):
+    """Writes the snapshot bytes `data` to `path`, replacing any previous snapshot at once."""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
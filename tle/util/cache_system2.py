@@ -1,17 +1,22 @@
 import asyncio
 import logging
+import math
+import sys
 import time
-from aiocache import cached
+from array import array
 
-from collections import defaultdict
+from collections import defaultdict, namedtuple, OrderedDict
 from discord.ext import commands
 
 from tle.util import codeforces_common as cf_common
+from tle.util import bitset
+from tle.util import cache_snapshot
 from tle.util import codeforces_api as cf
 from tle.util import events
 from tle.util import tasks
 from tle.util import paginator
-from tle.util.ranklist import Ranklist
+from tle.util import problem_picker
+from tle.util.ranklist import Ranklist, DeltasNotPresentError
 
 logger = logging.getLogger(__name__)
 _CONTESTS_PER_BATCH_IN_CACHE_UPDATES = 100
@@ -26,6 +31,12 @@ class CacheError(commands.CommandError):
     pass
 
 
+class CacheUnavailable(CacheError):
+    def __init__(self, name):
+        super().__init__(f'Cached data `{name}` could not be loaded, try again later')
+        self.name = name
+
+
 class ContestCacheError(CacheError):
     pass
 
@@ -77,7 +88,12 @@ class ContestCache:
         if self.reload_exception:
             raise self.reload_exception
 
+    def _note_if_stale(self):
+        if cf.breaker.is_open:
+            cf_common.note_stale_data(self.contests_last_cache)
+
     def get_contest(self, contest_id):
+        self._note_if_stale()
         try:
             return self.contest_by_id[contest_id]
         except KeyError:
@@ -87,6 +103,7 @@ class ContestCache:
         return self.cache_master.conn.get_problemset_from_contest(contest_id)
 
     def get_contests_in_phase(self, phase):
+        self._note_if_stale()
         return self.contests_by_phase[phase]
 
     async def _try_disk(self):
@@ -113,31 +130,56 @@ class ContestCache:
         self.next_delay = self._EXCEPTION_CONTEST_RELOAD_DELAY
 
     async def _reload_contests(self):
-        contests = await cf.contest.list()
+        with cf.request_priority(cf.Priority.MONITOR):
+            contests = await cf.contest.list()
         delay = await self._update(contests)
         return delay
 
+    def _diff(self, contests):
+        added, changed, phase_changed, time_changed = [], [], [], []
+        for contest in contests:
+            old = self.contest_by_id.get(contest.id)
+            if old is None:
+                added.append(contest)
+            elif old != contest:
+                changed.append(contest)
+                if old.phase != contest.phase:
+                    phase_changed.append((old, contest))
+                if (old.startTimeSeconds, old.durationSeconds) != (contest.startTimeSeconds,
+                                                                   contest.durationSeconds):
+                    time_changed.append((old, contest))
+        contest_ids = {contest.id for contest in contests}
+        removed = [contest for contest in self.contests if contest.id not in contest_ids]
+        return added, removed, changed, phase_changed, time_changed
+
     async def _update(self, contests, from_api=True):
         self.logger.info(f'{len(contests)} contests fetched from {"API" if from_api else "disk"}')
-        contests.sort(key=lambda contest: (contest.startTimeSeconds, contest.id))
+        added, removed, changed, phase_changed, time_changed = self._diff(contests)
+        self.logger.info(f'{len(added)} contests added, {len(removed)} removed and '
+                         f'{len(changed)} changed')
 
-        if from_api:
-            rc = self.cache_master.conn.cache_contests(contests)
+        if from_api and (added or changed):
+            rc = self.cache_master.conn.cache_contests(added + changed)
             self.logger.info(f'{rc} contests stored in database')
 
-        contests_by_phase = {phase: [] for phase in cf.Contest.PHASES}
-        contests_by_phase['_RUNNING'] = []
-        contest_by_id = {}
-        for contest in contests:
-            contests_by_phase[contest.phase].append(contest)
-            contest_by_id[contest.id] = contest
-            if contest.phase in self._RUNNING_PHASES:
-                contests_by_phase['_RUNNING'].append(contest)
+        if added or removed or changed:
+            contests.sort(key=lambda contest: (contest.startTimeSeconds, contest.id))
+            contests_by_phase = {phase: [] for phase in cf.Contest.PHASES}
+            contests_by_phase['_RUNNING'] = []
+            contest_by_id = {}
+            for contest in contests:
+                contests_by_phase[contest.phase].append(contest)
+                contest_by_id[contest.id] = contest
+                if contest.phase in self._RUNNING_PHASES:
+                    contests_by_phase['_RUNNING'].append(contest)
+            self.contests = contests
+            self.contests_by_phase = contests_by_phase
+            self.contest_by_id = contest_by_id
 
         now = time.time()
         delay = self._NORMAL_CONTEST_RELOAD_DELAY
 
-        for contest in contests_by_phase['BEFORE']:
+        for contest in self.contests_by_phase['BEFORE']:
             at = contest.startTimeSeconds - self._ACTIVATE_BEFORE
             if at > now:
                 # Reload at _ACTIVATE_BEFORE before contest to monitor contest delays.
@@ -147,16 +189,17 @@ class ContestCache:
                 # Reload at contest start, or after _ACTIVE_CONTEST_RELOAD_DELAY, whichever comes first.
                 delay = min(contest.startTimeSeconds - now, self._ACTIVE_CONTEST_RELOAD_DELAY)
 
-        if contests_by_phase['_RUNNING']:
+        if self.contests_by_phase['_RUNNING']:
             # If any contest is running, reload at an increased rate to detect FINISHED
             delay = min(delay, self._ACTIVE_CONTEST_RELOAD_DELAY)
 
-        self.contests = contests
-        self.contests_by_phase = contests_by_phase
-        self.contest_by_id = contest_by_id
         self.contests_last_cache = time.time()
 
         cf_common.event_sys.dispatch(events.ContestListRefresh, self.contests.copy())
+        if added or removed or changed:
+            cf_common.event_sys.dispatch(events.ContestsChanged, added=added, removed=removed,
+                                         changed=changed, phase_changed=phase_changed,
+                                         time_changed=time_changed)
 
         return delay
 
@@ -167,19 +210,46 @@ class ProblemCache:
     def __init__(self, cache_master):
         self.cache_master = cache_master
 
-        self.problems = []
+        self._problems = []
         self.problem_by_name = {}
+        self.problem_by_contest_index = {}
         self.problems_last_cache = 0
 
+        # Indexes over _problems, rebuilt whenever the problems are replaced. Problems are
+        # referred to by their position in _problems, which is in order of contest start time,
+        # and sets of problems are int bitsets over those positions. `generation` changes with
+        # every rebuild, so that bitsets kept elsewhere can tell when they are out of date.
+        self.generation = 0
+        self.id_by_name = {}
+        self._all_bits = 0
+        self._bits_by_rating = {}
+        self._bits_by_tag = {}
+        self._bits_by_contest = {}
+        self._nonstandard_bits = 0
+        self._writer_bits_by_handle = {}
+
         self.reload_lock = asyncio.Lock()
         self.reload_exception = None
 
         self.logger = logging.getLogger(self.__class__.__name__)
 
-    async def run(self):
-        await self._try_disk()
+    @property
+    def problems(self):
+        if cf.breaker.is_open:
+            cf_common.note_stale_data(self.problems_last_cache)
+        return self._problems
+
+    async def run(self, snapshot=None):
+        if snapshot is not None:
+            self._set_problems(snapshot)
+            self.logger.info(f'{len(snapshot)} problems loaded from snapshot')
+        else:
+            await self._try_disk()
         self._update_task.start()
 
+    def get_snapshot(self):
+        return self._problems
+
     async def reload_now(self):
         """Force a reload. If currently reloading it will wait until done."""
         reloading = self.reload_lock.locked()
@@ -200,9 +270,9 @@ class ProblemCache:
             if not problems:
                 self.logger.info('Problem cache on disk is empty.')
                 return
-            self.problems = problems
-            self.problem_by_name = {problem.name: problem for problem in problems}
-            self.logger.info(f'{len(self.problems)} problems fetched from disk')
+            self._set_problems(problems)
+            self.cache_master.schedule_snapshot()
+            self.logger.info(f'{len(problems)} problems fetched from disk')
 
     @tasks.task_spec(name='ProblemCacheUpdate',
                      waiter=tasks.Waiter.fixed_delay(_RELOAD_INTERVAL))
@@ -216,7 +286,8 @@ class ProblemCache:
         self.reload_exception = ex
 
     async def _reload_problems(self):
-        problems, _ = await cf.problemset.problems()
+        with cf.request_priority(cf.Priority.MONITOR):
+            problems, _ = await cf.problemset.problems()
         await self._update(problems)
 
     async def _update(self, problems):
@@ -235,13 +306,115 @@ class ProblemCache:
         }
         self.logger.info(f'Keeping {len(problem_by_name)} problems')
 
-        self.problems = list(problem_by_name.values())
-        self.problem_by_name = problem_by_name
+        self._set_problems(list(problem_by_name.values()))
         self.problems_last_cache = time.time()
 
-        rc = self.cache_master.conn.cache_problems(self.problems)
+        rc = self.cache_master.conn.cache_problems(self._problems)
+        self.cache_master.schedule_snapshot()
         self.logger.info(f'{rc} problems stored in database')
 
+    def _set_problems(self, problems):
+        contest_by_id = self.cache_master.contest_cache.contest_by_id
+
+        def start_time(problem):
+            contest = contest_by_id.get(problem.contestId)
+            return contest.startTimeSeconds if contest else 0
+
+        # The sort is stable, so problems of the same contest keep their order.
+        problems = sorted(problems, key=start_time)
+        ids_by_rating, ids_by_tag, ids_by_contest = defaultdict(list), defaultdict(list), defaultdict(list)
+        nonstandard_ids = []
+        for problem_id, problem in enumerate(problems):
+            ids_by_rating[problem.rating].append(problem_id)
+            for tag in problem.tags:
+                ids_by_tag[tag].append(problem_id)
+            ids_by_contest[problem.contestId].append(problem_id)
+            contest = contest_by_id.get(problem.contestId)
+            if ((contest is not None and cf_common.is_nonstandard_contest(contest))
+                    or problem.matches_all_tags(['*special'])):
+                nonstandard_ids.append(problem_id)
+
+        self._problems = problems
+        self.problem_by_name = {problem.name: problem for problem in problems}
+        self.problem_by_contest_index = {(problem.contestId, problem.index): problem
+                                         for problem in problems}
+        self.id_by_name = {problem.name: problem_id for problem_id, problem in enumerate(problems)}
+        self._all_bits = (1 << len(problems)) - 1
+        self._bits_by_rating = {rating: bitset.from_ids(ids)
+                                for rating, ids in ids_by_rating.items()}
+        self._bits_by_tag = {tag: bitset.from_ids(ids) for tag, ids in ids_by_tag.items()}
+        self._bits_by_contest = {contest_id: bitset.from_ids(ids)
+                                 for contest_id, ids in ids_by_contest.items()}
+        self._nonstandard_bits = bitset.from_ids(nonstandard_ids)
+        self._writer_bits_by_handle = {}
+        self.generation += 1
+
+    def _bits_matching_tag(self, match_tag):
+        """Problems with a tag containing `match_tag`, as `Problem.matches_all_tags`."""
+        bits = 0
+        for tag, tag_bits in self._bits_by_tag.items():
+            if match_tag in tag:
+                bits |= tag_bits
+        return bits
+
+    def _writer_bits(self, handle):
+        """Problems from contests written by the handle."""
+        key = handle.lower()
+        bits = self._writer_bits_by_handle.get(key)
+        if bits is None:
+            bits = 0
+            for contest_id, contest_bits in self._bits_by_contest.items():
+                if cf_common.is_contest_writer(contest_id, handle):
+                    bits |= contest_bits
+            self._writer_bits_by_handle[key] = bits
+        return bits
+
+    def bits_of_names(self, names):
+        """The problems with the given names, ignoring names of problems not in the cache."""
+        return bitset.from_ids(self.id_by_name[name] for name in names if name in self.id_by_name)
+
+    def problems_of_bits(self, bits):
+        """The problems in the bitset, in order of contest start time."""
+        problems = self.problems
+        return [problems[problem_id] for problem_id in bitset.to_ids(bits)]
+
+    def query_bits(self, *, rlo=None, rhi=None, tags=(), bantags=(), contest_ids=None,
+                   exclude_names=(), exclude_writers=(), standard_only=False):
+        """Returns the bitset of problems with rating in [rlo, rhi] which match all of `tags` and
+        none of `bantags`. If `contest_ids` is given only problems from those contests are
+        considered. Problems named in `exclude_names`, from contests written by any of
+        `exclude_writers` or, if `standard_only`, that are nonstandard are left out.
+        """
+        if rlo is None and rhi is None:
+            bits = self._all_bits
+        else:
+            rlo = -math.inf if rlo is None else rlo
+            rhi = math.inf if rhi is None else rhi
+            bits = 0
+            for rating, rating_bits in self._bits_by_rating.items():
+                if rating is not None and rlo <= rating <= rhi:
+                    bits |= rating_bits
+        if contest_ids is not None:
+            contest_bits = 0
+            for contest_id in contest_ids:
+                contest_bits |= self._bits_by_contest.get(contest_id, 0)
+            bits &= contest_bits
+        for tag in set(tags):
+            bits &= self._bits_matching_tag(tag)
+        for tag in set(bantags):
+            bits &= ~self._bits_matching_tag(tag)
+        if standard_only:
+            bits &= ~self._nonstandard_bits
+        if exclude_names:
+            bits &= ~self.bits_of_names(exclude_names)
+        for handle in exclude_writers:
+            bits &= ~self._writer_bits(handle)
+        return bits
+
+    def query(self, **kwargs):
+        """Returns the problems selected as by `query_bits`, in order of contest start time."""
+        return self.problems_of_bits(self.query_bits(**kwargs))
+
 
 class ProblemsetCacheError(CacheError):
     pass
@@ -252,90 +425,121 @@ class ProblemsetNotCached(ProblemsetCacheError):
         super().__init__(f'Problemset for contest with id {contest_id} not cached.')
 
 
+class ProblemsetFetchIncomplete(ProblemsetCacheError):
+    def __init__(self, contest_ids):
+        super().__init__(f'Problemsets of {len(contest_ids)} contests could not be fetched, '
+                         'saved problems were kept')
+        self.contest_ids = contest_ids
+
+
 class ProblemsetCache:
     _MONITOR_PERIOD_SINCE_CONTEST_END = 14 * 24 * 60 * 60
     _RELOAD_DELAY = 60 * 60
+    _FETCH_CONCURRENCY = 4
 
     def __init__(self, cache_master):
-        self.problems = []
         # problem -> list of contests in which it appears
         self.problem_to_contests = defaultdict(list)
         self.cache_master = cache_master
         self.update_lock = asyncio.Lock()
         self.logger = logging.getLogger(self.__class__.__name__)
 
-    async def run(self):
-        if self.cache_master.conn.problemset_empty():
-            self.logger.warning('Problemset cache on disk is empty. This must be populated '
-                                'manually before use.')
+    async def run(self, snapshot=None):
+        if snapshot is not None:
+            self.problem_to_contests = snapshot
+        else:
+            if self.cache_master.conn.problemset_empty():
+                self.logger.warning('Problemset cache on disk is empty. This must be populated '
+                                    'manually before use.')
+            self._update_from_disk()
         self._update_task.start()
 
+    def get_snapshot(self):
+        # Copied, as the lists are appended to when problems are added.
+        return defaultdict(list, {problem_id: list(contest_ids) for problem_id, contest_ids
+                                  in self.problem_to_contests.items()})
+
     async def update_for_contest(self, contest_id):
         """Update problemset for a particular contest. Intended for manual trigger."""
         async with self.update_lock:
             contest = self.cache_master.contest_cache.get_contest(contest_id)
-            problemset, _ = await self._fetch_problemsets([contest], force_fetch=True)
+            problemset, failed_contest_ids = await self._fetch_problemsets([contest.id])
+            if failed_contest_ids:
+                raise ProblemsetFetchIncomplete(failed_contest_ids)
             self.cache_master.conn.clear_problemset(contest_id)
             self._save_problems(problemset)
+            self._update_from_disk()
             return len(problemset)
 
     async def update_for_all(self):
         """Update problemsets for all finished contests. Intended for manual trigger."""
         async with self.update_lock:
             contests = self.cache_master.contest_cache.contests_by_phase['FINISHED']
-            problemsets, _ = await self._fetch_problemsets(contests, force_fetch=True)
-            self.cache_master.conn.clear_problemset()
+            problemsets, failed_contest_ids = await self._fetch_problemsets(
+                [contest.id for contest in contests])
+            # Only start over if every problemset was fetched, otherwise the problems of the
+            # failed contests would be lost.
+            if not failed_contest_ids:
+                self.cache_master.conn.clear_problemset()
             self._save_problems(problemsets)
+            self._update_from_disk()
+            if failed_contest_ids:
+                raise ProblemsetFetchIncomplete(failed_contest_ids)
             return len(problemsets)
 
     @tasks.task_spec(name='ProblemsetCacheUpdate',
                      waiter=tasks.Waiter.fixed_delay(_RELOAD_DELAY))
     async def _update_task(self, _):
         async with self.update_lock:
-            contests = self.cache_master.contest_cache.contests_by_phase['FINISHED']
-            new_problems, updated_problems = await self._fetch_problemsets(contests)
-            self._save_problems(new_problems + updated_problems)
-            self._update_from_disk()
-            self.logger.info(f'{len(new_problems)} new problems saved and {len(updated_problems)} '
-                             'saved problems updated.')
-
-    async def _fetch_problemsets(self, contests, *, force_fetch=False):
+            new_contest_ids, incomplete_contest_ids = self._get_contests_to_fetch()
+            problems, _ = await self._fetch_problemsets(new_contest_ids + incomplete_contest_ids)
+            self._save_problems(problems)
+            self._add_problems(problems)
+            if problems:
+                self.cache_master.schedule_snapshot()
+            self.logger.info(f'{len(problems)} problems saved from {len(new_contest_ids)} new '
+                             f'and {len(incomplete_contest_ids)} incomplete contests.')
+
+    def _get_contests_to_fetch(self):
+        """Returns the ids of recently finished contests with no saved problems, and of those
+        with saved problems which are not all rated yet."""
         # We assume it is possible for problems in the same contest to get assigned rating at
         # different times.
-        new_contest_ids = []
-        contests_to_refetch = []  # List of (id, set of saved rated problem indices) pairs.
-        if force_fetch:
-            new_contest_ids = [contest.id for contest in contests]
-        else:
-            now = time.time()
-            for contest in contests:
-                if now > contest.end_time + self._MONITOR_PERIOD_SINCE_CONTEST_END:
-                    # Contest too old, we do not want to check it.
-                    continue
-                problemset = self.cache_master.conn.fetch_problemset(contest.id)
-                if not problemset:
-                    new_contest_ids.append(contest.id)
-                    continue
-                rated_problem_idx = {prob.index for prob in problemset if prob.rating is not None}
-                if len(rated_problem_idx) < len(problemset):
-                    contests_to_refetch.append((contest.id, rated_problem_idx))
-
-        new_problems, updated_problems = [], []
-        for contest_id in new_contest_ids:
-            new_problems += await self._fetch_for_contest(contest_id)
-        for contest_id, rated_problem_idx in contests_to_refetch:
-            updated_problems += [prob for prob in await self._fetch_for_contest(contest_id)
-                                 if prob.rating is not None and prob.index not in rated_problem_idx]
-
-        return new_problems, updated_problems
+        state_by_contest = self.cache_master.conn.fetch_problemset_states()
+        new_contest_ids, incomplete_contest_ids = [], []
+        now = time.time()
+        for contest in self.cache_master.contest_cache.contests_by_phase['FINISHED']:
+            if now > contest.end_time + self._MONITOR_PERIOD_SINCE_CONTEST_END:
+                # Contest too old, we do not want to check it.
+                continue
+            state = state_by_contest.get(contest.id)
+            if state is None:
+                new_contest_ids.append(contest.id)
+            elif state[1] < state[0]:
+                incomplete_contest_ids.append(contest.id)
+        return new_contest_ids, incomplete_contest_ids
+
+    async def _fetch_problemsets(self, contest_ids):
+        """Returns the problems of the contests, and the ids of the contests whose problemsets
+        could not be fetched. Raises `cf.CodeforcesUnavailableError` if Codeforces is down."""
+        with cf.request_priority(cf.Priority.BULK):
+            problemsets = await cf.fan_out(self._fetch_for_contest, contest_ids,
+                                           concurrency=self._FETCH_CONCURRENCY)
+        problems = [problem for problemset in problemsets if problemset is not None
+                    for problem in problemset]
+        failed_contest_ids = [contest_id for contest_id, problemset
+                              in zip(contest_ids, problemsets) if problemset is None]
+        return problems, failed_contest_ids
 
     async def _fetch_for_contest(self, contest_id):
         try:
             _, problemset, _ = await cf.contest.standings(contest_id=contest_id, from_=1,
                                                           count=1)
+        except cf.CodeforcesUnavailableError:
+            raise
         except cf.CodeforcesApiError as er:
             self.logger.warning(f'Problemset fetch failed for contest {contest_id}. {er!r}')
-            problemset = []
+            problemset = None
         return problemset
 
     def _save_problems(self, problems):
@@ -348,60 +552,257 @@ class ProblemsetCache:
             raise ProblemsetNotCached(contest_id)
         return problemset
 
-    def _update_from_disk(self):
-        self.problems = self.cache_master.conn.fetch_problems2()
-        self.problem_to_contests = defaultdict(list)
-        for problem in self.problems:
+    def _add_problems(self, problems):
+        for problem in problems:
             try:
-                contest = cf_common.cache2.contest_cache.get_contest(problem.contestId)
-                problem_id = (problem.name, contest.startTimeSeconds)
-                self.problem_to_contests[problem_id].append(contest.id)
+                contest = self.cache_master.contest_cache.get_contest(problem.contestId)
             except ContestNotFound:
-                pass
+                continue
+            contest_ids = self.problem_to_contests[(problem.name, contest.startTimeSeconds)]
+            if contest.id not in contest_ids:
+                contest_ids.append(contest.id)
+
+    def _update_from_disk(self):
+        self.problem_to_contests = defaultdict(list)
+        self._add_problems(self.cache_master.conn.fetch_problems2())
+        self.cache_master.schedule_snapshot()
+
+
+class HandleRatings:
+    """The latest rating of every handle. Handles are interned and ratings are kept in arrays
+    indexed by the position of the handle, so that the hundreds of thousands of rated handles cost
+    little more than their names."""
+
+    def __init__(self):
+        self._index_by_handle = {}
+        # Handles in order of index, kept instead of _index_by_handle after unpickling until the
+        # index is first needed, as building it is most of the cost of loading.
+        self._handles = None
+        self.ratings = array('i')
+        self.update_times = array('q')
+
+    def __len__(self):
+        return len(self.ratings)
+
+    @property
+    def index_by_handle(self):
+        if self._index_by_handle is None:
+            self._index_by_handle = dict(zip(map(sys.intern, self._handles),
+                                             range(len(self._handles))))
+            self._handles = None
+        return self._index_by_handle
+
+    def __getstate__(self):
+        # Handles are stored as one string, which is much faster to pickle and unpickle than the
+        # dict. Handles never contain newlines.
+        return self.joined_handles(), self.ratings, self.update_times
+
+    def __setstate__(self, state):
+        handles, self.ratings, self.update_times = state
+        self._index_by_handle = None
+        self._handles = handles.split('\n') if handles else []
+
+    def copy(self):
+        """Returns a copy which is not changed by later changes to this one."""
+        handle_ratings = HandleRatings()
+        if self._index_by_handle is None:
+            handle_ratings._index_by_handle = None
+            handle_ratings._handles = self._handles
+        else:
+            handle_ratings._index_by_handle = self._index_by_handle.copy()
+        handle_ratings.ratings = array('i', self.ratings)
+        handle_ratings.update_times = array('q', self.update_times)
+        return handle_ratings
+
+    def joined_handles(self):
+        """Returns the handles in order of index, joined by newlines."""
+        handles = self._handles if self._index_by_handle is None else self._index_by_handle
+        return '\n'.join(handles)
+
+    @classmethod
+    def from_joined(cls, handles, ratings):
+        """Returns the ratings of handles as from `joined_handles`, with `ratings` the bytes of
+        the array of their ratings. The update times are all 0."""
+        handle_ratings = cls()
+        handle_ratings.__setstate__((handles, array('i', ratings), None))
+        handle_ratings.update_times = array('q', bytes(8 * len(handle_ratings.ratings)))
+        return handle_ratings
+
+    def set(self, handle, rating, update_time=0):
+        index = self.index_by_handle.get(handle)
+        if index is None:
+            self._index_by_handle[sys.intern(handle)] = len(self.ratings)
+            self.ratings.append(rating)
+            self.update_times.append(update_time)
+        elif update_time >= self.update_times[index]:
+            self.ratings[index] = rating
+            self.update_times[index] = update_time
+
+    def get(self, handle, default=None):
+        index = self.index_by_handle.get(handle)
+        return default if index is None else self.ratings[index]
+
+
+def _current_versions(contest_cache, contests):
+    """Returns the current versions of the contests which are still in the contest cache, without
+    duplicates and in order of start time."""
+    contest_ids = {contest.id for contest in contests}
+    current = [contest_cache.contest_by_id[contest_id] for contest_id in contest_ids
+               if contest_id in contest_cache.contest_by_id]
+    current.sort(key=lambda contest: (contest.startTimeSeconds, contest.id))
+    return current
+
+
+class EffectiveRatingCache:
+    """Effective ratings of all rated users, from the user.ratedList endpoint which has the
+    largest response of the API. The ratings are refreshed in the background and saved to disk, so
+    that they are at hand both for requests and right after a restart."""
+    _REFRESH_DELAY = 30 * 60
+    _EXCEPTION_REFRESH_DELAY = 5 * 60
+
+    def __init__(self, cache_master):
+        self.cache_master = cache_master
+        self.handle_ratings = None
+        self.fetch_time = None
+        self.next_refresh_time = 0
+        self.refresh_lock = asyncio.Lock()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def run(self):
+        self._try_disk()
+        self._update_task.start()
+
+    async def get_ratings(self):
+        """Returns the effective ratings as `HandleRatings`. The ratings are fetched only if
+        there are none yet, otherwise the latest snapshot is returned right away."""
+        await self.cache_master.wait_until_ready('effective_rating_cache')
+        if self.handle_ratings is None:
+            async with self.refresh_lock:
+                if self.handle_ratings is None:
+                    await self._refresh()
+        return self.handle_ratings
+
+    def _try_disk(self):
+        saved = self.cache_master.conn.fetch_effective_ratings()
+        if saved is None:
+            self.logger.info('Effective rating cache on disk is empty.')
+            return
+        fetch_time, handles, ratings = saved
+        self.handle_ratings = HandleRatings.from_joined(handles, ratings)
+        self.fetch_time = fetch_time
+        self.next_refresh_time = fetch_time + self._REFRESH_DELAY
+        self.logger.info(f'Effective ratings of {len(self.handle_ratings)} users loaded from '
+                         'disk')
+
+    @tasks.task_spec(name='EffectiveRatingCacheUpdate')
+    async def _update_task(self, _):
+        async with self.refresh_lock:
+            await self._refresh()
+
+    @_update_task.waiter(run_first=True)
+    async def _update_task_waiter(self):
+        await asyncio.sleep(self.next_refresh_time - time.time())
+
+    @_update_task.exception_handler()
+    async def _update_task_exception_handler(self, ex):
+        self.next_refresh_time = time.time() + self._EXCEPTION_REFRESH_DELAY
+
+    async def _refresh(self):
+        with cf.request_priority(cf.Priority.BULK):
+            users = await cf.user.ratedList(activeOnly=False)
+        fetch_time = time.time()
+
+        def encode():
+            # Handles are unique in the rated list, so they are joined directly instead of being
+            # added one by one.
+            return ('\n'.join(user.handle for user in users),
+                    array('i', (user.effective_rating for user in users)).tobytes())
+
+        # The users are not touched by anything else, so they are encoded off the event loop.
+        handles, ratings = await asyncio.get_running_loop().run_in_executor(None, encode)
+        handle_ratings = HandleRatings.from_joined(handles, ratings)
+        self.handle_ratings = handle_ratings
+        self.fetch_time = fetch_time
+        self.next_refresh_time = fetch_time + self._REFRESH_DELAY
+        self.cache_master.conn.save_effective_ratings(handles, ratings, fetch_time)
+        self.logger.info(f'Effective ratings of {len(handle_ratings)} users fetched and saved to '
+                         'disk')
 
 
 class RatingChangesCache:
     _RATED_DELAY = 36 * 60 * 60
     _RELOAD_DELAY = 10 * 60
+    _FETCH_CONCURRENCY = 4
 
     def __init__(self, cache_master):
         self.cache_master = cache_master
         self.monitored_contests = []
-        self.handle_rating_cache = {}
+        self.handle_ratings = HandleRatings()
+        self._backfill_lock = asyncio.Lock()
         self.logger = logging.getLogger(self.__class__.__name__)
+        # Listen from the start, so that no change set is missed however the caches are started.
+        cf_common.event_sys.add_listener(self._on_contests_changed)
 
-    async def run(self):
-        self._refresh_handle_cache()
-        if not self.handle_rating_cache:
+    async def run(self, snapshot=None):
+        if snapshot is not None:
+            self.handle_ratings = snapshot
+            self.logger.info(f'Ratings for {len(snapshot)} handles loaded from snapshot')
+        else:
+            self._load_handle_ratings()
+        if not self.handle_ratings:
             self.logger.warning('Rating changes cache on disk is empty. This must be populated '
                                 'manually before use.')
-        self._update_task.start()
+
+    def get_snapshot(self):
+        # Copied, as the ratings are changed in place when rating changes are saved.
+        return self.handle_ratings.copy()
 
     async def fetch_contest(self, contest_id):
         """Fetch rating changes for a particular contest. Intended for manual trigger."""
         contest = self.cache_master.contest_cache.contest_by_id[contest_id]
-        changes = await self._fetch([contest])
+        with cf.request_priority(cf.Priority.BULK):
+            # Errors are not ignored here, the saved changes are only cleared after a fetch.
+            changes = await cf.contest.ratingChanges(contest_id=contest.id)
+        contest_changes_pairs = [(contest, changes)] if changes else []
         self.cache_master.conn.clear_rating_changes(contest_id=contest_id)
-        self._save_changes(changes)
-        return len(changes)
+        self._save_changes(contest_changes_pairs)
+        # Ratings of handles in the contest may have been taken back by the clear.
+        self._load_handle_ratings()
+        return sum(len(changes) for _, changes in contest_changes_pairs)
 
-    async def fetch_all_contests(self):
+    async def fetch_all_contests(self, progress=None):
         """Fetch rating changes for all contests. Intended for manual trigger."""
-        self.cache_master.conn.clear_rating_changes()
-        return await self.fetch_missing_contests()
+        async with self._backfill_lock:
+            self.cache_master.conn.clear_rating_changes()
+            self.handle_ratings = HandleRatings()
+            self.cache_master.schedule_snapshot()
+        return await self.fetch_missing_contests(progress)
 
-    async def fetch_missing_contests(self):
+    async def fetch_missing_contests(self, progress=None):
         """Fetch rating changes for contests which are not saved in database. Intended for
-        manual trigger."""
-        contests = self.cache_master.contest_cache.contests_by_phase['FINISHED']
-        contests = [
-            contest for contest in contests if not self.has_rating_changes_saved(contest.id)]
-        total_changes = 0
-        for contests_chunk in paginator.chunkify(contests, _CONTESTS_PER_BATCH_IN_CACHE_UPDATES):
-            contests_chunk = await self._fetch(contests_chunk)
-            self._save_changes(contests_chunk)
-            total_changes += len(contests_chunk)
-        return total_changes
+        manual trigger.
+
+        Contests are fetched concurrently in chunks and every chunk is saved as soon as it is
+        fetched, so an interrupted run is resumed by running this again. After every chunk
+        `progress` is awaited, if given, with the number of contests done, the number of contests
+        to do and the number of changes saved so far.
+        """
+        async with self._backfill_lock:
+            contests = self.cache_master.contest_cache.contests_by_phase['FINISHED']
+            contests = [
+                contest for contest in contests if not self.has_rating_changes_saved(contest.id)]
+            total_changes = 0
+            done = 0
+            for contests_chunk in paginator.chunkify(contests,
+                                                     _CONTESTS_PER_BATCH_IN_CACHE_UPDATES):
+                with cf.request_priority(cf.Priority.BULK):
+                    contest_changes_pairs = await self._fetch(contests_chunk)
+                self._save_changes(contest_changes_pairs)
+                total_changes += sum(len(changes) for _, changes in contest_changes_pairs)
+                done += len(contests_chunk)
+                if progress is not None:
+                    await progress(done, len(contests), total_changes)
+            return total_changes
 
     def is_newly_finished_without_rating_changes(self, contest):
         now = time.time()
@@ -409,19 +810,25 @@ class RatingChangesCache:
                 now - contest.end_time < self._RATED_DELAY and
                 not self.has_rating_changes_saved(contest.id))
 
-    @tasks.task_spec(name='RatingChangesCacheUpdate',
-                     waiter=tasks.Waiter.for_event(events.ContestListRefresh))
-    async def _update_task(self, _):
+    @events.listener_spec(name='RatingChangesCacheContestsChanged',
+                          event_cls=events.ContestsChanged,
+                          with_lock=True)
+    async def _on_contests_changed(self, event):
         # Some notes:
         # A hack phase is tagged as FINISHED with empty list of rating changes. After the hack
         # phase, the phase changes to systest then again FINISHED. Since we cannot differentiate
         # between the two FINISHED phases, we are forced to fetch during both.
         # A contest also has empty list if it is unrated. We assume that is the case if
         # _RATED_DELAY time has passed since the contest end.
+        # Only contests which were added or changed can have become newly finished, the ones
+        # already monitored drop out by themselves in the monitor task.
+        # Changes must not be saved before the handle ratings are loaded, as they would be lost.
+        await self.cache_master.wait_until_ready('rating_changes_cache')
 
         to_monitor = [
             contest for contest in
-            self.cache_master.contest_cache.contests_by_phase['FINISHED']
+            _current_versions(self.cache_master.contest_cache,
+                              self.monitored_contests + event.added + event.changed)
             if self.is_newly_finished_without_rating_changes(contest)
                and not _is_blacklisted(contest)
         ]
@@ -435,6 +842,8 @@ class RatingChangesCache:
                 self._monitor_task.start()
             else:
                 self.monitored_contests = []
+        else:
+            self.monitored_contests = to_monitor
 
     @tasks.task_spec(name='RatingChangesCacheUpdate.MonitorNewlyFinishedContests',
                      waiter=tasks.Waiter.fixed_delay(_RELOAD_DELAY))
@@ -450,7 +859,8 @@ class RatingChangesCache:
             await self._monitor_task.stop()
             return
 
-        contest_changes_pairs = await self._fetch(self.monitored_contests)
+        with cf.request_priority(cf.Priority.MONITOR):
+            contest_changes_pairs = await self._fetch(self.monitored_contests)
         # Sort by the rating update time of the first change in the list of changes, assuming
         # every change in the list has the same time.
         contest_changes_pairs.sort(key=lambda pair: pair[1][0].ratingUpdateTimeSeconds)
@@ -460,17 +870,20 @@ class RatingChangesCache:
                                          rating_changes=changes)
 
     async def _fetch(self, contests):
-        all_changes = []
-        for contest in contests:
-            try:
-                changes = await cf.contest.ratingChanges(contest_id=contest.id)
-                self.logger.info(f'{len(changes)} rating changes fetched for contest {contest.id}')
-                if changes:
-                    all_changes.append((contest, changes))
-            except cf.CodeforcesApiError as er:
-                self.logger.warning(f'Fetch rating changes failed for contest {contest.id}, ignoring. {er!r}')
-                pass
-        return all_changes
+        all_changes = await cf.fan_out(self._fetch_for_contest, contests,
+                                       concurrency=self._FETCH_CONCURRENCY)
+        return [(contest, changes) for contest, changes in zip(contests, all_changes) if changes]
+
+    async def _fetch_for_contest(self, contest):
+        try:
+            changes = await cf.contest.ratingChanges(contest_id=contest.id)
+            self.logger.info(f'{len(changes)} rating changes fetched for contest {contest.id}')
+        except cf.CodeforcesUnavailableError:
+            raise
+        except cf.CodeforcesApiError as er:
+            self.logger.warning(f'Fetch rating changes failed for contest {contest.id}, ignoring. {er!r}')
+            changes = []
+        return changes
 
     def _save_changes(self, contest_changes_pairs):
         flattened = [change for _, changes in contest_changes_pairs for change in changes]
@@ -478,15 +891,18 @@ class RatingChangesCache:
             return
         rc = self.cache_master.conn.save_rating_changes(flattened)
         self.logger.info(f'Saved {rc} changes to database.')
-        self._refresh_handle_cache()
-
-    def _refresh_handle_cache(self):
-        changes = self.cache_master.conn.get_all_rating_changes()
-        handle_rating_cache = {}
-        for change in changes:
-            handle_rating_cache[change.handle] = change.newRating
-        self.handle_rating_cache = handle_rating_cache
-        self.logger.info(f'Ratings for {len(handle_rating_cache)} handles cached')
+        for change in flattened:
+            self.handle_ratings.set(change.handle, change.newRating,
+                                    change.ratingUpdateTimeSeconds)
+        self.cache_master.schedule_snapshot()
+
+    def _load_handle_ratings(self):
+        handle_ratings = HandleRatings()
+        for handle, rating, update_time in self.cache_master.conn.get_latest_ratings():
+            handle_ratings.set(handle, rating, update_time or 0)
+        self.handle_ratings = handle_ratings
+        self.cache_master.schedule_snapshot()
+        self.logger.info(f'Ratings for {len(handle_ratings)} handles cached')
 
     def get_users_with_more_than_n_contests(self, time_cutoff, n):
         return self.cache_master.conn.get_users_with_more_than_n_contests(time_cutoff, n)
@@ -501,15 +917,15 @@ class RatingChangesCache:
         return self.cache_master.conn.get_rating_changes_for_handle(handle)
 
     def get_current_rating(self, handle, default_if_absent=False):
-        return self.handle_rating_cache.get(handle,
-                                            cf.DEFAULT_RATING if default_if_absent else None)
+        return self.handle_ratings.get(handle,
+                                       cf.DEFAULT_RATING if default_if_absent else None)
 
     def get_all_ratings_before_timestamp(self, timestamp):
         res = self.cache_master.conn.get_all_ratings_before_timestamp(timestamp)
         return {ratingchange.handle: ratingchange for ratingchange in res}
 
     def get_all_ratings(self):
-        return list(self.handle_rating_cache.values())
+        return self.handle_ratings.ratings.tolist()
 
 
 class RanklistCacheError(CacheError):
@@ -522,17 +938,45 @@ class RanklistNotMonitored(RanklistCacheError):
         self.contest = contest
 
 
+# Rating changes of everyone in a contest, kept so that ranklists of a few handles can be built
+# from their rows alone. official_rank_by_handle has the ranks among rated contestants.
+RatingSnapshot = namedtuple('RatingSnapshot',
+                            'is_rated delta_by_handle official_rank_by_handle predicted fetch_time')
+
+
+# Hashes of the standings a monitored ranklist was built from. rows_hash covers everything shown
+# in the ranklist, score_hash only the scores of official contestants, which the prediction uses.
+StandingsFingerprint = namedtuple('StandingsFingerprint', 'rows_hash score_hash')
+
+
+def _official_standings(standings):
+    """Returns the rows of the official standings among the unofficial ones."""
+    return [row for row in standings if row.party.participantType == 'CONTESTANT']
+
+
+def _fingerprint_standings(standings):
+    rows_hash = hash(tuple((Ranklist.get_ranklist_lookup_key(row), row.party.participantType,
+                            row.rank, row.points, row.penalty, tuple(row.problemResults))
+                           for row in standings))
+    score_hash = hash(tuple((Ranklist.get_ranklist_lookup_key(row), row.points, row.penalty)
+                            for row in _official_standings(standings)))
+    return StandingsFingerprint(rows_hash, score_hash)
+
+
 class RanklistCache:
     _RELOAD_DELAY = 2 * 60
+    _PREDICTED_SNAPSHOT_TTL = 10 * 60
+    _MAX_RATING_SNAPSHOTS = 20
 
     def __init__(self, cache_master):
         self.cache_master = cache_master
         self.monitored_contests = []
         self.ranklist_by_contest = {}
+        self.fingerprint_by_contest = {}
+        self.rating_snapshot_by_contest = OrderedDict()
         self.logger = logging.getLogger(self.__class__.__name__)
-
-    async def run(self):
-        self._update_task.start()
+        # Listen from the start, so that no change set is missed however the caches are started.
+        cf_common.event_sys.add_listener(self._on_contests_changed)
 
     # Currently ranklist monitoring only supports caching unofficial ranklists
     # If official ranklist is asked, the cache will throw RanklistNotMonitored Error
@@ -541,20 +985,22 @@ class RanklistCache:
             raise RanklistNotMonitored(contest)
         return self.ranklist_by_contest[contest.id]
 
-    @tasks.task_spec(name='RanklistCacheUpdate',
-                     waiter=tasks.Waiter.for_event(events.ContestListRefresh))
-    async def _update_task(self, _):
-        contests_by_phase = self.cache_master.contest_cache.contests_by_phase
-        running_contests = contests_by_phase['_RUNNING']
-
+    @events.listener_spec(name='RanklistCacheContestsChanged',
+                          event_cls=events.ContestsChanged,
+                          with_lock=True)
+    async def _on_contests_changed(self, event):
+        # Only contests which were added or changed can have started or finished, the ones
+        # already monitored drop out by themselves in the monitor task.
         rating_cache = self.cache_master.rating_changes_cache
-        finished_contests = [
-            contest for contest in contests_by_phase['FINISHED']
-            if not _is_blacklisted(contest)
-               and rating_cache.is_newly_finished_without_rating_changes(contest)
+        to_monitor = [
+            contest for contest in
+            _current_versions(self.cache_master.contest_cache,
+                              self.monitored_contests + event.added + event.changed)
+            if contest.phase in ContestCache._RUNNING_PHASES or (
+                not _is_blacklisted(contest)
+                and rating_cache.is_newly_finished_without_rating_changes(contest))
         ]
 
-        to_monitor = running_contests + finished_contests
         cur_ids = {contest.id for contest in self.monitored_contests}
         new_ids = {contest.id for contest in to_monitor}
         if new_ids != cur_ids:
@@ -563,7 +1009,11 @@ class RanklistCache:
                 self.monitored_contests = to_monitor
                 self._monitor_task.start()
             else:
+                self.monitored_contests = []
                 self.ranklist_by_contest = {}
+                self.fingerprint_by_contest = {}
+        else:
+            self.monitored_contests = to_monitor
 
     @tasks.task_spec(name='RanklistCacheUpdate.MonitorActiveContests',
                      waiter=tasks.Waiter.fixed_delay(_RELOAD_DELAY))
@@ -578,23 +1028,30 @@ class RanklistCache:
 
         if not self.monitored_contests:
             self.ranklist_by_contest = {}
+            self.fingerprint_by_contest = {}
             self.logger.info('No more active contests for which to monitor ranklists.')
             await self._monitor_task.stop()
             return
 
-        ranklist_by_contest = await self._fetch(self.monitored_contests)
+        monitored_ids = {contest.id for contest in self.monitored_contests}
+        self.fingerprint_by_contest = {
+            contest_id: fingerprint
+            for contest_id, fingerprint in self.fingerprint_by_contest.items()
+            if contest_id in monitored_ids
+        }
+        with cf.request_priority(cf.Priority.MONITOR):
+            ranklist_by_contest = await self._fetch(self.monitored_contests)
         # If any ranklist could not be fetched, the old ranklist is kept.
         for contest_id, ranklist in ranklist_by_contest.items():
             self.ranklist_by_contest[contest_id] = ranklist
 
     @staticmethod
     async def _get_contest_details(contest_id, show_unofficial):
-        contest, problems, standings = await cf.contest.standings(contest_id=contest_id,
-                                                                  show_unofficial=show_unofficial)
         # Exclude PRACTICE and MANAGER
-        standings = [row for row in standings
-                     if row.party.participantType in ('CONTESTANT', 'OUT_OF_COMPETITION', 'VIRTUAL')]
-
+        participant_types = ('CONTESTANT', 'OUT_OF_COMPETITION', 'VIRTUAL')
+        contest, problems, standings = await cf.contest.standings(contest_id=contest_id,
+                                                                  show_unofficial=show_unofficial,
+                                                                  participant_types=participant_types)
         return contest, problems, standings
 
     # Fetch final rating changes from CF.
@@ -630,14 +1087,16 @@ class RanklistCache:
         if not show_unofficial:
             standings_official = standings
         else:
-            _, _, standings_official = await cf.contest.standings(contest_id=contest_id)
+            standings_official = _official_standings(standings)
+        return await self._predict_ranklist(contest, problems, standings, standings_official, now)
 
+    async def _predict_ranklist(self, contest, problems, standings, standings_official, now):
         has_teams = any(row.party.teamId is not None for row in standings_official)
         if cf_common.is_nonstandard_contest(contest) or has_teams:
             # The contest is not traditionally rated
             ranklist = Ranklist(contest, problems, standings, now, is_rated=False)
         else:
-            current_rating = await CacheSystem.getUsersEffectiveRating(activeOnly=False)
+            current_rating = await self.cache_master.effective_rating_cache.get_ratings()
             current_rating = {row.party.members[0].handle: current_rating.get(row.party.members[0].handle, 1500)
                               for row in standings_official}
             if 'Educational' in contest.name:
@@ -666,14 +1125,116 @@ class RanklistCache:
 
         return ranklist
 
+    def _store_rating_snapshot(self, contest_id, snapshot):
+        self.rating_snapshot_by_contest[contest_id] = snapshot
+        self.rating_snapshot_by_contest.move_to_end(contest_id)
+        while len(self.rating_snapshot_by_contest) > self._MAX_RATING_SNAPSHOTS:
+            self.rating_snapshot_by_contest.popitem(last=False)
+
+    async def _get_rating_snapshot(self, contest_id, fetch_changes):
+        snapshot = self.rating_snapshot_by_contest.get(contest_id)
+        if snapshot is not None and not snapshot.predicted:
+            return snapshot
+
+        if fetch_changes:
+            try:
+                changes = await cf.contest.ratingChanges(contest_id=contest_id)
+            except cf.RatingChangesUnavailableError:
+                changes = []
+            # For contests intended to be rated but declared unrated, an empty list is returned.
+            if changes:
+                snapshot = RatingSnapshot(
+                    is_rated=True,
+                    delta_by_handle={change.handle: change.newRating - change.oldRating
+                                     for change in changes},
+                    official_rank_by_handle={change.handle: change.rank for change in changes},
+                    predicted=False,
+                    fetch_time=time.time())
+                self._store_rating_snapshot(contest_id, snapshot)
+                return snapshot
+
+        if snapshot is None or time.time() >= snapshot.fetch_time + self._PREDICTED_SNAPSHOT_TTL:
+            # Predicting needs the full official standings, fetched once and shared by all
+            # partial ranklists of the contest until the snapshot expires.
+            contest, problems, standings = await self._get_contest_details(contest_id,
+                                                                           show_unofficial=False)
+            ranklist = await self._predict_ranklist(contest, problems, standings, standings,
+                                                    time.time())
+            has_deltas = ranklist.is_rated and ranklist.delta_by_handle is not None
+            snapshot = RatingSnapshot(
+                is_rated=ranklist.is_rated,
+                delta_by_handle=ranklist.delta_by_handle,
+                official_rank_by_handle=ranklist.get_official_ranks() if has_deltas else None,
+                predicted=True,
+                fetch_time=ranklist.fetch_time)
+            self._store_rating_snapshot(contest_id, snapshot)
+        else:
+            self.rating_snapshot_by_contest.move_to_end(contest_id)
+        return snapshot
+
+    @staticmethod
+    async def _get_partial_contest_details(contest_id, handles, show_unofficial):
+        # Exclude PRACTICE and MANAGER
+        participant_types = ('CONTESTANT', 'OUT_OF_COMPETITION', 'VIRTUAL')
+        standings = []
+        # The handles parameter takes as many handles as user.info does.
+        for chunk in cf.user_info_chunkify(handles):
+            chunk = list(chunk)
+            while True:
+                try:
+                    contest, problems, rows = await cf.contest.standings(
+                        contest_id=contest_id, handles=chunk, show_unofficial=show_unofficial,
+                        participant_types=participant_types)
+                    break
+                except cf.HandleNotFoundError as e:
+                    # A renamed or deleted handle fails the whole query, and the API reports only
+                    # one such handle per query. Drop them one at a time.
+                    missing = [handle for handle in chunk if handle.lower() == e.handle.lower()]
+                    if not missing or len(chunk) == 1:
+                        raise
+                    chunk.remove(missing[0])
+            standings += rows
+        standings.sort(key=lambda row: row.rank)
+        return contest, problems, standings
+
+    async def generate_partial_ranklist(self, contest_id, handles, *, fetch_changes=False,
+                                        predict_changes=False, show_unofficial=True):
+        """Like `generate_ranklist`, but only the rows of the given handles are fetched. The rating
+        changes come from a snapshot of the whole contest which is shared between calls."""
+        assert fetch_changes ^ predict_changes
+        assert handles
+
+        try:
+            contest, problems, standings = await self._get_partial_contest_details(
+                contest_id, handles, show_unofficial)
+        except cf.ContestNotFoundError:
+            raise
+        except cf.TrueApiError as e:
+            self.logger.warning(f'Fetching full standings of contest {contest_id}, partial '
+                                f'standings failed with {e!r}')
+            contest, problems, standings = await self._get_contest_details(contest_id,
+                                                                           show_unofficial)
+        now = time.time()
+        snapshot = await self._get_rating_snapshot(contest_id, fetch_changes)
+        ranklist = Ranklist(contest, problems, standings, now, is_rated=snapshot.is_rated)
+        if snapshot.delta_by_handle is not None:
+            ranklist.set_deltas(snapshot.delta_by_handle, predicted=snapshot.predicted)
+
+        # Educational contests have div1 peeps in the official standings, see generate_ranklist.
+        if not show_unofficial and 'Educational' in contest.name:
+            if snapshot.official_rank_by_handle is None:
+                raise DeltasNotPresentError(contest)
+            ranklist.set_official_ranks(snapshot.official_rank_by_handle)
+
+        return ranklist
+
     async def generate_vc_ranklist(self, contest_id, handle_to_member_id):
         handles = list(handle_to_member_id.keys())
-        contest, problems, standings = await cf.contest.standings(contest_id=contest_id,
-                                                                  show_unofficial=True)
         # Exclude PRACTICE, MANAGER and OUR_OF_COMPETITION
-        standings = [row for row in standings
-                     if row.party.participantType == 'CONTESTANT' or
-                     row.party.members[0].handle in handles]
+        contest, problems, standings = await cf.contest.standings(contest_id=contest_id,
+                                                                  show_unofficial=True,
+                                                                  participant_types=['CONTESTANT'],
+                                                                  member_handles=handles)
         standings.sort(key=lambda row: row.rank)
         standings = [row._replace(rank=i + 1) for i, row in enumerate(standings)]
         now = time.time()
@@ -702,7 +1263,7 @@ class RanklistCache:
         ranklist_by_contest = {}
         for contest in contests:
             try:
-                ranklist = await self.generate_ranklist(contest.id, predict_changes=True)
+                ranklist = await self._fetch_monitored_ranklist(contest.id)
                 ranklist_by_contest[contest.id] = ranklist
                 self.logger.info(f'Ranklist fetched for contest {contest.id}')
             except cf.CodeforcesApiError as er:
@@ -710,29 +1271,298 @@ class RanklistCache:
 
         return ranklist_by_contest
 
+    async def _fetch_monitored_ranklist(self, contest_id):
+        """Like `generate_ranklist` with predicted changes and unofficial contestants, but the
+        previous ranklist of the contest is reused if the standings did not change, and its
+        predicted changes if the scores of official contestants did not change."""
+        contest, problems, standings = await self._get_contest_details(contest_id,
+                                                                       show_unofficial=True)
+        now = time.time()
+        fingerprint = _fingerprint_standings(standings)
+        old_fingerprint = self.fingerprint_by_contest.get(contest_id)
+        old_ranklist = self.ranklist_by_contest.get(contest_id)
+
+        if old_fingerprint is None or old_ranklist is None:
+            ranklist = await self._predict_ranklist(contest, problems, standings,
+                                                    _official_standings(standings), now)
+        elif fingerprint.rows_hash == old_fingerprint.rows_hash:
+            ranklist = old_ranklist
+            ranklist.contest = contest
+            ranklist.fetch_time = now
+        elif fingerprint.score_hash == old_fingerprint.score_hash:
+            ranklist = Ranklist(contest, problems, standings, now, is_rated=old_ranklist.is_rated)
+            if old_ranklist.delta_by_handle is not None:
+                ranklist.set_deltas(old_ranklist.delta_by_handle, predicted=True)
+        else:
+            ranklist = await self._predict_ranklist(contest, problems, standings,
+                                                    _official_standings(standings), now)
+        self.fingerprint_by_contest[contest_id] = fingerprint
+        return ranklist
+
+
+class SubmissionStore:
+    """Persistent per-handle store of submissions from the user.status endpoint. Submissions are
+    kept in the cache database and only the head of a handle's submission list which is newer than
+    what is stored, still being judged, or recent enough to be hacked, system tested or rejudged,
+    is fetched from the API. Handles which are not queried for a while are evicted.
+    """
+    _INITIAL_PAGE_SIZE = 50
+    _MAX_PAGE_SIZE = 1000
+    # Stored submissions this recent are fetched again on every sync, as their verdicts may change.
+    _RESYNC_WINDOW = 7 * 24 * 60 * 60
+    _EVICT_AFTER = 30 * 24 * 60 * 60
+    _EVICT_INTERVAL = 24 * 60 * 60
+
+    def __init__(self, cache_master):
+        self.cache_master = cache_master
+        self.lock_by_handle = defaultdict(asyncio.Lock)
+        # Incremented by every clear or eviction, as part of the versions returned by get_version.
+        self.clears = 0
+        # Incremented whenever stored submissions of the handle change.
+        self.revision_by_handle = defaultdict(int)
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def run(self):
+        self._evict_task.start()
+
+    async def get_submissions(self, handle):
+        """Returns all submissions of the handle, latest first like `cf.user.status`, as a
+        `SubmissionTable`. If Codeforces cannot be reached, the stored submissions are returned if
+        there are any."""
+        key = handle.lower()
+        async with self.lock_by_handle[key]:
+            await self._update(handle, key)
+            return self.cache_master.conn.fetch_submissions(key)
+
+    async def get_version(self, handle):
+        """Updates the stored submissions of the handle like `get_submissions`, but only returns a
+        value that changes whenever they change. The submissions can then be read with
+        `get_stored_submissions` only if they differ from a version seen before."""
+        key = handle.lower()
+        async with self.lock_by_handle[key]:
+            await self._update(handle, key)
+            conn = self.cache_master.conn
+            last_id, _ = conn.get_submission_sync_point(key)
+            return ((self.clears, self.revision_by_handle[key], last_id)
+                    + tuple(conn.get_submission_counts(key)))
+
+    def get_stored_submissions(self, handle):
+        return self.cache_master.conn.fetch_submissions(handle.lower())
+
+    def clear(self, handle=None):
+        """Forget stored submissions of the handle, or of all handles if none is given, to pick up
+        rejudges of old submissions. Returns the number of submissions forgotten."""
+        count = self.cache_master.conn.clear_submissions(
+            handle.lower() if handle is not None else None)
+        self.clears += 1
+        return count
+
+    @tasks.task_spec(name='SubmissionStoreEviction',
+                     waiter=tasks.Waiter.fixed_delay(_EVICT_INTERVAL))
+    async def _evict_task(self, _):
+        count = self.cache_master.conn.evict_submissions(time.time() - self._EVICT_AFTER)
+        if count:
+            self.clears += 1
+            self.logger.info(f'Submissions of {count} handles evicted')
+
+    async def _update(self, handle, key):
+        conn = self.cache_master.conn
+        try:
+            await self._sync(handle, key)
+        except cf.CodeforcesApiError as e:
+            if isinstance(e, cf.TrueApiError) or conn.get_submission_sync_point(key)[0] is None:
+                raise
+            self.logger.warning(f'Serving stored submissions of {handle} after {e!r}')
+            cf_common.note_stale_data(conn.get_submission_sync_time(key))
+
+    async def _sync(self, handle, key):
+        conn = self.cache_master.conn
+        clears = self.clears
+        last_id, first_unsettled_id = conn.get_submission_sync_point(
+            key, time.time() - self._RESYNC_WINDOW)
+        if last_id is None:
+            submissions = await cf.user.status(handle=handle)
+            if self.clears != clears:
+                return await self._sync(handle, key)
+            self.logger.info(f'{len(submissions)} submissions fetched for new handle {handle}')
+            self._save(key, submissions)
+            return
+
+        # Submission ids increase with time, so everything before the stop id is already known and
+        # settled. Pages are fetched from the most recent submission until the stop id is reached.
+        stop_id = first_unsettled_id if first_unsettled_id is not None else last_id
+        submissions = []
+        count = self._INITIAL_PAGE_SIZE
+        while True:
+            page = await cf.user.status(handle=handle, from_=len(submissions) + 1, count=count)
+            submissions += page
+            if len(page) < count or page[-1].id <= stop_id:
+                break
+            count = min(2 * count, self._MAX_PAGE_SIZE)
+        if self.clears != clears:
+            # The stored submissions were cleared meanwhile, so the stop id is meaningless.
+            return await self._sync(handle, key)
+        self._save(key, [sub for sub in submissions if sub.id >= stop_id])
+
+    def _save(self, key, submissions):
+        conn = self.cache_master.conn
+        if submissions and conn.save_submissions(key, submissions):
+            self.revision_by_handle[key] += 1
+        conn.set_submission_sync_time(key, time.time())
+
 
 class CacheSystem:
-    def __init__(self, conn):
+    # Caches whose state is kept in the snapshot, with the cache database tables it is built from.
+    _SNAPSHOT_TABLES_BY_CACHE = {
+        'rating_changes_cache': ('rating_change',),
+        'problem_cache': ('problem',),
+        'problemset_cache': ('problem2', 'contest'),
+    }
+    _SNAPSHOT_DELAY = 5 * 60
+    # Caches started by start, with the caches each of them needs to be started first.
+    _STARTUP_DEPENDENCIES = {
+        'contest_cache': (),
+        'problem_cache': ('contest_cache',),
+        'problemset_cache': ('contest_cache',),
+        'rating_changes_cache': (),
+        'effective_rating_cache': (),
+    }
+    # Caches which are slow to start and needed by few commands. These only start once the other
+    # caches have, after start returns.
+    DEFERRED_CACHES = ('problemset_cache', 'rating_changes_cache', 'effective_rating_cache')
+
+    def __init__(self, conn, snapshot_path=None):
         self.conn = conn
+        self.snapshot_path = snapshot_path
+        self.snapshot_pending = False
+        self.ready_by_cache = {name: asyncio.Event() for name in self._STARTUP_DEPENDENCIES}
+        self.startup_exception_by_cache = {}
+        self.logger = logging.getLogger(self.__class__.__name__)
         self.contest_cache = ContestCache(self)
         self.problem_cache = ProblemCache(self)
+        self.effective_rating_cache = EffectiveRatingCache(self)
         self.rating_changes_cache = RatingChangesCache(self)
         self.ranklist_cache = RanklistCache(self)
         self.problemset_cache = ProblemsetCache(self)
+        self.submission_store = SubmissionStore(self)
+        self.problem_picker = problem_picker.ProblemPicker(self)
 
     async def run(self):
-        await self.rating_changes_cache.run()
-        await self.ranklist_cache.run()
-        await self.contest_cache.run()
-        await self.problem_cache.run()
-        await self.problemset_cache.run()
-
-    @staticmethod
-    @cached(ttl=30 * 60)
-    async def getUsersEffectiveRating(*, activeOnly=None):
-        """ Returns a dictionary mapping user handle to his effective rating for all the users.
-        """
-        ratedList = await cf.user.ratedList(activeOnly=activeOnly)
-        users_effective_rating_dict = {user.handle: user.effective_rating
-                                       for user in ratedList}
-        return users_effective_rating_dict
+        """Starts all caches and returns once they have all started."""
+        await self.start()
+        await self.wait_until_ready(*self.DEFERRED_CACHES)
+
+    async def start(self):
+        """Starts the caches, each as soon as the caches it needs have started, and returns once
+        all but the DEFERRED_CACHES have started. The DEFERRED_CACHES start in the background after
+        that, commands that need one must wait for it with `wait_until_ready`. Raises
+        `CacheUnavailable` if a cache that is not deferred could not be started."""
+        begin = time.perf_counter()
+        snapshot = self._read_snapshot()
+        timings = [f'snapshot {time.perf_counter() - begin:.2f}s']
+        essential = [name for name in self._STARTUP_DEPENDENCIES
+                     if name not in self.DEFERRED_CACHES]
+        startup_tasks = [asyncio.create_task(self._start_cache(name, snapshot, timings))
+                         for name in essential]
+        await asyncio.wait(startup_tasks)
+        # The deferred caches are started from a separate task, so that they only start loading
+        # once the caller has gone on.
+        asyncio.create_task(self._finish_startup(startup_tasks, snapshot, begin, timings))
+        await self.wait_until_ready(*essential)
+        self.logger.info(f'Cache system ready in {time.perf_counter() - begin:.2f}s, still '
+                         f'starting {", ".join(self.DEFERRED_CACHES)}')
+
+    async def _start_cache(self, name, snapshot, timings):
+        try:
+            await self.wait_until_ready(*self._STARTUP_DEPENDENCIES[name])
+            start = time.perf_counter()
+            cache = getattr(self, name)
+            if name in self._SNAPSHOT_TABLES_BY_CACHE:
+                await cache.run(snapshot.get(name))
+            else:
+                await cache.run()
+            source = ' (snapshot)' if name in snapshot else ''
+            timings.append(f'{name} {time.perf_counter() - start:.2f}s{source}')
+        except CacheUnavailable as ex:
+            self.logger.warning(f'Not starting {name} as {ex.name} could not be started')
+            self.startup_exception_by_cache[name] = ex
+        except Exception as ex:
+            self.logger.exception(f'Exception while starting {name}')
+            self.startup_exception_by_cache[name] = ex
+        finally:
+            self.ready_by_cache[name].set()
+
+    async def _finish_startup(self, startup_tasks, snapshot, begin, timings):
+        startup_tasks += [asyncio.create_task(self._start_cache(name, snapshot, timings))
+                          for name in self.DEFERRED_CACHES]
+        await asyncio.gather(*startup_tasks)
+        self.logger.info(f'Cache system started in {time.perf_counter() - begin:.2f}s: '
+                         + ', '.join(timings))
+        await self.submission_store.run()
+        if self.snapshot_path is not None:
+            self._snapshot_task.start()
+
+    def is_ready(self, name):
+        return self.ready_by_cache[name].is_set() and name not in self.startup_exception_by_cache
+
+    async def wait_until_ready(self, *names):
+        """Waits until the given caches have started. Raises `CacheUnavailable` if any of them
+        could not be started."""
+        for name in names:
+            await self.ready_by_cache[name].wait()
+            if name in self.startup_exception_by_cache:
+                raise CacheUnavailable(name)
+
+    def schedule_snapshot(self):
+        """Notes that the state of a cache in the snapshot changed, so that the snapshot is written
+        again."""
+        self.snapshot_pending = True
+
+    def _read_snapshot(self):
+        """Returns the states of the caches in the snapshot which are still up to date with the
+        cache database."""
+        if self.snapshot_path is None:
+            return {}
+        sections = cache_snapshot.read(self.snapshot_path)
+        if sections is None:
+            return {}
+        table_versions = self.conn.get_table_versions()
+        snapshot = {}
+        for name, tables in self._SNAPSHOT_TABLES_BY_CACHE.items():
+            if name not in sections:
+                continue
+            section_versions, state = sections[name]
+            if section_versions != {table: table_versions.get(table, 0) for table in tables}:
+                self.logger.info(f'Snapshot of {name} is out of date')
+                continue
+            state = cache_snapshot.load_state(state)
+            if state is not None:
+                snapshot[name] = state
+        return snapshot
+
+    async def write_snapshot(self):
+        self.snapshot_pending = False
+        table_versions = self.conn.get_table_versions()
+        sections = {}
+        for name, tables in self._SNAPSHOT_TABLES_BY_CACHE.items():
+            state = getattr(self, name).get_snapshot()
+            if state is not None:
+                sections[name] = ({table: table_versions.get(table, 0) for table in tables}, state)
+        begin = time.perf_counter()
+
+        def encode_and_write():
+            data = cache_snapshot.encode(sections)
+            cache_snapshot.write(self.snapshot_path, data)
+            return data
+
+        # The states are not changed by the caches once returned by get_snapshot, so they can
+        # be encoded off the event loop.
+        data = await asyncio.get_running_loop().run_in_executor(None, encode_and_write)
+        self.logger.info(f'Snapshot of {len(sections)} caches written, {len(data)} bytes in '
+                         f'{time.perf_counter() - begin:.2f}s')
+
+    @tasks.task_spec(name='CacheSnapshotWrite',
+                     waiter=tasks.Waiter.fixed_delay(_SNAPSHOT_DELAY))
+    async def _snapshot_task(self, _):
+        if self.snapshot_pending:
+            await self.write_snapshot()
@@ -1,13 +1,22 @@
 import asyncio
+import contextlib
+import contextvars
 import logging
 import time
 import functools
+import urllib.parse
+import zlib
 from collections import namedtuple, deque, defaultdict
+from enum import IntEnum
 
 import aiohttp
 
 from discord.ext import commands
+from tle.util import api_telemetry
 from tle.util import codeforces_common as cf_common
+from tle.util import http_client
+from tle.util import json_backend
+from tle.util import json_stream
 
 API_BASE_URL = 'https://codeforces.com/api/'
 CONTEST_BASE_URL = 'https://codeforces.com/contest/'
@@ -151,9 +160,51 @@ ProblemResult = namedtuple('ProblemResult',
                            'points penalty rejectedAttemptCount type bestSubmissionTimeSeconds')
 
 
+def _compile_maker(namedtuple_cls, **converters):
+    """Returns a function that builds a `namedtuple_cls` from a dict, with None for missing keys.
+    The field lookups are generated as straight-line code once per class instead of looping over
+    `_fields` for every object. Fields given in `converters` are required in the dict, and their
+    values are passed through the converter.
+    """
+    namespace = {'_new': tuple.__new__, '_cls': namedtuple_cls}
+    args = []
+    for field in namedtuple_cls._fields:
+        if field in converters:
+            namespace[f'_convert_{field}'] = converters[field]
+            args.append(f'_convert_{field}(dict_[{field!r}])')
+        else:
+            args.append(f'get({field!r})')
+    source = (f'def make(dict_):\n'
+              f'    get = dict_.get\n'
+              f'    return _new(_cls, ({", ".join(args)},))\n')
+    exec(source, namespace)
+    return namespace['make']
+
+
+_makers = {}
+
+
 def make_from_dict(namedtuple_cls, dict_):
-    field_vals = [dict_.get(field) for field in namedtuple_cls._fields]
-    return namedtuple_cls._make(field_vals)
+    try:
+        maker = _makers[namedtuple_cls]
+    except KeyError:
+        maker = _makers[namedtuple_cls] = _compile_maker(namedtuple_cls)
+    return maker(dict_)
+
+
+_make_member = _compile_maker(Member)
+_make_problem = _compile_maker(Problem)
+_make_problem_result = _compile_maker(ProblemResult)
+_make_party = _compile_maker(
+    Party, members=lambda members: [_make_member(member) for member in members])
+_make_ranklist_row = _compile_maker(
+    RanklistRow, party=_make_party,
+    problemResults=lambda results: [_make_problem_result(result) for result in results])
+_make_user = _compile_maker(User)
+_make_submission = _compile_maker(Submission, problem=_make_problem, author=_make_party)
+_make_contest = _compile_maker(Contest)
+_make_rating_change = _compile_maker(RatingChange)
+_make_problem_statistics = _compile_maker(ProblemStatistics)
 
 
 # Error classes
@@ -194,6 +245,12 @@ class CallLimitExceededError(TrueApiError):
         super().__init__(comment, 'Codeforces API call limit exceeded')
 
 
+class CodeforcesUnavailableError(CodeforcesApiError):
+    """Raised without making a request while the circuit breaker is open."""
+    def __init__(self):
+        super().__init__('Codeforces seems to be down, try again later')
+
+
 class ContestNotFoundError(TrueApiError):
     def __init__(self, comment, contest_id):
         super().__init__(comment, f'Contest with ID `{contest_id}` not found on Codeforces')
@@ -206,12 +263,18 @@ class RatingChangesUnavailableError(TrueApiError):
 
 # Codeforces API query methods
 
-_session = None
+_response_cache = None
 
 
-async def initialize():
-    global _session
-    _session = aiohttp.ClientSession()
+async def initialize(response_cache=None, api_base_url=None):
+    """`response_cache`, if given, is a `ResponseCacheDbConn` in which responses are kept.
+    `api_base_url`, if given, replaces `API_BASE_URL`, e.g. to use a local stand-in server."""
+    global _response_cache
+    global API_BASE_URL
+    http_client.get_session()
+    _response_cache = response_cache
+    if api_base_url is not None:
+        API_BASE_URL = api_base_url
 
 
 def _bool_to_str(value):
@@ -220,58 +283,530 @@ def _bool_to_str(value):
     raise TypeError(f'Expected bool, got {value} of type {type(value)}')
 
 
+class Priority(IntEnum):
+    """Priority classes of API requests, most urgent first."""
+    INTERACTIVE = 0
+    MONITOR = 1
+    BULK = 2
+
+
+_request_priority = contextvars.ContextVar('request_priority', default=Priority.INTERACTIVE)
+
+
+@contextlib.contextmanager
+def request_priority(priority):
+    """Context manager under which API requests are scheduled with the given priority. Requests
+    made outside of one are treated as interactive.
+    """
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+class _WaitStats:
+    _RECENT_WAITS = 100
+
+    def __init__(self):
+        self.granted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent_waits = deque(maxlen=self._RECENT_WAITS)
+
+    def record(self, wait):
+        self.granted += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.recent_waits.append(wait)
+
+
+class RequestScheduler:
+    """Token bucket shared by all API requests. Waiting requests are granted tokens in order of
+    priority and first come first served within a priority class. A request that has waited longer
+    than `starvation_limit` seconds is served ahead of higher priority ones, so that background
+    work still progresses under sustained interactive load.
+    """
+
+    def __init__(self, *, rate=1, capacity=1, starvation_limit=30):
+        self.rate = rate
+        self.capacity = capacity
+        self.starvation_limit = starvation_limit
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.paused_until = 0
+        self.queue_by_priority = {priority: deque() for priority in Priority}
+        self.stats_by_priority = {priority: _WaitStats() for priority in Priority}
+        self.dispatcher = None
+
+    async def acquire(self, priority):
+        """Waits until the request is allowed to be made."""
+        enqueued = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self.queue_by_priority[priority].append((enqueued, future))
+        if self.dispatcher is None or self.dispatcher.done():
+            self.dispatcher = asyncio.create_task(self._dispatch())
+        await future
+        self.stats_by_priority[priority].record(time.monotonic() - enqueued)
+
+    def back_off(self, delay):
+        """Stops granting tokens for `delay` seconds, for all priorities."""
+        self.tokens = 0
+        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+
+    def get_stats(self):
+        """Returns a dict of queue depth and wait time stats, in seconds, for every priority."""
+        stats = {}
+        for priority in Priority:
+            wait_stats = self.stats_by_priority[priority]
+            recent = wait_stats.recent_waits
+            stats[priority.name] = {
+                'queued': sum(not future.done() for _, future in self.queue_by_priority[priority]),
+                'granted': wait_stats.granted,
+                'avg_wait': wait_stats.total_wait / wait_stats.granted if wait_stats.granted else 0,
+                'recent_avg_wait': sum(recent) / len(recent) if recent else 0,
+                'max_wait': wait_stats.max_wait,
+            }
+        return stats
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def _heads(self):
+        heads = []
+        for priority, queue in self.queue_by_priority.items():
+            # Drop requests which were cancelled while waiting.
+            while queue and queue[0][1].done():
+                queue.popleft()
+            if queue:
+                heads.append((priority, queue[0][0]))
+        return heads
+
+    def _pop_next(self, now):
+        heads = self._heads()
+        if not heads:
+            return None
+        starved = [(enqueued, priority) for priority, enqueued in heads
+                   if now - enqueued > self.starvation_limit]
+        priority = min(starved)[1] if starved else heads[0][0]
+        _, future = self.queue_by_priority[priority].popleft()
+        return future
+
+    async def _dispatch(self):
+        while self._heads():
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self._refill(now)
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                continue
+            future = self._pop_next(now)
+            if future is not None:
+                self.tokens -= 1
+                future.set_result(None)
+
+
+scheduler = RequestScheduler()
+
+
+class CircuitBreaker:
+    """Stops requests to the API while Codeforces appears to be down, so that callers fail fast
+    instead of each waiting out retries. The breaker opens after `failure_threshold` consecutive
+    failures that are not replies from the API, such as connection errors or HTML error pages.
+    Once `reset_timeout` seconds have passed, it is half-open and one request goes through as a
+    probe. If the probe succeeds the breaker closes, otherwise it opens again for twice as long,
+    up to `max_reset_timeout`.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, *, failure_threshold=5, reset_timeout=30, max_reset_timeout=10 * 60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.timeout = reset_timeout
+        self.open_until = 0
+        self.opened_at = None
+
+    @property
+    def is_open(self):
+        return self.state != self.CLOSED
+
+    @contextlib.contextmanager
+    def guard(self):
+        """Context manager around one request. Raises `CodeforcesUnavailableError` at once if
+        the request may not be made."""
+        if self.state == self.OPEN and time.monotonic() >= self.open_until:
+            self.state = self.HALF_OPEN
+            logger.info('Circuit breaker half-open, probing the CF API.')
+        elif self.state != self.CLOSED:
+            raise CodeforcesUnavailableError
+        probing = self.state == self.HALF_OPEN
+        try:
+            yield
+        except (CodeforcesApiError, asyncio.TimeoutError) as e:
+            if isinstance(e, TrueApiError):
+                # The API replied, so it is up.
+                self._on_success()
+            else:
+                self._on_failure(probing)
+            raise
+        except BaseException:
+            if probing:
+                # The probe was cancelled, let the next request probe instead.
+                self.state = self.OPEN
+            raise
+        else:
+            self._on_success()
+
+    def _on_success(self):
+        if self.state != self.CLOSED:
+            logger.info('Circuit breaker closed, the CF API is reachable again.')
+        self.state = self.CLOSED
+        self.failures = 0
+        self.timeout = self.reset_timeout
+        self.opened_at = None
+
+    def _on_failure(self, probing):
+        self.failures += 1
+        if probing:
+            self.timeout = min(2 * self.timeout, self.max_reset_timeout)
+        elif self.state != self.CLOSED or self.failures < self.failure_threshold:
+            return
+        if self.opened_at is None:
+            self.opened_at = time.time()
+        self.state = self.OPEN
+        self.open_until = time.monotonic() + self.timeout
+        logger.warning(f'Circuit breaker open for {self.timeout}s after {self.failures} '
+                       'consecutive failed CF API requests.')
+
+
+breaker = CircuitBreaker()
+
+
 def cf_ratelimit(f):
     tries = 3
-    per_second = 1
-    last = deque([0]*per_second)
+    backoff = 2
 
     @functools.wraps(f)
-    async def wrapped(*args, **kwargs):
+    async def wrapped(path, *args, **kwargs):
+        priority = _request_priority.get()
         for i in range(tries):
-            now = time.time()
-
-            # Next valid slot is 1s after the `per_second`th last request
-            next_valid = max(now, 1 + last[0])
-            last.append(next_valid)
-            last.popleft()
-
-            # Delay as needed
-            delay = next_valid - now
-            if delay > 0:
-                await asyncio.sleep(delay)
-
             try:
-                return await f(*args, **kwargs)
+                with breaker.guard():
+                    enqueued = time.monotonic()
+                    await scheduler.acquire(priority)
+                    with api_telemetry.telemetry.track_request(path, time.monotonic() - enqueued):
+                        return await f(path, *args, **kwargs)
             except (ClientError, CallLimitExceededError) as e:
-                logger.info(f'Try {i+1}/{tries} at query failed.')
-                logger.info(repr(e))
-                if i < tries - 1:
-                    logger.info(f'Retrying...')
+                error = e
+            logger.info(f'Try {i+1}/{tries} at query failed.')
+            logger.info(repr(error))
+            if i < tries - 1 and not breaker.is_open:
+                api_telemetry.telemetry.record_retry(path)
+                delay = backoff ** (i + 1)
+                logger.info(f'Retrying in {delay}s...')
+                if isinstance(error, CallLimitExceededError):
+                    # The limit is shared by every request, so everyone must wait.
+                    scheduler.back_off(delay)
                 else:
-                    logger.info(f'Aborting.')
-                    raise e
+                    await asyncio.sleep(delay)
+            else:
+                logger.info(f'Aborting.')
+                raise error
+    return wrapped
+
+
+# Seconds for which a successful result is reused by identical queries.
+_RESULT_TTL_BY_PATH = {
+    'contest.standings': 10,
+    'contest.ratingChanges': 30,
+    'problemset.problems': 60,
+    'user.ratedList': 60,
+}
+
+
+def cf_singleflight(f):
+    """Concurrent queries with the same path and params share a single request, so they cost one
+    rate limit slot and one download. Results are shared between callers and must not be mutated.
+    A query only joins a request made with its own priority or a more urgent one, so that an
+    interactive query does not wait in the queue of a background one.
+    """
+    inflight = {}
+    results = {}
+
+    def on_done(key, ttl, task):
+        if inflight.get(key, (None,))[0] is task:
+            del inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if ttl:
+            now = time.monotonic()
+            for old_key in [k for k, (expiry, _) in results.items() if expiry <= now]:
+                del results[old_key]
+            results[key] = (now + ttl, task.result())
+
+    @functools.wraps(f)
+    async def wrapped(path, data=None, **kwargs):
+        key = (path, tuple(sorted((data or {}).items())), tuple(sorted(kwargs.items())))
+        ttl = _RESULT_TTL_BY_PATH.get(path)
+        if key in results:
+            expiry, result = results[key]
+            if time.monotonic() < expiry:
+                api_telemetry.telemetry.record_call(path, shared=True)
+                return result
+        task, priority = inflight.get(key, (None, None))
+        if task is not None and priority > _request_priority.get():
+            # Requests of a more urgent query are made separately, and later queries join them.
+            task = None
+        api_telemetry.telemetry.record_call(path, shared=task is not None)
+        if task is None:
+            # The request runs in its own task, so cancelling one caller does not cancel it for
+            # the others.
+            task = asyncio.create_task(f(path, data, **kwargs))
+            task.add_done_callback(functools.partial(on_done, key, ttl))
+            inflight[key] = (task, _request_priority.get())
+        else:
+            logger.info(f'Joining in-flight query to {path} with {data}')
+        return await asyncio.shield(task)
     return wrapped
 
 
+class RanklistRowFilter(namedtuple('RanklistRowFilter', 'participant_types handles')):
+    """Keeps standings rows whose participant type is in `participant_types` or which have a member
+    in `handles`. Either may be None."""
+    __slots__ = ()
+
+    def __call__(self, row_dict):
+        party = row_dict['party']
+        if self.participant_types is not None and party['participantType'] in self.participant_types:
+            return True
+        return (self.handles is not None and
+                any(member['handle'] in self.handles for member in party['members']))
+
+
+class _StreamSpec(namedtuple('_StreamSpec', 'array_path make_item keep')):
+    """Describes how to decode the result of a query incrementally. Every element of the array at
+    `array_path` inside the result is turned into `make_item(element)` as it is decoded, and is
+    dropped without being built if `keep(element)` is false. `keep` may be None.
+    """
+    __slots__ = ()
+
+    def on_item(self, item_dict):
+        if self.keep is not None and not self.keep(item_dict):
+            return None
+        return self.make_item(item_dict)
+
+
+async def _read_stream(content, stream):
+    try:
+        return await json_stream.JsonStream(content).read(('result',) + stream.array_path,
+                                                         stream.on_item)
+    except json_stream.JsonStreamError as e:
+        logger.warning(f'CF API responded with malformed JSON: {e}')
+        raise CodeforcesApiError
+
+
+# Response cache
+
+_STANDINGS_SETTLED_AFTER = 3 * 24 * 60 * 60
+
+
+def _standings_freshness(result):
+    contest_ = result['contest']
+    end_time = (contest_.get('startTimeSeconds') or 0) + (contest_.get('durationSeconds') or 0)
+    if contest_['phase'] != 'FINISHED' or time.time() < end_time + _STANDINGS_SETTLED_AFTER:
+        return 0
+    if all(problem.get('rating') is not None for problem in result['problems']):
+        return None
+    # Problems may still be assigned ratings.
+    return 30 * 60
+
+
+# Seconds for which a response may be served from the response cache, computed from its result.
+# 0 means it is not stored at all and None that it never expires. Endpoints missing here are never
+# cached, such as user.info and user.rating whose results must be current after rating updates.
+_RESPONSE_FRESHNESS_BY_PATH = {
+    'contest.list': lambda result: 60,
+    'contest.ratingChanges': lambda result: 24 * 60 * 60 if result else 0,
+    'contest.standings': _standings_freshness,
+    'problemset.problems': lambda result: 60 * 60,
+}
+
+
+def _response_key(path, data):
+    return f'{path}?{urllib.parse.urlencode(sorted((data or {}).items()))}'
+
+
+class _MeteredReader:
+    """Passes reads through to an `aiohttp.StreamReader` while counting the bytes read and the
+    time spent waiting for them."""
+
+    def __init__(self, content):
+        self.content = content
+        self.nbytes = 0
+        self.read_time = 0.0
+
+    async def read(self, n=-1):
+        start = time.monotonic()
+        chunk = await self.content.read(n)
+        self.read_time += time.monotonic() - start
+        self.nbytes += len(chunk)
+        return chunk
+
+
+class _CompressingReader:
+    """Passes reads through to an `aiohttp.StreamReader` while compressing what was read."""
+
+    def __init__(self, content):
+        self.content = content
+        self.compressor = zlib.compressobj()
+        self.compressed = []
+
+    async def read(self, n=-1):
+        chunk = await self.content.read(n)
+        self.compressed.append(self.compressor.compress(chunk))
+        return chunk
+
+    def getvalue(self):
+        return b''.join(self.compressed) + self.compressor.flush()
+
+
+class _DecompressingReader:
+    """Reads a compressed body chunk by chunk, like an `aiohttp.StreamReader`."""
+    _CHUNK_SIZE = 1 << 14
+
+    def __init__(self, body):
+        self.body = body
+        self.pos = 0
+        self.decompressor = zlib.decompressobj()
+
+    async def read(self, n=-1):
+        while self.pos < len(self.body):
+            compressed = self.body[self.pos:self.pos + self._CHUNK_SIZE]
+            self.pos += len(compressed)
+            chunk = self.decompressor.decompress(compressed)
+            if chunk:
+                return chunk
+        return self.decompressor.flush()
+
+
+def _save_response(path, data, result, body):
+    ttl = _RESPONSE_FRESHNESS_BY_PATH[path](result)
+    if ttl == 0:
+        return
+    now = time.time()
+    expires_at = None if ttl is None else now + ttl
+    _response_cache.save_response(_response_key(path, data), path, body, expires_at, now)
+
+
+def purge_response_cache(path=None):
+    """Removes cached responses of the given endpoint, or of all endpoints. Returns the number of
+    responses removed."""
+    if _response_cache is None:
+        return 0
+    return _response_cache.clear_responses(path)
+
+
+async def _query_api(path, data=None, *, stream=None):
+    """Queries the API at `path`. If `stream` is given, the result is decoded incrementally as
+    described by the `_StreamSpec`. If Codeforces cannot be reached, the last response in the
+    response cache is served even if it is no longer fresh, and its age is reported with
+    `cf_common.note_stale_data`."""
+    try:
+        return await _query_api_shared(path, data, stream=stream)
+    except CodeforcesApiError as e:
+        if isinstance(e, TrueApiError) or _response_cache is None:
+            raise
+        stale = _response_cache.get_stale_response(_response_key(path, data))
+        if stale is None:
+            raise
+        body, saved_at = stale
+        logger.warning(f'Serving CF API query at {path} with {data} from stale response cache '
+                       f'after {e!r}')
+        cf_common.note_stale_data(saved_at)
+        return await _decode_cached_body(body, stream)
+
+
+async def _decode_cached_body(body, stream):
+    if stream is None:
+        return json_backend.loads(zlib.decompress(body))['result']
+    respjson = await _read_stream(_DecompressingReader(body), stream)
+    return respjson['result']
+
+
+@cf_singleflight
+async def _query_api_shared(path, data=None, *, stream=None):
+    """Fresh responses in the response cache are served without making a request."""
+    if _response_cache is not None and path in _RESPONSE_FRESHNESS_BY_PATH:
+        body = _response_cache.get_response(_response_key(path, data), time.time())
+        if body is not None:
+            logger.info(f'Serving CF API query at {path} with {data} from response cache')
+            api_telemetry.telemetry.record_cache_hit(path)
+            return await _decode_cached_body(body, stream)
+    return await _fetch(path, data, stream=stream)
+
+
+# Endpoints whose responses can be large enough to need the longer timeouts of bulk requests.
+_BULK_PATHS = frozenset({
+    'contest.list',
+    'contest.ratingChanges',
+    'contest.standings',
+    'problemset.problems',
+    'user.ratedList',
+    'user.status',
+})
+
+
 @cf_ratelimit
-async def _query_api(path, data=None):
+async def _fetch(path, data=None, *, stream=None):
     url = API_BASE_URL + path
+    timeout = http_client.timeout('bulk' if path in _BULK_PATHS else 'default')
+    cacheable = _response_cache is not None and path in _RESPONSE_FRESHNESS_BY_PATH
     try:
         logger.info(f'Querying CF API at {url} with {data}')
         # Explicitly state encoding (though aiohttp accepts gzip by default)
         headers = {'Accept-Encoding': 'gzip'}
-        async with _session.post(url, data=data, headers=headers) as resp:
-            try:
-                respjson = await resp.json()
-            except aiohttp.ContentTypeError:
+        request = api_telemetry.telemetry.current_request()
+        async with http_client.get_session().post(url, data=data, headers=headers,
+                                                  timeout=timeout) as resp:
+            if resp.content_type != 'application/json':
                 logger.warning(f'CF API did not respond with JSON, status {resp.status}.')
                 raise CodeforcesApiError
+            if stream is not None:
+                metered = _MeteredReader(resp.content)
+                content = _CompressingReader(metered) if cacheable else metered
+                start = time.monotonic()
+                respjson = await _read_stream(content, stream)
+                # Decoding is interleaved with the download, only the time not spent waiting
+                # for bytes counts as decoding.
+                request.decode_time += time.monotonic() - start - metered.read_time
+                request.bytes += metered.nbytes
+                body = content.getvalue() if cacheable else None
+            else:
+                raw = await resp.read()
+                start = time.monotonic()
+                respjson = json_backend.loads(raw)
+                request.decode_time += time.monotonic() - start
+                request.bytes += len(raw)
+                body = zlib.compress(raw) if cacheable else None
             if resp.status == 200:
+                if cacheable:
+                    _save_response(path, data, respjson['result'], body)
                 return respjson['result']
             comment = f'HTTP Error {resp.status}, {respjson.get("comment")}'
     except aiohttp.ClientError as e:
         logger.error(f'Request to CF API encountered error: {e!r}')
         raise ClientError from e
+    except asyncio.TimeoutError as e:
+        logger.error(f'Request to CF API at {url} timed out')
+        raise ClientError from e
     logger.warning(f'Query to CF API failed: {comment}')
     if 'limit exceeded' in comment:
         raise CallLimitExceededError(comment)
@@ -285,7 +820,7 @@ class contest:
         if gym is not None:
             params['gym'] = _bool_to_str(gym)
         resp = await _query_api('contest.list', params)
-        return [make_from_dict(Contest, contest_dict) for contest_dict in resp]
+        return [_make_contest(contest_dict) for contest_dict in resp]
 
     @staticmethod
     async def ratingChanges(*, contest_id):
@@ -298,11 +833,14 @@ class contest:
             if 'Rating changes are unavailable' in e.comment:
                 raise RatingChangesUnavailableError(e.comment, contest_id)
             raise
-        return [make_from_dict(RatingChange, change_dict) for change_dict in resp]
+        return [_make_rating_change(change_dict) for change_dict in resp]
 
     @staticmethod
     async def standings(*, contest_id, from_=None, count=None, handles=None, room=None,
-                        show_unofficial=None):
+                        show_unofficial=None, participant_types=None, member_handles=None):
+        """If `participant_types` or `member_handles` is given, only rows with one of those
+        participant types or with one of those handles as a member are kept. Other rows are
+        dropped while the response is decoded."""
         params = {'contestId': contest_id}
         if from_ is not None:
             params['from'] = from_
@@ -314,22 +852,25 @@ class contest:
             params['room'] = room
         if show_unofficial is not None:
             params['showUnofficial'] = _bool_to_str(show_unofficial)
+        keep = None
+        if participant_types is not None or member_handles is not None:
+            keep = RanklistRowFilter(
+                frozenset(participant_types) if participant_types is not None else None,
+                frozenset(member_handles) if member_handles is not None else None)
+        stream = _StreamSpec(('rows',), _make_ranklist_row, keep)
         try:
-            resp = await _query_api('contest.standings', params)
+            resp = await _query_api('contest.standings', params, stream=stream)
         except TrueApiError as e:
+            if 'not found' in e.comment and e.comment.startswith('handles:'):
+                # Comment format is "handles: User with handle ***** not found"
+                handle = e.comment.partition('not found')[0].split()[-1]
+                raise HandleNotFoundError(e.comment, handle)
             if 'not found' in e.comment:
                 raise ContestNotFoundError(e.comment, contest_id)
             raise
-        contest_ = make_from_dict(Contest, resp['contest'])
-        problems = [make_from_dict(Problem, problem_dict) for problem_dict in resp['problems']]
-        for row in resp['rows']:
-            row['party']['members'] = [make_from_dict(Member, member)
-                                       for member in row['party']['members']]
-            row['party'] = make_from_dict(Party, row['party'])
-            row['problemResults'] = [make_from_dict(ProblemResult, problem_result)
-                                     for problem_result in row['problemResults']]
-        ranklist = [make_from_dict(RanklistRow, row_dict) for row_dict in resp['rows']]
-        return contest_, problems, ranklist
+        contest_ = _make_contest(resp['contest'])
+        problems = [_make_problem(problem_dict) for problem_dict in resp['problems']]
+        return contest_, problems, list(resp['rows'])
 
 
 class problemset:
@@ -341,8 +882,8 @@ class problemset:
         if problemset_name is not None:
             params['problemsetName'] = problemset_name
         resp = await _query_api('problemset.problems', params)
-        problems = [make_from_dict(Problem, problem_dict) for problem_dict in resp['problems']]
-        problemstats = [make_from_dict(ProblemStatistics, problemstat_dict) for problemstat_dict in
+        problems = [_make_problem(problem_dict) for problem_dict in resp['problems']]
+        problemstats = [_make_problem_statistics(problemstat_dict) for problemstat_dict in
                         resp['problemStatistics']]
         return problems, problemstats
 
@@ -384,7 +925,7 @@ class user:
                     handle = e.comment.partition('not found')[0].split()[-1]
                     raise HandleNotFoundError(e.comment, handle)
                 raise
-            result += [make_from_dict(User, user_dict) for user_dict in resp]
+            result += [_make_user(user_dict) for user_dict in resp]
         return [cf_common.fix_urls(user) for user in result]
 
     @staticmethod
@@ -417,15 +958,16 @@ class user:
             if 'should contain' in e.comment:
                 raise HandleInvalidError(e.comment, handle)
             raise
-        return [make_from_dict(RatingChange, ratingchange_dict) for ratingchange_dict in resp]
+        return [_make_rating_change(ratingchange_dict) for ratingchange_dict in resp]
 
     @staticmethod
     async def ratedList(*, activeOnly=None):
         params = {}
         if activeOnly is not None:
             params['activeOnly'] = _bool_to_str(activeOnly)
-        resp = await _query_api('user.ratedList', params)
-        return [make_from_dict(User, user_dict) for user_dict in resp]
+        stream = _StreamSpec((), _make_user, None)
+        resp = await _query_api('user.ratedList', params, stream=stream)
+        return list(resp)
 
     @staticmethod
     async def status(*, handle, from_=None, count=None):
@@ -442,38 +984,61 @@ class user:
             if 'should contain' in e.comment:
                 raise HandleInvalidError(e.comment, handle)
             raise
-        for submission in resp:
-            submission['problem'] = make_from_dict(Problem, submission['problem'])
-            submission['author']['members'] = [make_from_dict(Member, member)
-                                               for member in submission['author']['members']]
-            submission['author'] = make_from_dict(Party, submission['author'])
-        return [make_from_dict(Submission, submission_dict) for submission_dict in resp]
-
-
-async def _needs_fixing(handles):
-    to_fix = []
-    chunks = user_info_chunkify(handles)
-    for handle_chunk in chunks:
-        while handle_chunk:
-            try:
-                cf_users = await user.info(handles=handle_chunk)
+        return [_make_submission(submission_dict) for submission_dict in resp]
+
+
+_FAN_OUT_CONCURRENCY = 4
+
+
+async def fan_out(func, args, *, concurrency=_FAN_OUT_CONCURRENCY):
+    """Returns `[await func(arg) for arg in args]`, but with up to `concurrency` calls in flight at
+    once. Requests made by the calls still wait for the rate limiter, the overlap only hides the
+    latency of each download. If any call fails the others are cancelled.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(arg):
+        async with semaphore:
+            return await func(arg)
+
+    tasks = [asyncio.create_task(run(arg)) for arg in args]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+_REDIRECT_CONCURRENCY = 4
+
 
-                # Users could still have changed capitalization
-                for handle, cf_user in zip(handle_chunk, cf_users):
-                    assert handle.lower() == cf_user.handle.lower()
-                    if handle != cf_user.handle:
-                        to_fix.append(handle)
+async def _fetch_existing_users(handles, on_missing=None):
+    """Returns the users for those of the handles that exist, keyed by the handle as given. The
+    API reports only one missing handle per query, so they are dropped one at a time and passed
+    to `on_missing` as they are found. The handles are split into chunks once, so that only the
+    chunk with a missing handle is queried again.
+    """
+    cf_users_by_handle = {}
+    for chunk in user_info_chunkify(handles):
+        while chunk:
+            try:
+                cf_users = await user.info(handles=chunk)
+                cf_users_by_handle.update(zip(chunk, cf_users))
                 break
             except HandleNotFoundError as e:
-                to_fix.append(e.handle)
-                handle_chunk.remove(e.handle)
-            time.sleep(1)
-    return to_fix
+                missing = [handle for handle in chunk if handle.lower() == e.handle.lower()]
+                if not missing:
+                    raise
+                chunk.remove(missing[0])
+                if on_missing:
+                    on_missing(missing[0])
+    return cf_users_by_handle
 
 
 async def _resolve_redirect(handle):
     url = PROFILE_BASE_URL + handle
-    async with _session.head(url) as r:
+    async with http_client.get_session().head(url, timeout=http_client.timeout()) as r:
         if r.status == 200:
             return handle
         if r.status == 301 or r.status == 302:
@@ -486,21 +1051,76 @@ async def _resolve_redirect(handle):
             f'Something went wrong trying to redirect {url}')
 
 
-async def _resolve_handle_mapping(handles_to_fix):
-    redirections = {}
-    failed = []
-    for handle in handles_to_fix:
-        new_handle = await _resolve_redirect(handle)
-        if not new_handle:
-            redirections[handle] = None
+async def iter_redirects(handles):
+    """Yields `(handle, cf_user)` for every one of the handles as soon as it is known, where
+    `cf_user` is the user the handle now belongs to, or None if it could not be resolved. The
+    handle needs fixing if `cf_user` is None or `cf_user.handle != handle`.
+
+    This runs as a pipeline: the handles are checked with user.info, each missing handle has its
+    profile redirect followed as soon as it is found, up to `_REDIRECT_CONCURRENCY` at a time,
+    and the redirect targets that have piled up meanwhile are looked up with a single query.
+    """
+    handles = list(dict.fromkeys(handles))
+    results = asyncio.Queue()
+    redirected = asyncio.Queue()
+    semaphore = asyncio.Semaphore(_REDIRECT_CONCURRENCY)
+    redirect_tasks = []
+
+    def run(coro):
+        async def wrapper():
+            try:
+                await coro
+            except Exception as e:
+                results.put_nowait(e)
+        return asyncio.create_task(wrapper())
+
+    async def redirect(handle):
+        async with semaphore:
+            new_handle = await _resolve_redirect(handle)
+        if new_handle:
+            redirected.put_nowait((handle, new_handle))
         else:
-            cf_user, = await user.info(handles=[new_handle])
-            redirections[handle] = cf_user
-        time.sleep(1)
-    return redirections
+            results.put_nowait((handle, None))
+
+    async def check():
+        cf_users = await _fetch_existing_users(
+            handles, on_missing=lambda handle: redirect_tasks.append(run(redirect(handle))))
+        # Users could still have changed capitalization, which needs no redirect.
+        for item in cf_users.items():
+            results.put_nowait(item)
+        await asyncio.gather(*redirect_tasks)
+        redirected.put_nowait(None)
+
+    async def look_up_targets():
+        finished = False
+        while not finished:
+            batch = [await redirected.get()]
+            while not redirected.empty():
+                batch.append(redirected.get_nowait())
+            if batch[-1] is None:
+                finished = True
+                batch.pop()
+            if not batch:
+                continue
+            cf_users = await _fetch_existing_users({new_handle for _, new_handle in batch})
+            for handle, new_handle in batch:
+                results.put_nowait((handle, cf_users.get(new_handle)))
+
+    tasks = [run(check()), run(look_up_targets())]
+    try:
+        for _ in range(len(handles)):
+            item = await results.get()
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        for task in tasks + redirect_tasks:
+            task.cancel()
 
 
 async def resolve_redirects(handles):
-    handles_to_fix = await _needs_fixing(handles)
-    handle_mapping = await _resolve_handle_mapping(handles_to_fix)
-    return handle_mapping
+    """Returns a dict mapping each of the handles that needs fixing to the user it now belongs
+    to, or to None if it could not be resolved.
+    """
+    return {handle: cf_user async for handle, cf_user in iter_redirects(handles)
+            if cf_user is None or cf_user.handle != handle}
@@ -1,3 +1,4 @@
+import contextvars
 import functools
 import json
 import logging
@@ -14,6 +15,7 @@ from tle.util import cache_system2
 from tle.util import codeforces_api as cf
 from tle.util import db
 from tle.util import events
+from tle.util.submission_table import SubmissionTable
 
 logger = logging.getLogger(__name__)
 
@@ -45,17 +47,18 @@ async def initialize(nodb):
         # when it reconnects.
         return
 
-    await cf.initialize()
+    response_cache = None
+    if constants.CF_RESPONSE_CACHE_MAX_MB > 0:
+        response_cache = db.ResponseCacheDbConn(constants.CF_RESPONSE_CACHE_DB_FILE_PATH,
+                                                constants.CF_RESPONSE_CACHE_MAX_MB * 2**20)
+    await cf.initialize(response_cache, constants.CF_API_BASE_URL)
 
     if nodb:
         user_db = db.DummyUserDbConn()
     else:
         user_db = db.UserDbConn(constants.USER_DB_FILE_PATH)
 
-    cache_db = db.CacheDbConn(constants.CACHE_DB_FILE_PATH)
-    cache2 = cache_system2.CacheSystem(cache_db)
-    await cache2.run()
-
+    # Contest writers are loaded before the caches, as problem queries use them.
     try:
         with open(constants.CONTEST_WRITERS_JSON_FILE_PATH) as f:
             data = json.load(f)
@@ -64,10 +67,42 @@ async def initialize(nodb):
     except FileNotFoundError:
         logger.warning('JSON file containing contest writers not found')
 
+    cache_db = db.CacheDbConn(constants.CACHE_DB_FILE_PATH)
+    cache2 = cache_system2.CacheSystem(cache_db, constants.CACHE_SNAPSHOT_FILE_PATH)
+    # The bot is ready once the caches most commands need have started, the others keep starting
+    # in the background.
+    await cache2.start()
+
     _initialize_done = True
 
 
 # algmyr's guard idea:
+# Times at which the stale data used by the current command was last fresh, see note_stale_data.
+_stale_data_times = contextvars.ContextVar('stale_data_times', default=None)
+
+
+def track_stale_data():
+    """Starts collecting the stale data used by the current task and the tasks it creates."""
+    _stale_data_times.set([])
+
+
+def note_stale_data(as_of):
+    """Records that data last fresh at time `as_of`, or at an unknown time if None, was used
+    because Codeforces could not be reached."""
+    times = _stale_data_times.get()
+    if times is not None:
+        times.append(as_of)
+
+
+def get_stale_data_time():
+    """Returns None if no stale data was used since `track_stale_data`. Otherwise returns the
+    time at which the oldest of it was fresh, or 0 if that is not known."""
+    times = _stale_data_times.get()
+    if not times:
+        return None
+    return min(as_of or 0 for as_of in times)
+
+
 def user_guard(*, group, get_exception=None):
     active = active_groups[group]
 
@@ -91,6 +126,16 @@ def user_guard(*, group, get_exception=None):
     return guard
 
 
+def caches_ready(*names):
+    """Returns a command check which waits until the given caches of cache2, among
+    `CacheSystem.DEFERRED_CACHES`, have started."""
+    async def predicate(ctx):
+        await cache2.wait_until_ready(*names)
+        return True
+
+    return commands.check(predicate)
+
+
 def is_contest_writer(contest_id, handle):
     if _contest_id_to_writers_map is None:
         return False
@@ -115,7 +160,8 @@ async def get_visited_contests(handles : [str]):
     """ Returns a set of contest ids of contests that any of the given handles
         has at least one non-CE submission.
     """
-    user_submissions = [await cf.user.status(handle=handle) for handle in handles]
+    user_submissions = await cf.fan_out(cache2.submission_store.get_submissions, handles)
+    await cache2.wait_until_ready('problemset_cache')
     problem_to_contests = cache2.problemset_cache.problem_to_contests
 
     contest_ids = []
@@ -384,46 +430,75 @@ class SubFilter:
     def filter_solved(submissions):
         """Filters and keeps only solved submissions. If a problem is solved multiple times the first
         accepted submission is kept. The unique id for a problem is (problem name, contest start time).
+        Returns a `SubmissionTable` in order of submission time.
         """
-        submissions.sort(key=lambda sub: sub.creationTimeSeconds)
+        if not isinstance(submissions, SubmissionTable):
+            submissions = SubmissionTable.from_submissions(submissions)
+        ok_code = submissions.verdict_code('OK')
+        times = submissions.creation_times
+        positions = sorted((i for i, code in enumerate(submissions.verdict_codes) if code == ok_code),
+                           key=times.__getitem__)
+
+        problem_codes, problem_pool = submissions.problem_codes, submissions.problem_pool
+        key_by_code = {}
         problems = set()
-        solved_subs = []
-
-        for submission in submissions:
-            problem = submission.problem
-            contest = cache2.contest_cache.contest_by_id.get(problem.contestId, None)
-            if submission.verdict == 'OK':
+        solved = []
+        for i in positions:
+            code = problem_codes[i]
+            problem_key = key_by_code.get(code)
+            if problem_key is None:
+                problem = problem_pool[code]
+                contest = cache2.contest_cache.contest_by_id.get(problem.contestId, None)
                 # Assume (name, contest start time) is a unique identifier for problems
                 problem_key = (problem.name, contest.startTimeSeconds if contest else 0)
-                if problem_key not in problems:
-                    solved_subs.append(submission)
-                    problems.add(problem_key)
-        return solved_subs
+                key_by_code[code] = problem_key
+            if problem_key not in problems:
+                solved.append(i)
+                problems.add(problem_key)
+        return submissions.take(solved)
+
+    def _problem_ok(self, problem):
+        contest = cache2.contest_cache.contest_by_id.get(problem.contestId, None)
+        tag_ok = problem.matches_all_tags(self.tags)
+        bantag_ok = not problem.matches_any_tag(self.bantags)
+        index_ok = not self.indices or any(index.lower() == problem.index.lower() for index in self.indices)
+        contest_ok = not self.contests or (contest and contest.matches(self.contests))
+        if self.rated:
+            problem_ok = contest and contest.id < cf.GYM_ID_THRESHOLD and not is_nonstandard_problem(problem)
+            rating_ok = problem.rating and self.rlo <= problem.rating <= self.rhi
+        else:
+            # acmsguru and gym allowed
+            problem_ok = (not contest or contest.id >= cf.GYM_ID_THRESHOLD
+                          or not is_nonstandard_problem(problem))
+            rating_ok = True
+        return bool(rating_ok and tag_ok and bantag_ok and problem_ok and contest_ok and index_ok)
+
+    def _party_ok(self, party):
+        type_ok = party.participantType in self.types
+        team_ok = self.team or len(party.members) == 1
+        return type_ok and team_ok
 
     def filter_subs(self, submissions):
+        """Returns the first solves of problems among `submissions` which satisfy the filter, as a
+        `SubmissionTable` in order of submission time. The conditions on the problem and the author
+        are checked once for each distinct problem and author."""
         submissions = SubFilter.filter_solved(submissions)
-        filtered_subs = []
-        for submission in submissions:
-            problem = submission.problem
-            contest = cache2.contest_cache.contest_by_id.get(problem.contestId, None)
-            type_ok = submission.author.participantType in self.types
-            date_ok = self.dlo <= submission.creationTimeSeconds < self.dhi
-            tag_ok = problem.matches_all_tags(self.tags)
-            bantag_ok = not problem.matches_any_tag(self.bantags)
-            index_ok = not self.indices or any(index.lower() == problem.index.lower() for index in self.indices)
-            contest_ok = not self.contests or (contest and contest.matches(self.contests))
-            team_ok = self.team or len(submission.author.members) == 1
-            if self.rated:
-                problem_ok = contest and contest.id < cf.GYM_ID_THRESHOLD and not is_nonstandard_problem(problem)
-                rating_ok = problem.rating and self.rlo <= problem.rating <= self.rhi
-            else:
-                # acmsguru and gym allowed
-                problem_ok = (not contest or contest.id >= cf.GYM_ID_THRESHOLD
-                              or not is_nonstandard_problem(problem))
-                rating_ok = True
-            if type_ok and date_ok and rating_ok and tag_ok and bantag_ok and team_ok and problem_ok and contest_ok and index_ok:
-                filtered_subs.append(submission)
-        return filtered_subs
+        problem_pool, party_pool = submissions.problem_pool, submissions.party_pool
+        problem_ok_by_code, party_ok_by_code = {}, {}
+        times, problem_codes, party_codes = (submissions.creation_times, submissions.problem_codes,
+                                             submissions.party_codes)
+        kept = []
+        for i in range(len(submissions)):
+            if not self.dlo <= times[i] < self.dhi:
+                continue
+            problem_code, party_code = problem_codes[i], party_codes[i]
+            if problem_code not in problem_ok_by_code:
+                problem_ok_by_code[problem_code] = self._problem_ok(problem_pool[problem_code])
+            if party_code not in party_ok_by_code:
+                party_ok_by_code[party_code] = self._party_ok(party_pool[party_code])
+            if problem_ok_by_code[problem_code] and party_ok_by_code[party_code]:
+                kept.append(i)
+        return submissions.take(kept)
 
     def filter_rating_changes(self, rating_changes):
         rating_changes = [change for change in rating_changes
@@ -1,20 +1,19 @@
 import logging
 
-import aiohttp
 from lxml import html
 
+from tle.util import http_client
+
 
 class CSESError(Exception):
     pass
 
 
-session = aiohttp.ClientSession()
-
-
 async def _fetch(url):
-    async with session.get(url) as response:
+    session = http_client.get_session()
+    async with session.get(url, timeout=http_client.timeout('scrape')) as response:
         if response.status != 200:
-            raise CSESError(f"Bad response from CSES, status code {status}")
+            raise CSESError(f"Bad response from CSES, status code {response.status}")
         tree = html.fromstring(await response.read())
     return tree
 
@@ -1,2 +1,3 @@
 from .cache_db_conn import *
+from .response_cache_db_conn import *
 from .user_db_conn import *
@@ -2,12 +2,15 @@ import json
 import sqlite3
 
 from tle.util import codeforces_api as cf
+from tle.util.submission_table import SubmissionTable
 
 
 class CacheDbConn:
     def __init__(self, db_file):
         self.conn = sqlite3.connect(db_file)
         self.create_tables()
+        query = 'SELECT contest_id FROM rated_contest'
+        self._rated_contest_ids = {contest_id for contest_id, in self.conn.execute(query)}
 
     def create_tables(self):
         # Table for contests from the contest.list endpoint.
@@ -58,6 +61,33 @@ class CacheDbConn:
         self.conn.execute('CREATE INDEX IF NOT EXISTS ix_rating_change_rating_update_time '
                           'ON rating_change (handle ASC, rating_update_time DESC)')
 
+        # Latest rating of every handle in rating_change, kept up to date with rating_change so
+        # that current ratings are loaded without scanning every rating change.
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS latest_rating ('
+            'handle               TEXT PRIMARY KEY,'
+            'rating_update_time   INTEGER,'
+            'new_rating           INTEGER'
+            ')'
+        )
+        if (self.conn.execute('SELECT 1 FROM latest_rating').fetchone() is None and
+                self.conn.execute('SELECT 1 FROM rating_change').fetchone() is not None):
+            self._refresh_latest_ratings()
+            self.conn.commit()
+
+        # Ids of the contests in rating_change, kept up to date with rating_change so that they
+        # are loaded without scanning every rating change.
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS rated_contest ('
+            'contest_id           INTEGER PRIMARY KEY'
+            ')'
+        )
+        if (self.conn.execute('SELECT 1 FROM rated_contest').fetchone() is None and
+                self.conn.execute('SELECT 1 FROM rating_change').fetchone() is not None):
+            self.conn.execute('INSERT INTO rated_contest (contest_id) '
+                              'SELECT DISTINCT contest_id FROM rating_change')
+            self.conn.commit()
+
         # Table for problems fetched from contest.standings endpoint for every contest.
         # This is separate from table problem as it contains the same problem twice if it
         # appeared in both Div 1 and Div 2 of some round.
@@ -77,11 +107,96 @@ class CacheDbConn:
         self.conn.execute('CREATE INDEX IF NOT EXISTS ix_problem2_contest_id '
                           'ON problem2 (contest_id)')
 
+        # Table for submissions fetched from the user.status endpoint, kept per handle so that only
+        # new submissions need to be fetched. The same submission appears once for every member of
+        # a team.
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS submission ('
+            'id                    INTEGER NOT NULL,'
+            'handle                TEXT NOT NULL,'
+            'contest_id            INTEGER,'
+            'problem_contest_id    INTEGER,'
+            'problemset_name       TEXT,'
+            '[index]               TEXT,'
+            'name                  TEXT,'
+            'type                  TEXT,'
+            'points                REAL,'
+            'rating                INTEGER,'
+            'tags                  TEXT,'
+            'party_contest_id      INTEGER,'
+            'members               TEXT,'
+            'participant_type      TEXT,'
+            'team_id               INTEGER,'
+            'team_name             TEXT,'
+            'ghost                 INTEGER,'
+            'room                  INTEGER,'
+            'party_start_time      INTEGER,'
+            'programming_language  TEXT,'
+            'verdict               TEXT,'
+            'creation_time         INTEGER,'
+            'relative_time         INTEGER,'
+            'PRIMARY KEY (handle, id)'
+            ')'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS submission_sync ('
+            'handle                TEXT PRIMARY KEY,'
+            'synced_at             REAL'
+            ')'
+        )
+
+        # Number of problems and of rated problems in problem2 for every contest, kept up to date
+        # with problem2 so that the contests whose problemset is incomplete are found in one query.
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS problemset_state ('
+            'contest_id       INTEGER PRIMARY KEY,'
+            'problem_count    INTEGER,'
+            'rated_count      INTEGER'
+            ')'
+        )
+        if (self.conn.execute('SELECT 1 FROM problemset_state').fetchone() is None and
+                not self.problemset_empty()):
+            self._refresh_problemset_state()
+            self.conn.commit()
+
+        # Number of writes to each table, kept so that copies of tables made elsewhere, such as
+        # in cache snapshots, can tell whether they are still up to date.
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS table_version ('
+            'name       TEXT PRIMARY KEY,'
+            'version    INTEGER'
+            ')'
+        )
+
+        # Snapshot of effective ratings of all users from the user.ratedList endpoint, in a single
+        # row with the time it was fetched. The handles are joined by newlines and the ratings are
+        # the bytes of an array of ints in the same order, as the snapshot is only ever written
+        # and read whole.
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS effective_rating_blob ('
+            'synced_at  REAL,'
+            'handles    TEXT,'
+            'ratings    BLOB'
+            ')'
+        )
+        self.conn.execute('DROP TABLE IF EXISTS effective_rating')
+        self.conn.execute('DROP TABLE IF EXISTS effective_rating_sync')
+
+    def _bump_table_version(self, name):
+        query = ('INSERT INTO table_version (name, version) VALUES (?, 1) '
+                 'ON CONFLICT (name) DO UPDATE SET version = version + 1')
+        self.conn.execute(query, (name,))
+
+    def get_table_versions(self):
+        query = 'SELECT name, version FROM table_version'
+        return dict(self.conn.execute(query).fetchall())
+
     def cache_contests(self, contests):
         query = ('INSERT OR REPLACE INTO contest '
                  '(id, name, start_time, duration, type, phase, prepared_by) '
                  'VALUES (?, ?, ?, ?, ?, ?, ?)')
         rc = self.conn.executemany(query, contests).rowcount
+        self._bump_table_version('contest')
         self.conn.commit()
         return rc
 
@@ -101,6 +216,7 @@ class CacheDbConn:
                  '(contest_id, problemset_name, [index], name, type, points, rating, tags) '
                  'VALUES (?, ?, ?, ?, ?, ?, ?, ?)')
         rc = self.conn.executemany(query, list(map(self._squish_tags, problems))).rowcount
+        self._bump_table_version('problem')
         self.conn.commit()
         return rc
 
@@ -126,18 +242,56 @@ class CacheDbConn:
                  '(contest_id, handle, rank, rating_update_time, old_rating, new_rating) '
                  'VALUES (?, ?, ?, ?, ?, ?)')
         rc = self.conn.executemany(query, change_tuples).rowcount
+        query = ('INSERT INTO latest_rating (handle, rating_update_time, new_rating) '
+                 'VALUES (?, ?, ?) '
+                 'ON CONFLICT (handle) DO UPDATE SET '
+                 'rating_update_time = excluded.rating_update_time, '
+                 'new_rating = excluded.new_rating '
+                 'WHERE excluded.rating_update_time >= latest_rating.rating_update_time')
+        self.conn.executemany(query, [(change.handle,
+                                       change.ratingUpdateTimeSeconds,
+                                       change.newRating) for change in changes])
+        contest_ids = {change.contestId for change in changes}
+        self.conn.executemany('INSERT OR IGNORE INTO rated_contest (contest_id) VALUES (?)',
+                              [(contest_id,) for contest_id in contest_ids])
+        self._bump_table_version('rating_change')
         self.conn.commit()
+        self._rated_contest_ids.update(contest_ids)
         return rc
 
     def clear_rating_changes(self, contest_id=None):
         if contest_id is None:
             query = 'DELETE FROM rating_change'
             self.conn.execute(query)
+            self.conn.execute('DELETE FROM latest_rating')
+            self.conn.execute('DELETE FROM rated_contest')
+            self._rated_contest_ids.clear()
         else:
+            query = 'SELECT handle FROM rating_change WHERE contest_id = ?'
+            handles = self.conn.execute(query, (contest_id,)).fetchall()
             query = 'DELETE FROM rating_change WHERE contest_id = ?'
             self.conn.execute(query, (contest_id,))
+            self.conn.executemany('DELETE FROM latest_rating WHERE handle = ?', handles)
+            self._refresh_latest_ratings(handle for handle, in handles)
+            self.conn.execute('DELETE FROM rated_contest WHERE contest_id = ?', (contest_id,))
+            self._rated_contest_ids.discard(contest_id)
+        self._bump_table_version('rating_change')
         self.conn.commit()
 
+    def _refresh_latest_ratings(self, handles=None):
+        query = ('INSERT OR REPLACE INTO latest_rating (handle, rating_update_time, new_rating) '
+                 'SELECT handle, MAX(rating_update_time), new_rating '
+                 'FROM rating_change ')
+        if handles is None:
+            self.conn.execute(query + 'GROUP BY handle')
+        else:
+            self.conn.executemany(query + 'WHERE handle = ? GROUP BY handle',
+                                  ((handle,) for handle in handles))
+
+    def get_latest_ratings(self):
+        query = 'SELECT handle, new_rating, rating_update_time FROM latest_rating'
+        return self.conn.execute(query)
+
     def get_users_with_more_than_n_contests(self, time_cutoff, n):
         query = ('SELECT handle, COUNT(*) AS num_contests '
                  'FROM rating_change GROUP BY handle HAVING num_contests >= ? '
@@ -164,11 +318,10 @@ class CacheDbConn:
         return [cf.RatingChange._make(change) for change in res]
 
     def has_rating_changes_saved(self, contest_id):
-        query = ('SELECT contest_id '
-                 'FROM rating_change '
-                 'WHERE contest_id = ?')
-        res = self.conn.execute(query, (contest_id,)).fetchone()
-        return res is not None
+        # Answered from the set of contest ids in rated_contest, which is loaded once and kept in
+        # sync by save_rating_changes and clear_rating_changes, as this is asked for every
+        # finished contest on every contest list refresh.
+        return contest_id in self._rated_contest_ids
 
     def get_rating_changes_for_handle(self, handle):
         query = ('SELECT contest_id, name, handle, rank, rating_update_time, old_rating, new_rating '
@@ -193,9 +346,28 @@ class CacheDbConn:
                  '(contest_id, problemset_name, [index], name, type, points, rating, tags) '
                  'VALUES (?, ?, ?, ?, ?, ?, ?, ?)')
         rc = self.conn.executemany(query, list(map(self._squish_tags, problemset))).rowcount
+        self._refresh_problemset_state({problem.contestId for problem in problemset})
+        self._bump_table_version('problem2')
         self.conn.commit()
         return rc
 
+    def _refresh_problemset_state(self, contest_ids=None):
+        query = ('INSERT OR REPLACE INTO problemset_state (contest_id, problem_count, rated_count) '
+                 'SELECT contest_id, COUNT(*), COUNT(rating) '
+                 'FROM problem2 ')
+        if contest_ids is None:
+            self.conn.execute(query + 'GROUP BY contest_id')
+        else:
+            self.conn.executemany(query + 'WHERE contest_id = ? GROUP BY contest_id',
+                                  [(contest_id,) for contest_id in contest_ids])
+
+    def fetch_problemset_states(self):
+        """Returns a dict of contest id to (number of problems, number of rated problems) for every
+        contest with problems in problem2."""
+        query = 'SELECT contest_id, problem_count, rated_count FROM problemset_state'
+        return {contest_id: (problem_count, rated_count)
+                for contest_id, problem_count, rated_count in self.conn.execute(query)}
+
     def fetch_problems2(self):
         query = ('SELECT contest_id, problemset_name, [index], name, type, points, rating, tags '
                  'FROM problem2 ')
@@ -204,11 +376,12 @@ class CacheDbConn:
 
     def clear_problemset(self, contest_id=None):
         if contest_id is None:
-            query = 'DELETE FROM problem2'
-            self.conn.execute(query)
+            self.conn.execute('DELETE FROM problem2')
+            self.conn.execute('DELETE FROM problemset_state')
         else:
-            query = 'DELETE FROM problem2 WHERE contest_id = ?'
-            self.conn.execute(query, (contest_id,))
+            self.conn.execute('DELETE FROM problem2 WHERE contest_id = ?', (contest_id,))
+            self.conn.execute('DELETE FROM problemset_state WHERE contest_id = ?', (contest_id,))
+        self._bump_table_version('problem2')
 
     def fetch_problemset(self, contest_id):
         query = ('SELECT contest_id, problemset_name, [index], name, type, points, rating, tags '
@@ -222,5 +395,113 @@ class CacheDbConn:
         res = self.conn.execute(query).fetchone()
         return res is None
 
+    @staticmethod
+    def _squish_submission(handle, submission):
+        problem, party = submission.problem, submission.author
+        members = ';'.join(member.handle for member in party.members)
+        return (submission.id, handle, submission.contestId,
+                problem.contestId, problem.problemsetName, problem.index, problem.name,
+                problem.type, problem.points, problem.rating, json.dumps(problem.tags),
+                party.contestId, members, party.participantType, party.teamId, party.teamName,
+                party.ghost, party.room, party.startTimeSeconds,
+                submission.programmingLanguage, submission.verdict,
+                submission.creationTimeSeconds, submission.relativeTimeSeconds)
+
+    def save_submissions(self, handle, submissions):
+        """Saves the submissions of the handle, replacing the verdicts and problem data of those
+        already saved. Returns the number of submissions which were new or changed."""
+        query = ('INSERT INTO submission '
+                 '(id, handle, contest_id, problem_contest_id, problemset_name, [index], name, '
+                 'type, points, rating, tags, party_contest_id, members, participant_type, '
+                 'team_id, team_name, ghost, room, party_start_time, programming_language, '
+                 'verdict, creation_time, relative_time) '
+                 'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                 'ON CONFLICT (handle, id) DO UPDATE SET '
+                 'points = excluded.points, rating = excluded.rating, tags = excluded.tags, '
+                 'verdict = excluded.verdict '
+                 'WHERE points IS NOT excluded.points OR rating IS NOT excluded.rating '
+                 'OR tags IS NOT excluded.tags OR verdict IS NOT excluded.verdict')
+        rows = [self._squish_submission(handle, submission) for submission in submissions]
+        rc = self.conn.executemany(query, rows).rowcount
+        self.conn.commit()
+        return rc
+
+    def fetch_submissions(self, handle):
+        query = ('SELECT id, handle, contest_id, problem_contest_id, problemset_name, [index], '
+                 'name, type, points, rating, tags, party_contest_id, members, participant_type, '
+                 'team_id, team_name, ghost, room, party_start_time, programming_language, '
+                 'verdict, creation_time, relative_time '
+                 'FROM submission '
+                 'WHERE handle = ? '
+                 'ORDER BY id DESC')
+        res = self.conn.execute(query, (handle,))
+        return SubmissionTable.from_rows(res)
+
+    def get_submission_sync_point(self, handle, recent_since=None):
+        """Returns the id of the latest saved submission of the handle and the id of the earliest
+        saved submission whose verdict may still change, either of which may be None. These are
+        the submissions not yet judged, and if `recent_since` is given those created since then."""
+        query = ('SELECT MAX(id), MIN(CASE WHEN verdict IS NULL OR verdict = ? '
+                 'OR creation_time >= ? THEN id END) '
+                 'FROM submission '
+                 'WHERE handle = ?')
+        return self.conn.execute(query, ('TESTING', recent_since, handle)).fetchone()
+
+    def get_submission_counts(self, handle):
+        """Returns the number of saved submissions of the handle and how many of them were not yet
+        judged. Together with the latest id these change whenever the saved submissions do."""
+        query = ('SELECT COUNT(*), COUNT(CASE WHEN verdict IS NULL OR verdict = ? THEN 1 END) '
+                 'FROM submission '
+                 'WHERE handle = ?')
+        return self.conn.execute(query, ('TESTING', handle)).fetchone()
+
+    def set_submission_sync_time(self, handle, synced_at):
+        query = ('INSERT OR REPLACE INTO submission_sync (handle, synced_at) '
+                 'VALUES (?, ?)')
+        self.conn.execute(query, (handle, synced_at))
+        self.conn.commit()
+
+    def get_submission_sync_time(self, handle):
+        query = 'SELECT synced_at FROM submission_sync WHERE handle = ?'
+        res = self.conn.execute(query, (handle,)).fetchone()
+        return res[0] if res else None
+
+    def save_effective_ratings(self, handles, ratings, synced_at):
+        """Replaces the effective rating snapshot with `handles`, joined by newlines, and
+        `ratings`, the bytes of the array of their ratings."""
+        self.conn.execute('DELETE FROM effective_rating_blob')
+        query = ('INSERT INTO effective_rating_blob (synced_at, handles, ratings) '
+                 'VALUES (?, ?, ?)')
+        self.conn.execute(query, (synced_at, handles, ratings))
+        self.conn.commit()
+
+    def fetch_effective_ratings(self):
+        """Returns the time the effective rating snapshot was fetched, its handles and its
+        ratings as saved by `save_effective_ratings`, or None if there is no snapshot."""
+        query = 'SELECT synced_at, handles, ratings FROM effective_rating_blob'
+        return self.conn.execute(query).fetchone()
+
+    def clear_submissions(self, handle=None):
+        """Deletes the saved submissions of the handle, or of all handles if none is given.
+        Returns the number of submissions deleted."""
+        if handle is None:
+            rc = self.conn.execute('DELETE FROM submission').rowcount
+            self.conn.execute('DELETE FROM submission_sync')
+        else:
+            rc = self.conn.execute('DELETE FROM submission WHERE handle = ?', (handle,)).rowcount
+            self.conn.execute('DELETE FROM submission_sync WHERE handle = ?', (handle,))
+        self.conn.commit()
+        return rc
+
+    def evict_submissions(self, synced_before):
+        """Deletes the saved submissions of the handles last synced before `synced_before`.
+        Returns the number of handles evicted."""
+        query = 'SELECT handle FROM submission_sync WHERE synced_at < ?'
+        handles = [(handle,) for handle, in self.conn.execute(query, (synced_before,))]
+        self.conn.executemany('DELETE FROM submission WHERE handle = ?', handles)
+        self.conn.executemany('DELETE FROM submission_sync WHERE handle = ?', handles)
+        self.conn.commit()
+        return len(handles)
+
     def close(self):
         self.conn.close()
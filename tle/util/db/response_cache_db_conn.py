@@ -0,0 +1,129 @@
+import sqlite3
+
+
+class ResponseCacheDbConn:
+    """Store of compressed raw Codeforces API responses. Once the stored bodies take more than
+    `max_bytes`, the least recently used ones are evicted.
+    """
+    _EVICT_BATCH_SIZE = 100
+    # Number of accesses after which their last access times are written.
+    _ACCESS_FLUSH_SIZE = 100
+
+    def __init__(self, db_file, max_bytes):
+        self.conn = sqlite3.connect(db_file)
+        self.max_bytes = max_bytes
+        # Last access times not yet written, so that a hit does not cost a commit.
+        self.pending_access_by_key = {}
+        self.create_tables()
+        self.total_bytes = self._compute_total_bytes()
+
+    def create_tables(self):
+        # Table for responses keyed by endpoint and params. A NULL expires_at never expires.
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS response ('
+            'key            TEXT NOT NULL,'
+            'path           TEXT NOT NULL,'
+            'body           BLOB NOT NULL,'
+            'size           INTEGER NOT NULL,'
+            'expires_at     REAL,'
+            'last_access    REAL NOT NULL,'
+            'saved_at       REAL,'
+            'PRIMARY KEY (key)'
+            ')'
+        )
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(response)')]
+        if 'saved_at' not in columns:
+            # Added later, rows saved before have a NULL saved_at.
+            self.conn.execute('ALTER TABLE response ADD COLUMN saved_at REAL')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS ix_response_last_access '
+                          'ON response (last_access)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS ix_response_path '
+                          'ON response (path)')
+
+    def _compute_total_bytes(self):
+        query = 'SELECT COALESCE(SUM(size), 0) FROM response'
+        return self.conn.execute(query).fetchone()[0]
+
+    def get_response(self, key, now):
+        """Returns the body stored for the key if it is still fresh at time `now`, else None."""
+        query = ('SELECT body, expires_at '
+                 'FROM response '
+                 'WHERE key = ?')
+        res = self.conn.execute(query, (key,)).fetchone()
+        if res is None:
+            return None
+        body, expires_at = res
+        if expires_at is not None and expires_at <= now:
+            return None
+        self.pending_access_by_key[key] = now
+        if len(self.pending_access_by_key) >= self._ACCESS_FLUSH_SIZE:
+            self._flush_accesses()
+            self.conn.commit()
+        return body
+
+    def _flush_accesses(self):
+        query = 'UPDATE response SET last_access = ? WHERE key = ?'
+        self.conn.executemany(query, [(last_access, key) for key, last_access
+                                      in self.pending_access_by_key.items()])
+        self.pending_access_by_key.clear()
+
+    def get_stale_response(self, key):
+        """Returns the body stored for the key even if it has expired, and the time it was saved
+        at, which is None if unknown. Returns None if nothing is stored."""
+        query = ('SELECT body, saved_at '
+                 'FROM response '
+                 'WHERE key = ?')
+        return self.conn.execute(query, (key,)).fetchone()
+
+    def save_response(self, key, path, body, expires_at, now):
+        query = 'SELECT size FROM response WHERE key = ?'
+        res = self.conn.execute(query, (key,)).fetchone()
+        if res is not None:
+            self.total_bytes -= res[0]
+        query = ('INSERT OR REPLACE INTO response '
+                 '(key, path, body, size, expires_at, last_access, saved_at) '
+                 'VALUES (?, ?, ?, ?, ?, ?, ?)')
+        self.conn.execute(query, (key, path, body, len(body), expires_at, now, now))
+        self.total_bytes += len(body)
+        self.pending_access_by_key.pop(key, None)
+        self._flush_accesses()
+        self._evict()
+        self.conn.commit()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes:
+            query = ('SELECT key, size '
+                     'FROM response '
+                     'ORDER BY last_access '
+                     'LIMIT ?')
+            res = self.conn.execute(query, (self._EVICT_BATCH_SIZE,)).fetchall()
+            if not res:
+                break
+            for key, size in res:
+                self.conn.execute('DELETE FROM response WHERE key = ?', (key,))
+                self.total_bytes -= size
+                if self.total_bytes <= self.max_bytes:
+                    break
+
+    def clear_responses(self, path=None):
+        self._flush_accesses()
+        if path is None:
+            query = 'DELETE FROM response'
+            rc = self.conn.execute(query).rowcount
+        else:
+            query = 'DELETE FROM response WHERE path = ?'
+            rc = self.conn.execute(query, (path,)).rowcount
+        self.conn.commit()
+        self.total_bytes = self._compute_total_bytes()
+        return rc
+
+    def get_stats(self):
+        query = ('SELECT path, COUNT(*), SUM(size) '
+                 'FROM response '
+                 'GROUP BY path')
+        return self.conn.execute(query).fetchall()
+
+    def close(self):
+        self._flush_accesses()
+        self.conn.commit()
+        self.conn.close()
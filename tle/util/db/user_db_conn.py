@@ -329,6 +329,17 @@ class UserDbConn:
             )
             ''')
 
+        # Handles already checked by an unfinished ;handle unmagic_all, so that it can resume.
+        # A NULL new_handle means the handle could not be resolved.
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS unmagic_progress (
+                guild_id TEXT,
+                handle TEXT,
+                new_handle TEXT,
+                PRIMARY KEY (guild_id, handle)
+            )
+        ''')
+
     # Helper functions.
 
     def _insert_one(self, table: str, columns, values: tuple):
@@ -650,6 +661,25 @@ class UserDbConn:
         res = self.conn.execute(query, (guild_id,)).fetchall()
         return [(int(user_id), handle) for user_id, handle in res]
 
+    def get_unmagic_progress(self, guild_id):
+        query = ('SELECT handle, new_handle '
+                 'FROM unmagic_progress '
+                 'WHERE guild_id = ?')
+        return dict(self.conn.execute(query, (guild_id,)).fetchall())
+
+    def save_unmagic_progress(self, guild_id, handle, new_handle):
+        query = ('INSERT OR REPLACE INTO unmagic_progress '
+                 '(guild_id, handle, new_handle) '
+                 'VALUES (?, ?, ?)')
+        with self.conn:
+            return self.conn.execute(query, (guild_id, handle, new_handle)).rowcount
+
+    def clear_unmagic_progress(self, guild_id):
+        query = ('DELETE FROM unmagic_progress '
+                 'WHERE guild_id = ?')
+        with self.conn:
+            return self.conn.execute(query, (guild_id,)).rowcount
+
     def get_cf_users_for_guild(self, guild_id):
         query = ('SELECT u.user_id, c.handle, c.first_name, c.last_name, c.country, c.city, '
                  '    c.organization, c.contribution, c.rating, c.maxRating, c.last_online_time, '
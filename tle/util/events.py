@@ -16,6 +16,19 @@ class ContestListRefresh(Event):
         self.contests = contests
 
 
+class ContestsChanged(Event):
+    """Dispatched with the differences from the previous contest list whenever it changes.
+    `phase_changed` and `time_changed` hold pairs of the old and the new version of a contest, and
+    `changed` the new versions of all contests that differ in any field.
+    """
+    def __init__(self, *, added, removed, changed, phase_changed, time_changed):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        self.phase_changed = phase_changed
+        self.time_changed = time_changed
+
+
 class RatingChangesUpdate(Event):
     def __init__(self, *, contest, rating_changes):
         self.contest = contest
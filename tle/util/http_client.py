@@ -0,0 +1,53 @@
+import asyncio
+import logging
+
+import aiohttp
+
+from tle import constants
+
+logger = logging.getLogger(__name__)
+
+# Timeouts in seconds by class of request. `sock_read` bounds the wait for each chunk of the
+# body, `total` the whole request including the time to read the body.
+TIMEOUT_BY_CLASS = {
+    # Small API responses and profile pages.
+    'default': aiohttp.ClientTimeout(total=30, connect=10, sock_read=20),
+    # API responses which can be tens of MB, such as user.ratedList and contest.standings.
+    'bulk': aiohttp.ClientTimeout(total=300, connect=10, sock_read=60),
+    # Pages of other sites which are scraped.
+    'scrape': aiohttp.ClientTimeout(total=60, connect=10, sock_read=30),
+}
+
+_session = None
+
+
+def timeout(request_class='default'):
+    """Returns the `aiohttp.ClientTimeout` for requests of the given class."""
+    return TIMEOUT_BY_CLASS[request_class]
+
+
+def get_session():
+    """Returns the session shared by everything that makes HTTP requests, creating it on first
+    use. Must be called from within the running event loop."""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(limit=constants.HTTP_POOL_SIZE,
+                                         limit_per_host=constants.HTTP_POOL_SIZE_PER_HOST,
+                                         keepalive_timeout=constants.HTTP_KEEPALIVE_TIMEOUT,
+                                         ttl_dns_cache=constants.HTTP_DNS_CACHE_TTL)
+        _session = aiohttp.ClientSession(connector=connector, timeout=timeout())
+        logger.info(f'HTTP session created with pool size {constants.HTTP_POOL_SIZE} '
+                    f'({constants.HTTP_POOL_SIZE_PER_HOST} per host)')
+    return _session
+
+
+async def close():
+    """Closes the shared session. A later `get_session` creates a new one."""
+    global _session
+    session, _session = _session, None
+    if session is None or session.closed:
+        return
+    await session.close()
+    # Lets the transports of SSL connections finish closing before the loop goes away.
+    await asyncio.sleep(0.25)
+    logger.info('HTTP session closed')
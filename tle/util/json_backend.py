@@ -0,0 +1,70 @@
+"""Decoding of JSON bodies with the fastest library available. orjson is used if it is installed,
+then msgspec, and the standard library otherwise. The backend can be forced with the JSON_BACKEND
+environment variable.
+"""
+
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def _stdlib_loads():
+    return json.loads
+
+
+def _orjson_loads():
+    import orjson
+    return orjson.loads
+
+
+def _msgspec_loads():
+    import msgspec
+    return msgspec.json.decode
+
+
+_LOADS_FACTORY_BY_BACKEND = {
+    'orjson': _orjson_loads,
+    'msgspec': _msgspec_loads,
+    'json': _stdlib_loads,
+}
+
+
+def get_loads(backend):
+    """Returns the function that decodes bytes or str with the given backend. Raises
+    `ValueError` if there is no such backend and `ImportError` if it is not installed."""
+    if backend not in _LOADS_FACTORY_BY_BACKEND:
+        raise ValueError(f'Unknown JSON backend {backend!r}, expected one of '
+                         f'{", ".join(_LOADS_FACTORY_BY_BACKEND)}')
+    return _LOADS_FACTORY_BY_BACKEND[backend]()
+
+
+def available_backends():
+    backends = []
+    for backend in _LOADS_FACTORY_BY_BACKEND:
+        try:
+            get_loads(backend)
+        except ImportError:
+            continue
+        backends.append(backend)
+    return backends
+
+
+def _select_backend():
+    forced = os.environ.get('JSON_BACKEND')
+    if forced in _LOADS_FACTORY_BY_BACKEND:
+        return forced, get_loads(forced)
+    if forced:
+        logger.warning(f'Ignoring unknown JSON_BACKEND {forced!r}, expected one of '
+                       f'{", ".join(_LOADS_FACTORY_BY_BACKEND)}')
+    for backend in _LOADS_FACTORY_BY_BACKEND:
+        try:
+            return backend, get_loads(backend)
+        except ImportError:
+            pass
+
+
+backend, loads = _select_backend()
+logger.info(f'Using {backend} to decode JSON')
+
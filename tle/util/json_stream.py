@@ -0,0 +1,118 @@
+import asyncio
+import codecs
+import itertools
+import json
+
+_WHITESPACE = ' \t\n\r'
+
+
+class JsonStreamError(ValueError):
+    pass
+
+
+class JsonStream:
+    """Incremental reader of a JSON document from an aiohttp response body. The elements of one
+    nested array are decoded one at a time as bytes arrive, instead of decoding the whole body at
+    once, so that a huge array never exists as a list of dicts and the event loop is not blocked
+    for the whole decode.
+    """
+    _CHUNK_SIZE = 1 << 16
+    _ITEMS_PER_YIELD = 1000
+
+    def __init__(self, content):
+        """`content` is an `aiohttp.StreamReader`, such as `resp.content`."""
+        self.content = content
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    async def read(self, array_path, on_item):
+        """Decodes the document, where `array_path` is the sequence of object keys leading to the
+        array of interest. Every element of that array is passed to `on_item` and the value it
+        returns is kept in its place, unless it is None. Returns the decoded document.
+        """
+        return await self._walk(tuple(array_path), on_item)
+
+    async def _fill(self):
+        chunk = await self.content.read(self._CHUNK_SIZE)
+        # Drop what has been consumed so the buffer stays around the size of one chunk.
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+        if chunk:
+            self.buf += self.text_decoder.decode(chunk)
+        else:
+            self.buf += self.text_decoder.decode(b'', final=True)
+            self.eof = True
+
+    async def _skip_whitespace(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return
+            await self._fill()
+
+    async def _peek(self):
+        await self._skip_whitespace()
+        if self.pos == len(self.buf):
+            raise JsonStreamError('Unexpected end of JSON document')
+        return self.buf[self.pos]
+
+    async def _expect(self, chars):
+        char = await self._peek()
+        if char not in chars:
+            raise JsonStreamError(f'Expected one of {chars!r} at position {self.pos}, got {char!r}')
+        self.pos += 1
+        return char
+
+    async def _value(self):
+        await self._skip_whitespace()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number at the very end of the buffer may continue in the next chunk.
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise JsonStreamError(str(e)) from e
+            await self._fill()
+
+    async def _walk(self, path, on_item):
+        if not path:
+            return await self._walk_array(on_item)
+        if await self._peek() != '{':
+            return await self._value()
+        self.pos += 1
+        obj = {}
+        if await self._peek() == '}':
+            self.pos += 1
+            return obj
+        while True:
+            key = await self._value()
+            await self._expect(':')
+            if key == path[0]:
+                obj[key] = await self._walk(path[1:], on_item)
+            else:
+                obj[key] = await self._value()
+            if await self._expect(',}') == '}':
+                return obj
+
+    async def _walk_array(self, on_item):
+        await self._expect('[')
+        items = []
+        if await self._peek() == ']':
+            self.pos += 1
+            return items
+        for count in itertools.count(1):
+            item = on_item(await self._value())
+            if item is not None:
+                items.append(item)
+            if count % self._ITEMS_PER_YIELD == 0:
+                # Let other tasks run when the body is already buffered.
+                await asyncio.sleep(0)
+            if await self._expect(',]') == ']':
+                return items
@@ -0,0 +1,101 @@
+import random
+from collections import OrderedDict
+
+from tle.util import bitset
+from tle.util import codeforces_api as cf
+
+# Which submissions of a handle mark a problem as done, so that it is not picked for the handle.
+SUBMITTED = 'submitted'  # Any submission.
+ATTEMPTED = 'attempted'  # Any submission except compilation errors.
+ACCEPTED = 'accepted'  # Only accepted submissions.
+
+
+class ProblemPicker:
+    """Picks random problems for handles from the problem cache. The problems a handle has done are
+    kept as a bitset over the problem cache, so that the candidates for any number of handles are
+    found with a few int operations instead of building sets of problem names from every
+    handle's submissions.
+    """
+    _MAX_CACHED_HANDLES = 1000
+
+    def __init__(self, cache_master):
+        self.cache_master = cache_master
+        self.done_by_key = OrderedDict()
+
+    async def get_done_bits(self, handles, done=SUBMITTED):
+        """Returns the bitset of problems done by any of the handles."""
+        bits = 0
+        for handle_bits in await cf.fan_out(lambda handle: self._get_done_bits(handle, done),
+                                            handles):
+            bits |= handle_bits
+        return bits
+
+    async def _get_done_bits(self, handle, done):
+        store = self.cache_master.submission_store
+        problem_cache = self.cache_master.problem_cache
+        version = (problem_cache.generation, await store.get_version(handle))
+        key = (handle.lower(), done)
+        cached = self.done_by_key.get(key)
+        if cached is not None and cached[0] == version:
+            self.done_by_key.move_to_end(key)
+            return cached[1]
+
+        submissions = store.get_stored_submissions(handle)
+        verdict_pool = submissions.verdict_pool
+        if done == ACCEPTED:
+            verdict_codes = {submissions.verdict_code('OK')}
+        elif done == ATTEMPTED:
+            verdict_codes = {code for code, verdict in enumerate(verdict_pool)
+                             if verdict != 'COMPILATION_ERROR'}
+        else:
+            verdict_codes = set(range(len(verdict_pool)))
+        problem_codes = {problem_code for verdict_code, problem_code
+                         in zip(submissions.verdict_codes, submissions.problem_codes)
+                         if verdict_code in verdict_codes}
+        problem_pool = submissions.problem_pool
+        bits = problem_cache.bits_of_names(problem_pool[code].name for code in problem_codes)
+
+        self.done_by_key[key] = (version, bits)
+        if len(self.done_by_key) > self._MAX_CACHED_HANDLES:
+            self.done_by_key.popitem(last=False)
+        return bits
+
+    async def get_candidates(self, handles, *, done=SUBMITTED, **query):
+        """Returns the bitset of problems selected by `ProblemCache.query_bits` with `query` which
+        none of the handles have done."""
+        done_bits = await self.get_done_bits(handles, done)
+        return self.cache_master.problem_cache.query_bits(**query) & ~done_bits
+
+    @staticmethod
+    def count(candidates):
+        return bitset.count(candidates)
+
+    def pick(self, candidates, *, weight=1):
+        """Picks one of the candidates, in order of contest start time, at the position that is the
+        maximum of `weight` uniformly random positions. Higher weights favour recent problems.
+        Returns None if there are no candidates."""
+        n = bitset.count(candidates)
+        if n == 0:
+            return None
+        rank = max(random.randrange(n) for _ in range(weight))
+        return self._problem_at(candidates, rank)
+
+    def pick_distinct(self, candidates, count, *, weight=1):
+        """Picks `count` different candidates, each as by `pick` among those not yet picked.
+        Returns them in order of contest start time, or None if there are too few candidates."""
+        n = bitset.count(candidates)
+        if n < count:
+            return None
+        ranks = []
+        for i in range(count):
+            rank = max(random.randrange(n - i) for _ in range(weight))
+            # Skip over the ranks already picked.
+            for picked in ranks:
+                if rank >= picked:
+                    rank += 1
+            ranks.append(rank)
+            ranks.sort()
+        return [self._problem_at(candidates, rank) for rank in ranks]
+
+    def _problem_at(self, candidates, rank):
+        return self.cache_master.problem_cache.problems[bitset.select(candidates, rank)]
@@ -2,7 +2,6 @@ from discord.ext import commands
 
 from tle.util.ranklist.rating_calculator import CodeforcesRatingCalculator
 from tle.util.handledict import HandleDict
-from tle.util.codeforces_api import make_from_dict, RanklistRow
 
 
 class RanklistError(commands.CommandError):
@@ -51,11 +50,14 @@ class Ranklist:
         To be used for cases when official ranklist contains unofficial contestants
         Currently this is seen is Educational Contests ranklist where div1 contestants are marked official in api result
         """
+        self.set_official_ranks(self.get_official_ranks())
 
+    def get_official_ranks(self):
+        """Returns the ranks of the contestants with deltas among themselves."""
         if self.delta_by_handle is None:
             raise DeltasNotPresentError(self.contest)
 
-        official_standings = []
+        official_rank_by_handle = {}
         current_rated_rank = 1
         last_rated_rank = 0
         last_rated_score = (-1, -1)
@@ -63,21 +65,26 @@ class Ranklist:
             handle = self.get_ranklist_lookup_key(contestant)
             if handle in self.delta_by_handle:
                 current_score = (contestant.points, contestant.penalty)
-                standings_row = self.standing_by_id[handle]._asdict()
-                standings_row['rank'] = current_rated_rank if current_score != last_rated_score else last_rated_rank
-                official_standings.append(make_from_dict(RanklistRow, standings_row))
-                last_rated_rank = standings_row['rank']
+                rank = current_rated_rank if current_score != last_rated_score else last_rated_rank
+                official_rank_by_handle[handle] = rank
+                last_rated_rank = rank
                 last_rated_score = current_score
                 current_rated_rank += 1
-
-        self.standings = official_standings
+        return official_rank_by_handle
+
+    def set_official_ranks(self, official_rank_by_handle):
+        """Keeps only the contestants present in `official_rank_by_handle`, with the ranks given
+        there. The standings may be partial, the ranks then come from the full standings."""
+        self.standings = [row._replace(rank=official_rank_by_handle[self.get_ranklist_lookup_key(row)])
+                          for row in self.standings
+                          if self.get_ranklist_lookup_key(row) in official_rank_by_handle]
         self._create_inverse_standings()
 
-    def set_deltas(self, delta_by_handle):
+    def set_deltas(self, delta_by_handle, *, predicted=False):
         if not self.is_rated:
             raise ContestNotRatedError(self.contest)
         self.delta_by_handle = delta_by_handle.copy()
-        self.deltas_status = 'Final'
+        self.deltas_status = 'Predicted' if predicted else 'Final'
 
     def predict(self, current_rating):
         if not self.is_rated:
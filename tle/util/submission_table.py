@@ -0,0 +1,217 @@
+import json
+from array import array
+
+from tle.util import codeforces_api as cf
+
+# Stored in the integer columns in place of None.
+MISSING = -2**63
+
+
+class _Pool:
+    """Interned values, each stored once and referred to by a small integer code."""
+    def __init__(self):
+        self.values = []
+        self.code_by_key = {}
+
+    def intern(self, key, make_value):
+        code = self.code_by_key.get(key)
+        if code is None:
+            code = len(self.values)
+            self.values.append(make_value())
+            self.code_by_key[key] = code
+        return code
+
+
+class _Pools:
+    def __init__(self):
+        self.problems = _Pool()
+        self.parties = _Pool()
+        self.languages = _Pool()
+        self.verdicts = _Pool()
+
+
+def _problem_key(problem):
+    return (problem.contestId, problem.problemsetName, problem.index, problem.name, problem.type,
+            problem.points, problem.rating, tuple(problem.tags))
+
+
+def _party_key(party):
+    return (party.contestId, tuple(member.handle for member in party.members),
+            party.participantType, party.teamId, party.teamName, party.ghost, party.room,
+            party.startTimeSeconds)
+
+
+def _from_missing(value):
+    return None if value == MISSING else value
+
+
+def _to_missing(value):
+    return MISSING if value is None else value
+
+
+class SubmissionTable:
+    """A list of submissions stored by column. Ids and times are kept in arrays, and problems,
+    parties, languages and verdicts are interned so that the ones shared between submissions are
+    stored once and every row holds only an integer code for each.
+
+    Rows are built as `cf.Submission` only when accessed, by indexing or iterating, and the
+    problems and parties in them are the shared interned objects. Tables derived from a table,
+    such as by `take`, share its interned values.
+    """
+    __slots__ = ('_pools', 'ids', 'contest_ids', 'creation_times', 'relative_times',
+                 'problem_codes', 'party_codes', 'language_codes', 'verdict_codes')
+
+    def __init__(self, pools=None):
+        self._pools = pools or _Pools()
+        self.ids = array('q')
+        self.contest_ids = array('q')
+        self.creation_times = array('q')
+        self.relative_times = array('q')
+        self.problem_codes = array('l')
+        self.party_codes = array('l')
+        self.language_codes = array('l')
+        self.verdict_codes = array('l')
+
+    @classmethod
+    def from_submissions(cls, submissions):
+        table = cls()
+        for submission in submissions:
+            table.append(submission)
+        return table
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Builds the table from rows of the submission table of the cache database, each
+        starting with the id and in the order of columns used by `CacheDbConn`. Problems and
+        parties are only decoded the first time they are seen."""
+        table = cls()
+        pools = table._pools
+        for row in rows:
+            problem_key, party_key = row[3:11], row[11:19]
+            table._append_codes(
+                row[0], row[2],
+                pools.problems.intern(problem_key, lambda: cf.Problem(*row[3:10],
+                                                                      json.loads(row[10]))),
+                pools.parties.intern(party_key, lambda: _make_party_from_row(row)),
+                row[19], row[20], row[21], row[22])
+        return table
+
+    @classmethod
+    def concat(cls, tables):
+        """Returns one table with the rows of all `tables`, in order."""
+        tables = list(tables)
+        if tables and all(table._pools is tables[0]._pools for table in tables):
+            result = cls(tables[0]._pools)
+            for table in tables:
+                result._extend_columns(table, range(len(table)))
+            return result
+        result = cls()
+        for table in tables:
+            if not isinstance(table, SubmissionTable):
+                table = cls.from_submissions(table)
+            for submission in table:
+                result.append(submission)
+        return result
+
+    def append(self, submission):
+        pools = self._pools
+        problem, party = submission.problem, submission.author
+        self._append_codes(
+            submission.id, submission.contestId,
+            pools.problems.intern(_problem_key(problem), lambda: problem),
+            pools.parties.intern(_party_key(party), lambda: party),
+            submission.programmingLanguage, submission.verdict,
+            submission.creationTimeSeconds, submission.relativeTimeSeconds)
+
+    def _append_codes(self, id_, contest_id, problem_code, party_code, language, verdict,
+                      creation_time, relative_time):
+        pools = self._pools
+        self.ids.append(id_)
+        self.contest_ids.append(_to_missing(contest_id))
+        self.problem_codes.append(problem_code)
+        self.party_codes.append(party_code)
+        self.language_codes.append(pools.languages.intern(language, lambda: language))
+        self.verdict_codes.append(pools.verdicts.intern(verdict, lambda: verdict))
+        self.creation_times.append(_to_missing(creation_time))
+        self.relative_times.append(_to_missing(relative_time))
+
+    def _extend_columns(self, table, positions):
+        for name in ('ids', 'contest_ids', 'creation_times', 'relative_times', 'problem_codes',
+                     'party_codes', 'language_codes', 'verdict_codes'):
+            column = getattr(table, name)
+            getattr(self, name).extend(column[i] for i in positions)
+
+    def take(self, positions):
+        """Returns a table of the rows at `positions`, in that order."""
+        if not isinstance(positions, (list, tuple, range, array)):
+            positions = list(positions)
+        result = SubmissionTable(self._pools)
+        result._extend_columns(self, positions)
+        return result
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.take(range(len(self))[i])
+        pools = self._pools
+        return cf.Submission(self.ids[i], _from_missing(self.contest_ids[i]),
+                             pools.problems.values[self.problem_codes[i]],
+                             pools.parties.values[self.party_codes[i]],
+                             pools.languages.values[self.language_codes[i]],
+                             pools.verdicts.values[self.verdict_codes[i]],
+                             _from_missing(self.creation_times[i]),
+                             _from_missing(self.relative_times[i]))
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self)))
+
+    def __add__(self, other):
+        return SubmissionTable.concat((self, other))
+
+    def __repr__(self):
+        return f'<SubmissionTable of {len(self)} submissions>'
+
+    # The interned values, indexed by the codes in the corresponding columns.
+
+    @property
+    def problem_pool(self):
+        return self._pools.problems.values
+
+    @property
+    def party_pool(self):
+        return self._pools.parties.values
+
+    @property
+    def verdict_pool(self):
+        return self._pools.verdicts.values
+
+    def verdict_code(self, verdict):
+        """Returns the code of `verdict` in this table, or None if no row has it."""
+        return self._pools.verdicts.code_by_key.get(verdict)
+
+    def problems(self):
+        """Returns the problem of every row."""
+        pool = self._pools.problems.values
+        return [pool[code] for code in self.problem_codes]
+
+    def parties(self):
+        """Returns the party of every row."""
+        pool = self._pools.parties.values
+        return [pool[code] for code in self.party_codes]
+
+    def column(self, name):
+        """Returns the values of the id or time column `name`, such as 'relative_times', of every
+        row, with None in place of missing values as in `cf.Submission`."""
+        return [_from_missing(value) for value in getattr(self, name)]
+
+    def positions_with_verdict(self, verdict):
+        code = self.verdict_code(verdict)
+        return [i for i, verdict_code in enumerate(self.verdict_codes) if verdict_code == code]
+
+
+def _make_party_from_row(row):
+    members = [cf.Member(handle) for handle in row[12].split(';')] if row[12] else []
+    ghost = bool(row[16]) if row[16] is not None else None
+    return cf.Party(row[11], members, row[13], row[14], row[15], ghost, row[17], row[18])
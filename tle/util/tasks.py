@@ -4,6 +4,7 @@ import logging
 from discord.ext import commands
 
 import tle.util.codeforces_common as cf_common
+from tle.util import api_telemetry
 
 
 class TaskError(commands.CommandError):
@@ -145,7 +146,12 @@ class Task:
         if self.running:
             self.logger.info(f'Stopping task `{self.name}`.')
             self.asyncio_task.cancel()
-            await asyncio.sleep(0)  # To ensure cancellation if called from within the task itself.
+            if self.asyncio_task is asyncio.current_task():
+                # To ensure cancellation if called from within the task itself.
+                await asyncio.sleep(0)
+            else:
+                # Cancelling a task waiting on others, such as a gather, takes more than one step.
+                await asyncio.wait([self.asyncio_task])
 
     async def _task(self):
         arg = None
@@ -157,10 +163,11 @@ class Task:
 
     async def _execute_func(self, arg):
         try:
-            if self.instance is not None:
-                await self.func(self.instance, arg)
-            else:
-                await self.func(arg)
+            with api_telemetry.request_source(self.name):
+                if self.instance is not None:
+                    await self.func(self.instance, arg)
+                else:
+                    await self.func(arg)
         except asyncio.CancelledError:
             raise
         except Exception as ex: